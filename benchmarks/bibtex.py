@@ -0,0 +1,61 @@
+"""
+Compare the native BibTeX parser with pandoc-citeproc on a synthetic bibliography.
+
+Usage: python -m benchmarks.bibtex [number of entries]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mdwiz import bibtex
+from mdwiz.bibliography import Bibliography
+
+
+def generate_bibliography(path: Path, entries: int):
+    with path.open("w", encoding="utf-8") as file:
+        file.write('@string{ppn = "Gundlers Playpen"}\n')
+        file.write("@comment{Generated for benchmarking}\n\n")
+        for i in range(entries):
+            file.write(
+                f"@article{{key{i},\n"
+                f"  title = {{A {{Nested}} title number {i}}},\n"
+                f"  journaltitle = ppn,\n"
+                f'  author = "Doe, John and Gundler, Christopher",\n'
+                f"  date = {{2019}},\n"
+                f"  pages = {{{i}-{i + 10}}},\n"
+                f"  abstract = {{{'This is meaningfull. ' * 20}}}\n"
+                f"}}\n\n"
+            )
+
+
+def measure(name: str, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{name:<24} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main(entries: int = 15000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "bibliography.bib"
+        generate_bibliography(path, entries)
+        print(f"{entries} entries, {path.stat().st_size / 1024 / 1024:.1f} MiB")
+
+        keys = measure("native keys", lambda: frozenset(bibtex.iter_keys(path)))
+        entries = measure("native entries", lambda: bibtex.parse(path))
+        assert keys == frozenset(entries.keys())
+
+        if Bibliography.is_available():
+            reference = measure(
+                "pandoc-citeproc",
+                lambda: frozenset(Bibliography.from_pandoc_citeproc(path).keys()),
+            )
+            assert keys == reference, "Native parser yields different keys"
+        else:
+            print("pandoc-citeproc is not installed, skipping comparison.")
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:]))
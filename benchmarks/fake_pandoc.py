@@ -0,0 +1,153 @@
+"""
+A deterministic stand-in for pandoc and pandoc-citeproc, so the overhead of mdwiz itself can be measured without them.
+
+It understands the subset of the command line mdwiz uses: Markdown headings and citations are rendered into LaTeX,
+everything else is copied verbatim and filters are ignored. The environment variable MDWIZ_FAKE_PANDOC_DELAY adds a
+fixed delay in seconds to each call, to simulate the work of the real tool.
+
+Usage: python -m benchmarks.fake_pandoc (pandoc|pandoc-citeproc) [arguments]
+"""
+
+import json
+import os
+import re
+import stat
+import sys
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+VERSION = "2.9.2.1"
+
+HEADING_REGEX = re.compile(r"^(#{1,3})\s+(.*?)\s*(\{#[^}]*\})?$")
+BRACKET_CITATION_REGEX = re.compile(r"\[@([\w:.#$%&+?<>~/-]+)[^\]]*\]")
+# References of pandoc-xnos are left to the filters, which the fake ignores
+TEXT_CITATION_REGEX = re.compile(
+    r"(?<![\w@])@(?!(?:fig|eq|tbl|sec):)([\w:.#$%&+?<>~/-]*\w)"
+)
+BIBTEX_KEY_REGEX = re.compile(r"@(\w+)\s*[{(]\s*([^,\s]+)\s*,")
+SECTIONS = ("section", "subsection", "subsubsection")
+
+
+def render_latex(markdown: str, biblatex: bool, standalone: bool) -> str:
+    lines = []
+    for line in markdown.splitlines():
+        heading = HEADING_REGEX.match(line)
+        if heading is not None:
+            line = f"\\{SECTIONS[len(heading.group(1)) - 1]}{{{heading.group(2)}}}"
+        elif biblatex:
+            line = BRACKET_CITATION_REGEX.sub(r"\\autocite{\1}", line)
+            line = TEXT_CITATION_REGEX.sub(r"\\textcite{\1}", line)
+        lines.append(line)
+
+    body = "\n".join(lines) + "\n"
+    if standalone:
+        body = f"\\documentclass{{article}}\n\\begin{{document}}\n{body}\\end{{document}}\n"
+    return body
+
+
+def pandoc(arguments: Sequence[str]) -> int:
+    if "--version" in arguments:
+        print(f"pandoc {VERSION}")
+        return 0
+
+    options = {}
+    files: List[str] = []
+    output = None
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument == "-o":
+            output = next(arguments)
+        elif argument.startswith("--"):
+            name, _, value = argument[2:].partition("=")
+            options[name] = value
+        else:
+            files.append(argument)
+
+    if len(files) > 0:
+        source = "".join(Path(file).read_text(encoding="utf-8") for file in files)
+    else:
+        source = sys.stdin.read()
+
+    # The AST only wraps the Markdown, which is enough to pass it through in-process filters
+    if options.get("from") == "json":
+        source = "".join(
+            block["c"][1]
+            for block in json.loads(source)["blocks"]
+            if block["t"] == "RawBlock"
+        )
+    if options.get("to") == "json":
+        result = json.dumps(
+            {
+                "pandoc-api-version": [1, 20],
+                "meta": {},
+                "blocks": [{"t": "RawBlock", "c": ["markdown", source]}],
+            }
+        )
+    else:
+        result = render_latex(
+            source, biblatex="biblatex" in options, standalone="standalone" in options
+        )
+
+    if output is None:
+        sys.stdout.write(result)
+    else:
+        Path(output).write_text(result, encoding="utf-8")
+    return 0
+
+
+def pandoc_citeproc(arguments: Sequence[str]) -> int:
+    if "--version" in arguments:
+        print(f"pandoc-citeproc {VERSION}")
+        return 0
+    if len(arguments) != 2 or arguments[0] != "--bib2json":
+        sys.stderr.write("Only '--bib2json FILE' is supported.\n")
+        return 1
+
+    entries = [
+        {"id": match.group(2), "type": match.group(1).lower()}
+        for match in BIBTEX_KEY_REGEX.finditer(
+            Path(arguments[1]).read_text(encoding="utf-8")
+        )
+        if match.group(1).lower() not in ("string", "comment", "preamble")
+    ]
+    json.dump(entries, sys.stdout)
+    return 0
+
+
+def install(directory: Path) -> Path:
+    """
+    Create the executables 'pandoc' and 'pandoc-citeproc' in the given directory, which is meant to be put in front
+    of PATH.
+
+    :param directory: An existing directory.
+    :return: The directory.
+    """
+    script = Path(__file__).absolute()
+    for tool in ("pandoc", "pandoc-citeproc"):
+        if os.name == "nt":
+            (directory / f"{tool}.bat").write_text(
+                f'@"{sys.executable}" "{script}" {tool} %*\n'
+            )
+        else:
+            executable = directory / tool
+            executable.write_text(
+                f'#!/bin/sh\nexec "{sys.executable}" "{script}" {tool} "$@"\n'
+            )
+            executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    return directory
+
+
+def main(argv: Sequence[str]) -> int:
+    time.sleep(float(os.environ.get("MDWIZ_FAKE_PANDOC_DELAY", "0")))
+    tool, arguments = argv[0], argv[1:]
+    if tool == "pandoc":
+        return pandoc(arguments)
+    elif tool == "pandoc-citeproc":
+        return pandoc_citeproc(arguments)
+    sys.stderr.write(f"Unknown tool '{tool}'.\n")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,101 @@
+"""
+Generate synthetic documents of different sizes: many chapters, citations, tables, a large bibliography and a deep
+directory tree which has to be searched during discovery.
+
+Usage: python -m benchmarks.generator (small|medium|large) [directory]
+"""
+
+import sys
+from pathlib import Path
+
+from benchmarks.bibtex import generate_bibliography
+
+SIZES = {
+    "small": dict(chapters=5, citations=50, entries=500, tables=5, depth=2),
+    "medium": dict(chapters=30, citations=500, entries=5000, tables=50, depth=4),
+    "large": dict(chapters=150, citations=3000, entries=30000, tables=300, depth=6),
+}
+
+
+def generate_project(
+    root: Path,
+    chapters: int,
+    citations: int,
+    entries: int,
+    tables: int,
+    depth: int,
+    breadth: int = 3,
+) -> Path:
+    """
+    Write a document into the given directory.
+
+    :param root: An existing, empty directory.
+    :param chapters: The number of Markdown files.
+    :param citations: The number of citations spread over all chapters. Every tenth one is missing in the bibliography.
+    :param entries: The number of entries in the BibTeX bibliography.
+    :param tables: The number of pantable tables spread over all chapters.
+    :param depth: The depth of the directory tree with figures next to the chapters.
+    :param breadth: The number of subdirectories in each directory of the tree.
+    :return: The directory of the document, which contains the chapters.
+    """
+    document = root / "document"
+    document.mkdir()
+
+    bibliography = document / "bibliography"
+    bibliography.mkdir()
+    generate_bibliography(bibliography / "references.bib", entries)
+
+    for chapter in range(chapters):
+        lines = [f"# Chapter {chapter} {{#sec:chapter{chapter}}}", ""]
+        for citation in range(chapter, citations, chapters):
+            key = (
+                f"missing{citation}"
+                if citation % 10 == 9
+                else f"key{citation % entries}"
+            )
+            lines.append(
+                f"Paragraph {citation} refers to [@{key}, p. {citation}] and "
+                f"@sec:chapter{chapter}. {'Some filler text. ' * 10}"
+            )
+            lines.append("")
+        for table in range(chapter, tables, chapters):
+            lines.extend(
+                (
+                    "```table",
+                    "---",
+                    f"caption: Table {table}",
+                    "---",
+                    "Name,Value,Unit",
+                    *(f"Row {row},{row * table},m" for row in range(20)),
+                    "```",
+                    "",
+                )
+            )
+        (document / f"{chapter:03d}_chapter.md").write_text(
+            "\n".join(lines), encoding="utf-8"
+        )
+
+    # Figures in a deep tree, which discovery has to walk through
+    pending = [(document / "figures", 0)]
+    while len(pending) > 0:
+        directory, level = pending.pop()
+        directory.mkdir()
+        for figure in range(breadth):
+            (directory / f"figure{figure}.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+        (directory / "notes.txt").write_text("Not part of the document.")
+        if level < depth:
+            pending.extend(
+                (directory / f"level{level}_{child}", level + 1)
+                for child in range(breadth)
+            )
+
+    return document
+
+
+def main(size: str = "small", directory: str = "."):
+    document = generate_project(Path(directory), **SIZES[size])
+    print(f"Generated a {size} document in '{document}'.")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
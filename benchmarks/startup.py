@@ -0,0 +1,80 @@
+"""
+Track the wall time of mdwiz invocations which do little work: '--help', failed discovery and cached conversions.
+
+Usage: python -m benchmarks.startup [repetitions]
+"""
+
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Sequence
+
+PACKAGE_ROOT = Path(__file__).parent.parent
+
+
+def measure(
+    name: str, arguments: Sequence[str], cwd: Path, environment: dict, repetitions: int
+) -> float:
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "mdwiz", *arguments],
+            cwd=str(cwd),
+            env=environment,
+            capture_output=True,
+        )
+        durations.append(time.perf_counter() - start)
+    print(f"{name:<24} {min(durations) * 1000:8.1f} ms (best of {repetitions})")
+    return min(durations)
+
+
+def main(repetitions: int = 10):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        empty_directory = tmp_dir / "empty"
+        document_directory = tmp_dir / "document"
+        binary_directory = tmp_dir / "bin"
+        for directory in (empty_directory, document_directory, binary_directory):
+            directory.mkdir()
+        (document_directory / "document.md").write_text("# Chapter 1\n\nSome text.\n")
+
+        # A placeholder pandoc, which is never started on a cache hit
+        pandoc = binary_directory / "pandoc"
+        pandoc.write_text("#!/bin/sh\nexit 1\n")
+        pandoc.chmod(pandoc.stat().st_mode | stat.S_IEXEC)
+
+        environment = dict(os.environ)
+        environment["PYTHONPATH"] = str(PACKAGE_ROOT)
+        environment["MDWIZ_CACHE_DIR"] = str(tmp_dir / "cache")
+        environment["PATH"] = os.pathsep.join(
+            (str(binary_directory), environment.get("PATH", ""))
+        )
+
+        # Warm the cache as an earlier conversion would have done
+        os.environ["PATH"] = environment["PATH"]
+        sys.path.insert(0, str(PACKAGE_ROOT))
+        from mdwiz.cache import Cache
+        from mdwiz.converter import Converter
+
+        converter = Converter([document_directory / "document.md"])
+        Cache(tmp_dir / "cache").put(converter.cache_key(), b"\\section{Chapter 1}")
+
+        measure("--help", ["--help"], empty_directory, environment, repetitions)
+        measure("failed discovery", [], empty_directory, environment, repetitions)
+        measure(
+            "cached conversion",
+            ["--output", str(tmp_dir / "output.tex")],
+            document_directory,
+            environment,
+            repetitions,
+        )
+        assert (tmp_dir / "output.tex").read_text() == "\\section{Chapter 1}"
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:]))
@@ -0,0 +1,175 @@
+"""
+Time the stages of mdwiz on a synthetic document, with the fake pandoc standing in for the real one. The results can
+be stored and compared against an earlier run to detect regressions.
+
+Usage: python -m benchmarks.suite [small|medium|large] [--repetitions N] [--save FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks import fake_pandoc
+from benchmarks.generator import SIZES, generate_project
+from mdwiz.bibliography import Bibliography
+from mdwiz.cache import Cache
+from mdwiz.converter import Converter
+from mdwiz.filetypes.bibliography import Bibliography as BibliographyFileType
+from mdwiz.filetypes.csl import Csl
+from mdwiz.filetypes.index import FileIndex
+from mdwiz.filetypes.markdown import Markdown
+from mdwiz.filetypes.template import Template
+
+
+def measure(
+    results: Dict[str, float], name: str, function: Callable, repetitions: int
+):
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    results[name] = min(durations)
+    print(
+        f"{name:<24} {min(durations) * 1000:10.1f} ms "
+        f"(median {statistics.median(durations) * 1000:.1f} ms)"
+    )
+
+
+def discover(document: Path, index: FileIndex = None) -> List[Path]:
+    markdown_files = Markdown().locate_files(
+        document, recursive=False, min_size=5, index=index
+    )
+    return [
+        *markdown_files,
+        *(
+            file
+            for file_type in (BibliographyFileType(), Template(), Csl())
+            for file in file_type.locate_files(
+                document, reference_file=markdown_files, index=index
+            )
+        ),
+    ]
+
+
+def run(size: str, repetitions: int) -> Dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        binary_directory = tmp_dir / "bin"
+        binary_directory.mkdir()
+        fake_pandoc.install(binary_directory)
+        os.environ["PATH"] = os.pathsep.join(
+            (str(binary_directory), os.environ.get("PATH", ""))
+        )
+
+        document = generate_project(tmp_dir, **SIZES[size])
+        markdown_files = Markdown().locate_files(document, recursive=False)
+        citation_file = document / "bibliography" / "references.bib"
+        print(f"Document '{size}' with {len(markdown_files)} chapters:")
+
+        measure(results, "discovery", lambda: discover(document), repetitions)
+        measure(
+            results,
+            "discovery (index)",
+            lambda: discover(document, FileIndex.build(document)),
+            repetitions,
+        )
+        measure(
+            results,
+            "bibliography",
+            lambda: Bibliography.from_file(citation_file),
+            repetitions,
+        )
+
+        def check_references():
+            # Measure the parsing, not the memo of earlier repetitions
+            Bibliography._loaded_keys.clear()
+            Converter.MissingReferenceWarning.check_references(
+                citation_file, markdown_files
+            )
+
+        measure(results, "citation check", check_references, repetitions)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Converter.MissingReferenceWarning)
+            measure(
+                results,
+                "convert",
+                lambda: Converter(markdown_files, citation_file).convert(),
+                repetitions,
+            )
+            measure(
+                results,
+                "convert (chapters)",
+                lambda: Converter(markdown_files, citation_file).convert_chapters(),
+                repetitions,
+            )
+
+            cache = Cache(tmp_dir / "cache")
+            Converter(markdown_files, citation_file, cache=cache).convert()
+            measure(
+                results,
+                "convert (cached)",
+                lambda: Converter(markdown_files, citation_file, cache=cache).convert(),
+                repetitions,
+            )
+    return results
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], tolerance: float
+) -> List[str]:
+    """
+    Find the stages which became slower than the baseline allows.
+    """
+    return [
+        f"{name}: {baseline[name] * 1000:.1f} ms -> {duration * 1000:.1f} ms"
+        for name, duration in results.items()
+        if name in baseline and duration > baseline[name] * (1 + tolerance)
+    ]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "size", choices=sorted(SIZES.keys()), nargs="?", default="small"
+    )
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--save", help="Store the results as JSON.", type=str)
+    parser.add_argument(
+        "--baseline", help="Compare against results stored earlier.", type=str
+    )
+    parser.add_argument(
+        "--tolerance",
+        help="The relative slowdown accepted before reporting a regression.",
+        type=float,
+        default=0.2,
+    )
+    arguments = parser.parse_args(argv)
+
+    results = run(arguments.size, arguments.repetitions)
+    if arguments.save is not None:
+        Path(arguments.save).write_text(json.dumps(results, indent=2))
+
+    if arguments.baseline is not None:
+        regressions = compare(
+            results,
+            json.loads(Path(arguments.baseline).read_text()),
+            arguments.tolerance,
+        )
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,22 +1,34 @@
 import argparse
+import io
 import logging
 import os
+import shutil
 import sys
 import warnings
 from enum import Enum
 from pathlib import Path
-from typing import Optional, Union, Sequence
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Optional,
+    Union,
+    Sequence,
+    TextIO,
+    Tuple,
+)
 
-import pyperclip
-
-from mdwiz import NAME, DESCRIPTION
-from mdwiz.bibliography import Bibliography
-from mdwiz.converter import Converter
+from mdwiz import NAME, DESCRIPTION, timing
 from mdwiz.filetypes import FileType
-from mdwiz.filetypes.bibliography import Bibliography as BibliographyFileType
-from mdwiz.filetypes.csl import Csl
-from mdwiz.filetypes.markdown import Markdown
-from mdwiz.filetypes.template import Template
+
+# The subsystems are imported on demand, so '--help' and early failures start fast
+if TYPE_CHECKING:
+    from mdwiz.assets import AssetStage
+    from mdwiz.converter import Converter
+    from mdwiz.cache import Cache
+
+# The Markdown files, the bibliographies, the template and the CSL style of a conversion
+ResolvedFiles = Tuple[Sequence[Path], Sequence[Path], Optional[Path], Optional[Path]]
 
 
 class StatusCode(Enum):
@@ -24,6 +36,8 @@ class StatusCode(Enum):
     FileError = 1
     PandocError = 2
     MissingDependency = 3
+    MissingReference = 4
+    TexError = 5
 
     def __int__(self):
         return self.value
@@ -31,6 +45,16 @@ class StatusCode(Enum):
     def is_successfull(self) -> bool:
         return self == StatusCode.Success
 
+    @staticmethod
+    def combine(status_codes: Iterable["StatusCode"]) -> "StatusCode":
+        """
+        Summarize the status of multiple conversions by the failure with the highest code.
+
+        >>> StatusCode.combine([StatusCode.Success, StatusCode.MissingDependency, StatusCode.FileError]).name
+        'MissingDependency'
+        """
+        return max(status_codes, key=int, default=StatusCode.Success)
+
 
 class MdwizRuntimeError(Exception):
     def __init__(self, code: StatusCode, msg: str):
@@ -48,57 +72,94 @@ def get_file(
         input: Union[None, str, Sequence[str]] = None,
         required: bool = False,
         multiple_files: bool = False,
+        root: Optional[Path] = None,
         **kwargs,
 ) -> Optional[Union[Path, Sequence[Path]]]:
-    # Check if the user has provided an file
-    if input is not None and len(input) > 0:
-        if isinstance(input, str):
-            input = [input]
-
-        paths = []
-        for file in input:
-            file = Path.cwd() / file
-            if not file.is_file():
-                raise MdwizRuntimeError(
-                    StatusCode.FileError, f"Provided file '{input}' not found!"
-                )
-            logging.info(f"Using '{file}' as {file_type.__class__.__name__} file.")
-            paths.append(file)
+    with timing.span(f"discover {file_type.__class__.__name__}", "discovery"):
+        root = root if root is not None else Path.cwd()
 
-        return paths if multiple_files else paths[0]
+        # Check if the user has provided an file
+        if input is not None and len(input) > 0:
+            if isinstance(input, str):
+                input = [input]
 
-    # Find all the files of interest which are bigger than 5 bytes
-    files = file_type.locate_files(Path.cwd(), min_size=5, **kwargs)
+            paths = []
+            for file in input:
+                file = root / file
+                if not file.is_file():
+                    raise MdwizRuntimeError(
+                        StatusCode.FileError, f"Provided file '{input}' not found!"
+                    )
+                logging.info(f"Using '{file}' as {file_type.__class__.__name__} file.")
+                paths.append(file)
 
-    if len(files) == 0:
-        # Fail if a required filetype is not found, otherwise print an warning
-        if required:
-            raise MdwizRuntimeError(
-                StatusCode.FileError, file_type.missing_file_error_msg()
-            )
+            return paths if multiple_files else paths[0]
+
+        # Find all the files of interest which are bigger than 5 bytes
+        files = file_type.locate_files(root, min_size=5, **kwargs)
+
+        if len(files) == 0:
+            # Fail if a required filetype is not found, otherwise print an warning
+            if required:
+                raise MdwizRuntimeError(
+                    StatusCode.FileError, file_type.missing_file_error_msg()
+                )
+            else:
+                logging.info(f"{file_type.__class__.__name__} is skipped.")
+            return None
+        elif len(files) == 1:
+            logging.info(f"Using '{files[0]}' as {file_type.__class__.__name__} file.")
+            return files[0] if not multiple_files else files
         else:
-            logging.info(f"{file_type.__class__.__name__} is skipped.")
-        return None
-    elif len(files) == 1:
-        logging.info(f"Using '{files[0]}' as {file_type.__class__.__name__} file.")
-        return files[0] if not multiple_files else files
-    else:
-        if not multiple_files:
-            # Fail if multiple files are possible
-            raise MdwizRuntimeError(
-                StatusCode.FileError, file_type.multiple_files_error_msg()
-            )
-        return files
+            if not multiple_files:
+                # Fail if multiple files are possible
+                raise MdwizRuntimeError(
+                    StatusCode.FileError, file_type.multiple_files_error_msg()
+                )
+            return files
 
 
-def main() -> StatusCode:
+def configure_logging(level: int = logging.DEBUG):
     # Configure the general output format and warnings
     logging.basicConfig(
-        stream=sys.stderr, format="[%(levelname)s] %(message)s", level=logging.DEBUG
+        stream=sys.stderr, format="[%(levelname)s] %(message)s", level=level
     )
     logging.captureWarnings(True)
     warnings.formatwarning = lambda message, category, filename, lineno, line: message
 
+
+def main(argv: Optional[Sequence[str]] = None) -> StatusCode:
+    configure_logging()
+    argv = sys.argv[1:] if argv is None else argv
+
+    # Dispatch the sub commands, which would be ambiguous with the Markdown files otherwise
+    if len(argv) > 0 and argv[0] == "batch":
+        from mdwiz import batch
+
+        return batch.main(argv[1:])
+    elif len(argv) > 0 and argv[0] == "serve":
+        from mdwiz import server
+
+        return server.main(argv[1:])
+    elif len(argv) > 0 and argv[0] == "worker":
+        from mdwiz import spool
+
+        return spool.main(argv[1:])
+
+    arguments = build_parser().parse_args(argv)
+
+    # Let a running server do the work, if available
+    if "MDWIZ_SOCKET" in os.environ and not arguments.watch:
+        from mdwiz import server
+
+        status_code = server.forward(os.environ["MDWIZ_SOCKET"], argv)
+        if status_code is not None:
+            return status_code
+
+    return run(arguments)
+
+
+def build_parser() -> argparse.ArgumentParser:
     # Parse command line arguments
     parser = argparse.ArgumentParser(
         prog=NAME, description=DESCRIPTION, add_help=True, allow_abbrev=True
@@ -116,8 +177,10 @@ def main() -> StatusCode:
     )
     parser.add_argument(
         "--bibliography",
-        help="An optional bibliography for the output. If not specified, it is determined automatically.",
+        help="An optional bibliography for the output. If not specified, it is determined automatically. If given "
+        "multiple times, the bibliographies are merged, preferring the entries of the first one defining a key.",
         type=str,
+        action="append",
     )
     parser.add_argument(
         "--output",
@@ -125,62 +188,670 @@ def main() -> StatusCode:
         type=str,
         default="",
     )
+    parser.add_argument(
+        "--to",
+        help="The comma-separated formats to render, i.e. 'latex,html,docx'. The Markdown is parsed only once for all "
+        "of them.",
+        type=str,
+        default="latex",
+    )
+    for option, description in (
+            ("output", "output file"),
+            ("template", "template"),
+            ("csl", "CSL style"),
+    ):
+        parser.add_argument(
+            f"--target-{option}",
+            help=f"The {description} of a single format, given as 'FORMAT=PATH'.",
+            type=str,
+            action="append",
+            default=[],
+        )
     parser.add_argument(
         "--csl",
         help="A definition file for the Citation Style Language.",
         type=str,
         default="",
     )
+    parser.add_argument(
+        "--no-cache",
+        help="Always run pandoc, even if the same inputs were converted before.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--chapters",
+        help="Convert multiple Markdown files chapter by chapter in parallel, reconverting only changed chapters.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--jobs",
+        help="The maximal number of concurrent pandoc processes. Defaults to the number of CPUs.",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--check-only",
+        help="Only check that all citations are part of the bibliography, without converting the document.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch",
+        help="Keep running and convert again whenever one of the used files changes.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--pdf",
+        help="Typeset the LaTeX into a PDF, reusing the auxiliary files of earlier builds. Optionally, the path of the "
+        "PDF, which defaults to the name of the output or the first Markdown file.",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+    )
+    parser.add_argument(
+        "--pdf-engine",
+        help="The TeX engine typesetting the PDF.",
+        choices=("pdflatex", "xelatex", "lualatex"),
+        default="pdflatex",
+    )
+    parser.add_argument(
+        "--timings",
+        help="Print the time spent in each stage of the conversion to stderr.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--trace-json",
+        help="Write the stages of the conversion as Chrome trace into the given file.",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--in-process-filters",
+        help="Parse the document once and apply the pandoc filters within mdwiz instead of separate processes.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--python-filter",
+        help="A Python function given as 'module:function' applied to the pandoc AST after the default filters. "
+        "Implies --in-process-filters.",
+        type=str,
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--prune-bibliography",
+        help="Pass only the cited entries of the bibliography to pandoc-citeproc and biber.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--prepare-assets",
+        help="Convert SVG images into PDF and downscale large rasters before the conversion, caching the results. "
+        "Requires 'rsvg-convert' or 'cairosvg' and 'Pillow'.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--asset-dpi",
+        help="The resolution rasters are downscaled to with --prepare-assets, relative to the width of the text.",
+        type=int,
+        default=300,
+    )
+    parser.add_argument(
+        "--deps",
+        help="Write the inputs of the conversion, including images, included files and tables, for build systems. "
+        "Written as JSON if the file ends with '.json' and as Makefile fragment otherwise.",
+        type=str,
+        default=None,
+    )
 
-    arguments = parser.parse_args()
+    return parser
 
-    # Check dependencies
-    if not Converter.is_available():
-        logging.error("Pandoc is not installed. Please install to proceed.")
-        return StatusCode.MissingDependency
-    elif not Bibliography.is_available():
-        logging.error("Pandoc-citeproc is not installed. Please install to proceed.")
-        return StatusCode.MissingDependency
+
+def run(
+        arguments: argparse.Namespace,
+        cwd: Optional[Path] = None,
+        output: Optional[Callable[[str], None]] = None,
+        files: Optional[ResolvedFiles] = None,
+) -> StatusCode:
+    """
+    Convert a single document.
+
+    :param arguments: The parsed command line arguments.
+    :param cwd: The directory to search the files in, which defaults to the current working directory.
+    :param output: Receives the converted document if no output file is specified, instead of stdout or clipboard.
+    :param files: The files as resolved by 'resolve_files' before, which skips their discovery.
+    :return: The status of the conversion.
+    """
+    cwd = cwd if cwd is not None else Path.cwd()
+    if not arguments.timings and arguments.trace_json is None:
+        return _run(arguments, cwd, output, files)
+
+    with timing.Recorder() as recorder:
+        status_code = _run(arguments, cwd, output, files)
+    if arguments.timings:
+        # Logged, so server clients receive the summary as well
+        logging.info(f"Timings:\n{recorder.summary()}")
+    if arguments.trace_json is not None:
+        recorder.write_trace(cwd / arguments.trace_json)
+    return status_code
+
+
+def resolve_files(
+        arguments: argparse.Namespace, cwd: Path, cache: Optional["Cache"]
+) -> ResolvedFiles:
+    """
+    Determine the files of a conversion, which are either given explicitly or discovered in the working directory.
+
+    :return: The Markdown files, the bibliographies, the template and the CSL style.
+    """
+    from mdwiz.filetypes.bibliography import Bibliography as BibliographyFileType
+    from mdwiz.filetypes.csl import Csl
+    from mdwiz.filetypes.index import FileIndex
+    from mdwiz.filetypes.markdown import Markdown
+    from mdwiz.filetypes.template import Template
+
+    # Walk the directory only once for all the file types which are not explicitly specified
+    index = None
+    if not all(
+            (arguments.markdown, arguments.bibliography, arguments.template, arguments.csl)
+    ):
+        with timing.span("file index", "discovery"):
+            index = (
+                FileIndex.load(cwd, cache) if cache is not None else FileIndex.build(cwd)
+            )
+
+    markdown_file = get_file(
+        Markdown(),
+        input=arguments.markdown,
+        required=True,
+        recursive=False,
+        multiple_files=True,
+        root=cwd,
+        index=index,
+    )
+    citation_file = get_file(
+        BibliographyFileType(),
+        input=arguments.bibliography,
+        reference_file=markdown_file,
+        multiple_files=arguments.bibliography is not None
+        and len(arguments.bibliography) > 1,
+        root=cwd,
+        index=index,
+    )
+    if citation_file is None:
+        bibliographies = []
+    elif isinstance(citation_file, list):
+        bibliographies = citation_file
+    else:
+        bibliographies = [citation_file]
+    template_file = get_file(
+        Template(),
+        input=arguments.template,
+        reference_file=markdown_file,
+        root=cwd,
+        index=index,
+    )
+    csl_file = get_file(
+        Csl(),
+        input=arguments.csl,
+        reference_file=markdown_file,
+        root=cwd,
+        index=index,
+    )
+    return list(markdown_file), bibliographies, template_file, csl_file
+
+
+def _run(
+        arguments: argparse.Namespace,
+        cwd: Path,
+        output: Optional[Callable[[str], None]],
+        files: Optional[ResolvedFiles] = None,
+) -> StatusCode:
+    from mdwiz.bibliography import Bibliography
+    from mdwiz.cache import Cache
+    from mdwiz.converter import Converter
+
+    cache = None if arguments.no_cache else Cache.default()
 
     try:
         # Load the files of interest and create a Converter object with them
-        markdown_file = get_file(
-            Markdown(),
-            input=arguments.markdown,
-            required=True,
-            recursive=False,
-            multiple_files=True,
+        markdown_file, bibliographies, template_file, csl_file = (
+            files if files is not None else resolve_files(arguments, cwd, cache)
         )
+
+        # Multiple bibliographies are merged into a single one passed to pandoc
+        bibliography_sources = None
+        citation_file = bibliographies[0] if len(bibliographies) == 1 else None
+        if len(bibliographies) > 1:
+            bibliography_sources = bibliographies
+            citation_file = merge_bibliographies(
+                bibliography_sources, cache, markdown_file[0].parent
+            )
         converter = Converter(
             markdown_file,
-            citation_file=get_file(
-                BibliographyFileType(),
-                input=arguments.bibliography,
-                reference_file=markdown_file,
-            ),
-            template_file=get_file(
-                Template(), input=arguments.template, reference_file=markdown_file
-            ),
-            csl_file=get_file(
-                Csl(), input=arguments.csl, reference_file=markdown_file
-            ),
+            citation_file=citation_file,
+            template_file=template_file,
+            csl_file=csl_file,
+            cache=cache,
+            in_process_filters=arguments.in_process_filters
+            or len(arguments.python_filter) > 0,
+            prune_bibliography=arguments.prune_bibliography,
+            assets=create_asset_stage(arguments, cache, markdown_file[0].parent),
         )
+        if len(arguments.python_filter) > 0:
+            from mdwiz.filters import FilterPipeline
+
+            try:
+                converter.pipeline.filters.extend(
+                    FilterPipeline.load(specification)
+                    for specification in arguments.python_filter
+                )
+            except (ImportError, AttributeError, ValueError) as ex:
+                raise MdwizRuntimeError(
+                    StatusCode.FileError, f"Unable to load filter: {ex}"
+                )
+        targets = get_targets(converter, arguments, cwd)
     except MdwizRuntimeError as runtime_error:
         runtime_error.log()
         return runtime_error.status_code
 
-    # Convert the file
+    if arguments.check_only:
+        return check(converter)
+
+    # Check dependencies. BibTeX is parsed natively, but pandoc relies on pandoc-citeproc for CSL.
+    if not Converter.is_available():
+        logging.error("Pandoc is not installed. Please install to proceed.")
+        return StatusCode.MissingDependency
+    elif (
+            citation_file is not None
+            and Bibliography.get_type(str(citation_file)) == Bibliography.BibType.Csl
+            and not Bibliography.is_available()
+    ):
+        logging.error("Pandoc-citeproc is not installed. Please install to proceed.")
+        return StatusCode.MissingDependency
+    elif not arguments.watch:
+        status_code = convert(
+            converter, arguments, cwd=cwd, output=output, targets=targets
+        )
+        if status_code.is_successfull() and arguments.deps is not None:
+            write_dependencies(
+                converter, arguments, cwd, targets, bibliography_sources
+            )
+        return status_code
+
+    # Keep the resolved files and rebuild whenever one of them changes
+    from mdwiz.dependencies import Dependencies
+    from mdwiz.watch import Watcher
+
+    # Report the missing references after each change, not only once
+    warnings.simplefilter("always", Converter.MissingReferenceWarning)
+
+    watcher = Watcher(
+        [
+            *markdown_file,
+            *(
+                file
+                for file in (citation_file, template_file, csl_file)
+                if file is not None
+            ),
+            *(bibliography_sources or ()),
+            *Dependencies.scan(markdown_file),
+        ]
+    )
+    try:
+        while True:
+            if bibliography_sources is not None:
+                try:
+                    merge_bibliographies(
+                        bibliography_sources, cache, markdown_file[0].parent
+                    )
+                except MdwizRuntimeError as runtime_error:
+                    runtime_error.log()
+            status_code = convert(
+                converter, arguments, cwd=cwd, output=output, targets=targets
+            )
+            if status_code.is_successfull() and arguments.deps is not None:
+                write_dependencies(
+                    converter, arguments, cwd, targets, bibliography_sources
+                )
+            logging.info(f"Conversion finished ({status_code.name}), watching for changes.")
+            changed_files = watcher.wait()
+            logging.info(
+                f"Changed: {', '.join(file.name for file in sorted(changed_files))}"
+            )
+    except KeyboardInterrupt:
+        return StatusCode.Success
+    finally:
+        watcher.close()
+
+
+def check(converter: "Converter") -> StatusCode:
+    try:
+        missing_references = converter.missing_references()
+    except Exception as ex:
+        logging.error(str(ex))
+        return StatusCode.FileError
+
+    if len(missing_references) > 0:
+        logging.error(str(converter.MissingReferenceWarning(missing_references)))
+        return StatusCode.MissingReference
+
+    logging.info("All citations are part of the bibliography.")
+    return StatusCode.Success
+
+
+def get_targets(
+        converter: "Converter", arguments: argparse.Namespace, cwd: Path
+) -> Optional[Sequence["Converter.Target"]]:
+    """
+    Collect the formats to render with their settings.
+
+    :return: The targets or None, if only LaTeX is rendered in the common way.
+    """
+    formats = [
+        output_format.strip()
+        for output_format in arguments.to.split(",")
+        if len(output_format.strip()) > 0
+    ]
+    settings = {}
+    for option in ("output", "template", "csl"):
+        for setting in getattr(arguments, f"target_{option}"):
+            output_format, separator, path = setting.partition("=")
+            if len(separator) == 0 or output_format not in formats:
+                raise MdwizRuntimeError(
+                    StatusCode.FileError,
+                    f"Invalid setting '{setting}', expected 'FORMAT=PATH' for one of {', '.join(formats)}.",
+                )
+            path = cwd / path
+            if option != "output" and not path.is_file():
+                raise MdwizRuntimeError(
+                    StatusCode.FileError, f"Provided file '{path}' not found!"
+                )
+            settings.setdefault(output_format, {})[option] = path
+    if formats == ["latex"] and len(settings) == 0:
+        return None
+
+    targets = []
+    for output_format in formats:
+        target = converter.Target(
+            output_format,
+            output=settings.get(output_format, {}).get("output"),
+            template_file=settings.get(output_format, {}).get("template"),
+            csl_file=settings.get(output_format, {}).get("csl"),
+        )
+
+        # Without explicit output file, all but a single textual format are written next to the document
+        if target.output is None and (len(formats) > 1 or target.is_binary()):
+            base = (
+                cwd / arguments.output
+                if len(arguments.output) > 0
+                else cwd / f"{converter.markdown_files[0].stem}.tex"
+            )
+            target.output = base.with_suffix(f".{target.extension()}")
+        elif target.output is None and len(arguments.output) > 0:
+            target.output = cwd / arguments.output
+        targets.append(target)
+    return targets
+
+
+def convert(
+        converter: "Converter",
+        arguments: argparse.Namespace,
+        cwd: Optional[Path] = None,
+        output: Optional[Callable[[str], None]] = None,
+        targets: Optional[Sequence["Converter.Target"]] = None,
+) -> StatusCode:
+    if targets is not None:
+        if arguments.pdf is not None:
+            logging.warning("A PDF is only built if LaTeX is the single format.")
+        return convert_targets(converter, targets, arguments, output=output)
+
+    # Convert the file, streaming it to its destination if possible
+    if arguments.chapters:
+
+        def write(sink):
+            sink.write(converter.convert_chapters(jobs=arguments.jobs))
+
+    else:
+        write = converter.convert_to
+
+    if arguments.pdf is not None:
+        return build_pdf(
+            converter, write, arguments, cwd if cwd is not None else Path.cwd()
+        )
+
     try:
-        converted_file = converter.convert()
+        if len(arguments.output) > 0:
+            from mdwiz.cache import atomic_writer
+
+            output_file = (cwd if cwd is not None else Path.cwd()) / arguments.output
+            with timing.span("output", target="file"):
+                with atomic_writer(output_file, encoding="utf-8") as file:
+                    write(file)
+        elif output is None and not sys.stdout.isatty():
+            with timing.span("output", target="stdout"):
+                write(sys.stdout)
+                # Like 'print_output', which terminated the document by a newline before it was streamed
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+        else:
+            buffer = io.StringIO()
+            write(buffer)
+            target = "clipboard" if output is None else "client"
+            with timing.span("output", target=target):
+                (output if output is not None else print_output)(buffer.getvalue())
+    except UnicodeEncodeError:
+        # Some hacks for Windows to fix the bugs regarding IO
+        if os.name == "nt":
+            logging.warning(
+                "Unable to output due to Windows console issue, use --output as bugfix. No output written."
+            )
     except Exception as ex:
         logging.error(str(ex))
         return StatusCode.PandocError
 
-    # Copy the converted file to the clipboard if called correctly or write it into the command line pipeline.
+    if converter.in_process_filters:
+        for name, duration in converter.pipeline.timings:
+            logging.info(f"Filter '{name}' took {duration:.3f} s.")
+        converter.pipeline.timings.clear()
+
+    return StatusCode.Success
+
+
+def build_pdf(
+        converter: "Converter",
+        write: Callable[[TextIO], None],
+        arguments: argparse.Namespace,
+        cwd: Path,
+) -> StatusCode:
+    from mdwiz.cache import atomic_writer
+    from mdwiz.pdf import PdfBuilder
+
+    builder = PdfBuilder.for_document(
+        converter.markdown_files[0].parent,
+        engine=arguments.pdf_engine,
+        cache=converter.cache,
+    )
+    if not builder.is_available():
+        logging.error(
+            f"{arguments.pdf_engine} is not installed. Please install to proceed."
+        )
+        return StatusCode.MissingDependency
+
+    try:
+        latex = io.StringIO()
+        write(latex)
+        latex = latex.getvalue()
+    except Exception as ex:
+        logging.error(str(ex))
+        return StatusCode.PandocError
+
+    output_file, pdf_file = output_files(converter, arguments, cwd)
     if len(arguments.output) > 0:
-        with Path(arguments.output).open("w", encoding="utf-8") as file:
-            file.write(converted_file)
-    elif sys.stdout.isatty():
+        with atomic_writer(output_file, encoding="utf-8") as file:
+            file.write(latex)
+
+    try:
+        result = builder.build(
+            latex,
+            output_file.stem,
+            converter.markdown_files[0].parent,
+            bibliographies=(
+                {converter.citation_file: converter.pruned_bibliography}
+                if converter.pruned_bibliography is not None
+                else None
+            ),
+        )
+    except PdfBuilder.BuildError as ex:
+        logging.error(f"Typesetting failed:\n{ex}")
+        return StatusCode.TexError
+
+    with atomic_writer(pdf_file) as file, result.pdf_file.open("rb") as pdf:
+        shutil.copyfileobj(pdf, file)
+    if result.passes == 0:
+        logging.info(f"PDF is up to date: '{pdf_file}'.")
+    else:
+        logging.info(
+            f"Built '{pdf_file}' in {result.passes} passes"
+            f"{' with bibliography' if result.bibliography else ''}."
+        )
+    return StatusCode.Success
+
+
+def merge_bibliographies(
+        sources: Sequence[Path], cache: Optional["Cache"], document_directory: Path
+) -> Path:
+    """
+    Merge the bibliographies into the one passed to pandoc, whose entries are taken from the first source defining
+    them.
+    """
+    from mdwiz.store import BibliographyStore
+
+    directory = (
+        cache.directory / "bibliographies"
+        if cache is not None
+        else document_directory / ".mdwiz-build" / "bibliographies"
+    )
+    with BibliographyStore.for_cache(cache) as store:
+        try:
+            merged_file = store.consolidate(sources, directory)
+        except ValueError as ex:
+            raise MdwizRuntimeError(StatusCode.FileError, str(ex))
+        duplicates = store.duplicates(sources)
+
+    for duplicate in duplicates:
+        if not duplicate.identical:
+            logging.warning(f"{duplicate}, using the first one.")
+    identical = sum(1 for duplicate in duplicates if duplicate.identical)
+    if identical > 0:
+        logging.info(f"Skipped the duplicates of {identical} identical entries.")
+    logging.info(f"Merged {len(sources)} bibliographies into '{merged_file}'.")
+    return merged_file
+
+
+def create_asset_stage(
+        arguments: argparse.Namespace,
+        cache: Optional["Cache"],
+        document_directory: Path,
+) -> Optional["AssetStage"]:
+    if not arguments.prepare_assets:
+        return None
+    from mdwiz.assets import AssetStage
+
+    return AssetStage(
+        cache=cache,
+        directory=document_directory / ".mdwiz-build" / "assets",
+        dpi=arguments.asset_dpi,
+        jobs=arguments.jobs,
+    )
+
+
+def output_files(
+        converter: "Converter", arguments: argparse.Namespace, cwd: Path
+) -> Tuple[Path, Path]:
+    """
+    Determine the LaTeX and PDF file, which default to the name of the first Markdown file.
+    """
+    output_file = cwd / (
+        arguments.output
+        if len(arguments.output) > 0
+        else f"{converter.markdown_files[0].stem}.tex"
+    )
+    pdf_file = (
+        cwd / arguments.pdf
+        if arguments.pdf is not None and len(arguments.pdf) > 0
+        else output_file.with_suffix(".pdf")
+    )
+    return output_file, pdf_file
+
+
+def write_dependencies(
+        converter: "Converter",
+        arguments: argparse.Namespace,
+        cwd: Path,
+        targets: Optional[Sequence["Converter.Target"]] = None,
+        bibliographies: Optional[Sequence[Path]] = None,
+):
+    from mdwiz.dependencies import Manifest
+
+    if targets is not None:
+        # Formats written to stdout are named like the files they would be written to
+        outputs = [
+            target.output
+            if target.output is not None
+            else cwd / f"{converter.markdown_files[0].stem}.{target.extension()}"
+            for target in targets
+        ]
+    else:
+        output_file, pdf_file = output_files(converter, arguments, cwd)
+        outputs = [pdf_file] if arguments.pdf is not None else []
+        if arguments.pdf is None or len(arguments.output) > 0:
+            outputs.insert(0, output_file)
+
+    directory = converter.markdown_files[0].parent
+    if bibliographies is None and converter.citation_file is not None:
+        bibliographies = [directory / converter.citation_file]
+    manifest = Manifest(
+        outputs,
+        converter.markdown_files,
+        bibliographies or (),
+        *(
+            directory / file if file is not None else None
+            for file in (converter.template_file, converter.csl_file)
+        ),
+    )
+    try:
+        manifest.write(cwd / arguments.deps, cwd)
+    except OSError as ex:
+        logging.error(f"Unable to write the dependencies: {ex}")
+
+
+def convert_targets(
+        converter: "Converter",
+        targets: Sequence["Converter.Target"],
+        arguments: argparse.Namespace,
+        output: Optional[Callable[[str], None]] = None,
+) -> StatusCode:
+    try:
+        converted_files = converter.convert_targets(targets, jobs=arguments.jobs)
+    except Exception as ex:
+        logging.error(str(ex))
+        return StatusCode.PandocError
+
+    for target in targets:
+        if target.output is not None:
+            logging.info(f"Written {target.output_format} to '{target.output}'.")
+        else:
+            (output if output is not None else print_output)(
+                converted_files[target.output_format]
+            )
+    return StatusCode.Success
+
+
+def print_output(converted_file: str):
+    # Copy the converted file to the clipboard if called correctly or write it into the command line pipeline.
+    if sys.stdout.isatty():
+        import pyperclip
+
         pyperclip.copy(converted_file)
     else:
         try:
@@ -192,9 +863,6 @@ def main() -> StatusCode:
                     "Unable to output due to Windows console issue, use --output as bugfix. No output written."
                 )
 
-    return StatusCode.Success
-
-
 if __name__ == "__main__":
     result = main()
     if result is not StatusCode.Success:
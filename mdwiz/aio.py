@@ -0,0 +1,217 @@
+"""
+Asynchronous variants of the conversion for services running many of them on one event loop. Pandoc and
+pandoc-citeproc run as asyncio subprocesses, which are killed as soon as their task is cancelled or times out, while
+the parsing within mdwiz runs in the default executor.
+"""
+
+import asyncio
+import contextlib
+import functools
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Sequence, Union
+
+from mdwiz import timing
+from mdwiz.bibliography import Bibliography
+from mdwiz.converter import Converter
+from mdwiz.text import TextConverter
+
+if TYPE_CHECKING:
+    from mdwiz.filters import FilterPipeline
+
+
+async def run_process(
+    command: Sequence[str],
+    cwd: Optional[Union[Path, str]] = None,
+    source: Optional[str] = None,
+    timeout: Optional[float] = None,
+):
+    """
+    Run a process to its end without blocking the event loop.
+
+    :param command: The executable and its arguments.
+    :param cwd: The working directory of the process.
+    :param source: Written to stdin, if specified.
+    :param timeout: The number of seconds until the process is killed and a TimeoutError raised.
+    :return: The return code and the decoded stdout and stderr.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=(
+            asyncio.subprocess.DEVNULL if source is None else asyncio.subprocess.PIPE
+        ),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=None if cwd is None else str(cwd),
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            process.communicate(None if source is None else source.encode("utf-8")),
+            timeout=timeout,
+        )
+    except BaseException:
+        # Cancelled or timed out: Never leave the child running
+        with contextlib.suppress(ProcessLookupError):
+            process.kill()
+        await asyncio.shield(process.wait())
+        raise
+    return process.returncode, stdout.decode("utf-8"), stderr.decode("utf-8")
+
+
+async def run_pandoc(
+    parameters: Sequence[str],
+    cwd: Path,
+    files: Sequence[Path] = (),
+    source: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    return_code, stdout, stderr = await run_process(
+        ["pandoc", *parameters, *[str(file) for file in files]],
+        cwd=cwd,
+        source=source,
+        timeout=timeout,
+    )
+    if return_code != 0:
+        raise Converter.PandocException(stderr, return_code)
+    return stdout
+
+
+class AsyncConverter:
+    """
+    Convert documents with a Converter without blocking the event loop.
+
+    :param converter: The configured conversion.
+    :param limiter: Shared by all conversions which should not run more pandoc processes concurrently than its value.
+    :param timeout: The number of seconds each pandoc process may take.
+    """
+
+    def __init__(
+        self,
+        converter: Converter,
+        limiter: Optional[asyncio.Semaphore] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.converter = converter
+        self.limiter = limiter
+        self.timeout = timeout
+
+    async def convert(self) -> str:
+        loop = asyncio.get_running_loop()
+        converter = self.converter
+
+        # Reading the sources and the bibliography may take a while for big documents
+        await loop.run_in_executor(None, timing.inherit(converter._prepare))
+        if converter.cache is None:
+            return await self._convert()
+
+        key = await loop.run_in_executor(None, converter.cache_key)
+        cached = await loop.run_in_executor(None, converter.cache.get, key)
+        if cached is not None:
+            if converter.assets is not None:
+                # Recreates the prepared images referenced by the output, if evicted from the cache meanwhile
+                await loop.run_in_executor(None, timing.inherit(converter._input))
+            return cached.decode("utf-8")
+
+        latex_output = await self._convert()
+        await loop.run_in_executor(
+            None, converter.cache.put, key, latex_output.encode("utf-8")
+        )
+        return latex_output
+
+    async def _convert(self) -> str:
+        converter = self.converter
+        # The prepared images are part of the cache key, so the Markdown has to reference them
+        files, source = await asyncio.get_running_loop().run_in_executor(
+            None, timing.inherit(converter._input)
+        )
+        # Without limiter, an empty exit stack stands in for the semaphore
+        async with self.limiter or contextlib.AsyncExitStack():
+            return await _run_filtered(
+                converter.pipeline if converter.in_process_filters else None,
+                list(converter),
+                converter.markdown_files[0].parent,
+                files=files,
+                source=source,
+                timeout=self.timeout,
+            )
+
+
+async def convert_text(
+    converter: TextConverter,
+    markdown: Union[str, bytes],
+    limiter: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Convert Markdown held in memory like TextConverter.convert does, without blocking the event loop.
+    """
+    parameters, source = converter._prepare(markdown)
+    async with limiter or contextlib.AsyncExitStack():
+        return await _run_filtered(
+            converter.pipeline if converter.in_process_filters else None,
+            parameters,
+            converter.cwd,
+            source=source,
+            timeout=timeout,
+        )
+
+
+async def _run_filtered(
+    pipeline: Optional["FilterPipeline"],
+    parameters: Sequence[str],
+    cwd: Path,
+    files: Sequence[Path] = (),
+    source: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Like Converter._run_filtered, but the filters run in the default executor between both pandoc processes.
+    """
+    if pipeline is None:
+        return await run_pandoc(
+            parameters, cwd, files=files, source=source, timeout=timeout
+        )
+
+    document = await run_pandoc(
+        Converter._reader_parameters(parameters),
+        cwd,
+        files=files,
+        source=source,
+        timeout=timeout,
+    )
+    document = await asyncio.get_running_loop().run_in_executor(
+        None,
+        timing.inherit(
+            functools.partial(
+                Converter._filter_document, pipeline, document, parameters, cwd
+            )
+        ),
+    )
+    return await run_pandoc(
+        Converter._writer_parameters(parameters), cwd, source=document, timeout=timeout
+    )
+
+
+async def bibliography_from_file(
+    bibliography: Union[Path, str], cwd: Optional[str] = None
+) -> Bibliography:
+    """
+    Parse a bibliography in the default executor, as the native parsers are CPU-bound.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, Bibliography.from_file, bibliography, cwd
+    )
+
+
+async def bibliography_from_pandoc_citeproc(
+    bibliography: Union[Path, str],
+    cwd: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Bibliography:
+    return_code, stdout, stderr = await run_process(
+        ["pandoc-citeproc", "--bib2json", str(bibliography)], cwd=cwd, timeout=timeout
+    )
+    if return_code != 0:
+        raise RuntimeError(stderr)
+    parsed_data = json.loads(stdout)
+    return Bibliography([(citation["id"], citation) for citation in parsed_data])
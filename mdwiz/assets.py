@@ -0,0 +1,231 @@
+"""
+Prepare the images of a document before its conversion: SVG files are converted into PDF, which LaTeX includes
+directly, and rasters with more pixels than required for the configured resolution are downscaled. The results are
+stored by the hash of their content, so each image is processed only once, and the images are processed concurrently.
+The Markdown passed to pandoc references the prepared images instead of the original ones.
+"""
+
+import functools
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence
+
+from mdwiz import timing
+from mdwiz.cache import Cache, atomic_writer
+from mdwiz.dependencies import GRAPHIC_EXTENSIONS, iter_references, resolve
+
+RASTER_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# The widest an image is printed in inches, as the templates scale larger images down to the line width
+TEXT_WIDTH = 6.5
+
+
+class AssetStage:
+    """
+    Prepare the images referenced by Markdown, which requires 'rsvg-convert' or the 'cairosvg' package for SVG files and
+    the 'Pillow' package for rasters. Images are kept as they are if the tools are missing.
+
+    :param cache: Stores the prepared images, shared by all documents.
+    :param directory: The directory the prepared images are stored in if there is no cache.
+    :param dpi: The resolution rasters are downscaled to, relative to the width of the text.
+    :param jobs: The maximal number of images processed concurrently. Defaults to the number of CPUs.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[Cache] = None,
+        directory: Optional[Path] = None,
+        dpi: int = 300,
+        jobs: Optional[int] = None,
+    ):
+        if cache is None and directory is None:
+            raise ValueError("Either a cache or a directory is required")
+        self.cache = cache
+        self.directory = directory
+        self.dpi = dpi
+        self.jobs = jobs or os.cpu_count() or 1
+
+    def fingerprint(self) -> str:
+        return ":".join(
+            (
+                "assets",
+                str(self.dpi),
+                _svg_converter() or "",
+                getattr(_pillow(), "__version__", ""),
+            )
+        )
+
+    @timing.timed("prepare assets")
+    def rewrite(self, sources: Sequence[str], directory: Path) -> List[str]:
+        """
+        Prepare the images referenced by the Markdown sources and replace their paths by those of the prepared ones.
+
+        :param sources: The Markdown sources, which reference files relative to the directory.
+        :param directory: The directory relative paths refer to.
+        :return: The sources referencing the prepared images.
+        """
+        references = [
+            [
+                (resolve(directory, reference, GRAPHIC_EXTENSIONS), start, end)
+                for kind, reference, start, end in iter_references(source)
+                if kind in ("image", "graphic")
+            ]
+            for source in sources
+        ]
+        images = list(
+            dict.fromkeys(
+                image
+                for source_references in references
+                for image, _, _ in source_references
+                if image is not None
+            )
+        )
+        prepared = self.prepare(images)
+
+        rewritten = []
+        for source, source_references in zip(sources, references):
+            parts = []
+            position = 0
+            for image, start, end in source_references:
+                if image is None or prepared[image] == image:
+                    continue
+                parts.append(source[position:start])
+                parts.append(AssetStage._reference(source, start, prepared[image]))
+                position = end
+            parts.append(source[position:])
+            rewritten.append("".join(parts))
+        return rewritten
+
+    def prepare(self, images: Sequence[Path]) -> Dict[Path, Path]:
+        """
+        Prepare the images concurrently.
+
+        :return: The prepared image of each image, which is the image itself if it is fine as it is.
+        """
+        if len(images) == 0:
+            return {}
+        jobs = min(self.jobs, len(images))
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return dict(
+                zip(images, executor.map(timing.inherit(self._prepare), images))
+            )
+
+    def _prepare(self, image: Path) -> Path:
+        suffix = image.suffix.lower()
+        if suffix == ".svg":
+            if _svg_converter() is None:
+                logging.warning(
+                    f"Unable to convert '{image}', install 'rsvg-convert' or 'cairosvg'."
+                )
+                return image
+            return self._store(
+                image, ".pdf", lambda file: _convert_svg(image, file)
+            )
+        elif suffix in RASTER_EXTENSIONS and _pillow() is not None:
+            with timing.span("inspect image", "assets"):
+                with _pillow().open(image) as raster:
+                    if raster.width <= self._max_width():
+                        return image
+            return self._store(
+                image, suffix, lambda file: self._downscale(image, file)
+            )
+        return image
+
+    def _store(
+        self, image: Path, suffix: str, write: Callable[[BinaryIO], None]
+    ) -> Path:
+        """
+        Look up the prepared image by the content of the original one, preparing it if it is missing.
+        """
+        key = (
+            Cache.key("asset", Cache.hash_file(image), suffix, self.fingerprint())
+            + suffix
+        )
+        with timing.span(f"prepare {image.name}", "assets"):
+            if self.cache is not None:
+                path = self.cache.lookup(key)
+                if path is None:
+                    with self.cache.writer(key) as file:
+                        write(file)
+                    path = self.cache.lookup(key)
+                return path
+
+            path = self.directory / key
+            if not path.is_file():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with atomic_writer(path) as file:
+                    write(file)
+            return path
+
+    def _max_width(self) -> int:
+        return int(self.dpi * TEXT_WIDTH)
+
+    def _downscale(self, image: Path, file: BinaryIO):
+        pillow = _pillow()
+        with pillow.open(image) as raster:
+            width = self._max_width()
+            height = max(1, round(raster.height * width / raster.width))
+            # LaTeX derives the natural size from the resolution, which has to shrink with the number of pixels
+            dpi = tuple(
+                value * width / raster.width
+                for value in raster.info.get("dpi", (72, 72))
+            )
+            image_format = raster.format
+            resampling = getattr(pillow, "Resampling", pillow)
+            resized = raster.resize((width, height), resampling.LANCZOS)
+        resized.save(file, format=image_format, dpi=dpi)
+
+    @staticmethod
+    def _reference(source: str, start: int, image: Path) -> str:
+        """
+        Format the path of a prepared image, which Markdown requires in angle brackets if it contains spaces.
+        """
+        path = image.as_posix()
+        bracketed = start > 0 and source[start - 1] == "<"
+        if " " in path and not bracketed and source[start - 2 : start] == "](":
+            return f"<{path}>"
+        return path
+
+
+def _convert_svg(image: Path, file: BinaryIO):
+    if _svg_converter() == "rsvg-convert":
+        result = subprocess.run(
+            ["rsvg-convert", "--format=pdf", str(image)],
+            stdout=file,
+            stderr=subprocess.PIPE,
+            shell=False,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Unable to convert '{image}': {result.stderr.decode(errors='replace')}"
+            )
+    else:
+        import cairosvg
+
+        cairosvg.svg2pdf(url=str(image), write_to=file)
+
+
+@functools.lru_cache(maxsize=None)
+def _svg_converter() -> Optional[str]:
+    if shutil.which("rsvg-convert") is not None:
+        return "rsvg-convert"
+    try:
+        import cairosvg  # noqa: F401
+    except (ImportError, OSError):
+        # cairosvg fails with OSError if the Cairo library is missing
+        return None
+    return "cairosvg"
+
+
+@functools.lru_cache(maxsize=None)
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        logging.debug("Package 'Pillow' is not available, rasters are not downscaled.")
+        return None
+    return Image
@@ -0,0 +1,135 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from mdwiz import NAME
+from mdwiz.__main__ import StatusCode, build_parser, configure_logging, run
+from mdwiz.filetypes.markdown import Markdown
+
+
+def discover(roots: Sequence[Path], exclude: Sequence[Path] = ()) -> List[Path]:
+    """
+    Find the document roots, i.e. the directories directly containing Markdown files. As the conversion of a document
+    only collects the Markdown files directly inside its directory, each subdirectory containing Markdown files is a
+    document on its own, even below another document. Hidden directories and files which cannot be accessed, i.e.
+    broken symbolic links, are skipped.
+
+    :param roots: The directories to search.
+    :param exclude: Directories which are never searched, i.e. the output directory.
+    :return: The document roots in a stable order.
+    """
+    extensions = frozenset(f".{extension}" for extension in Markdown().file_extensions())
+    exclude = frozenset(path.resolve() for path in exclude)
+
+    documents = []
+    for root in roots:
+        for directory, directories, files in os.walk(root):
+            directory = Path(directory)
+            if any(
+                Path(file).suffix in extensions and _size(directory / file) >= 5
+                for file in files
+            ):
+                documents.append(directory)
+            directories[:] = sorted(
+                name
+                for name in directories
+                if not name.startswith(".")
+                and (directory / name).resolve() not in exclude
+            )
+    return documents
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError as error:
+        logging.warning(f"Skipping '{path}': {error}")
+        return 0
+
+
+def main(argv: Sequence[str]) -> StatusCode:
+    parser = argparse.ArgumentParser(
+        prog=f"{NAME} batch",
+        description="Convert all documents below the given directories concurrently. Unknown arguments are passed "
+        "to the conversion of each document.",
+    )
+    parser.add_argument(
+        "roots", help="The directories to search for documents.", type=str, nargs="+"
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="The directory the converted documents are written to, mirroring the structure of the roots.",
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        "--workers",
+        help="The number of documents converted concurrently. Defaults to the number of CPUs.",
+        type=int,
+        default=None,
+    )
+    arguments, document_arguments = parser.parse_known_args(argv)
+
+    # Check the forwarded arguments before starting any worker
+    build_parser().parse_args(document_arguments)
+
+    output_directory = Path(arguments.output_dir).absolute()
+    roots = [Path(root).absolute() for root in arguments.roots]
+    jobs = []
+    for root in roots:
+        for document in discover([root], exclude=[output_directory]):
+            relative_path = document.relative_to(root)
+            output = output_directory / root.name / relative_path
+            jobs.append((document, output / f"{document.name}.tex"))
+
+    if len(jobs) == 0:
+        logging.error("No documents found.")
+        return StatusCode.FileError
+
+    logging.info(f"Converting {len(jobs)} documents.")
+    start = time.perf_counter()
+    status_codes = []
+    with ProcessPoolExecutor(
+        max_workers=arguments.workers,
+        initializer=configure_logging,
+        initargs=(logging.WARNING,),
+    ) as executor:
+        futures = [
+            executor.submit(convert_document, document, output, document_arguments)
+            for document, output in jobs
+        ]
+        for future in as_completed(futures):
+            document, status_code, duration = future.result()
+            status_codes.append(status_code)
+            log = logging.info if status_code.is_successfull() else logging.error
+            log(f"{document}: {status_code.name} ({duration:.2f} s)")
+
+    status_code = StatusCode.combine(status_codes)
+    failed = sum(1 for code in status_codes if not code.is_successfull())
+    logging.info(
+        f"Converted {len(jobs) - failed} of {len(jobs)} documents in {time.perf_counter() - start:.2f} s."
+    )
+    return status_code
+
+
+def convert_document(
+        document: Path, output: Path, arguments: Sequence[str]
+) -> Tuple[Path, StatusCode, float]:
+    """
+    Convert a single document in a worker process.
+    """
+    start = time.perf_counter()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        status_code = run(
+            build_parser().parse_args([*arguments, "--output", str(output)]),
+            cwd=document,
+        )
+    except Exception as ex:
+        logging.error(f"{document}: {ex}")
+        status_code = StatusCode.FileError
+    return document, status_code, time.perf_counter() - start
@@ -1,3 +1,4 @@
+import functools
 import json
 import re
 import shutil
@@ -6,6 +7,9 @@ from enum import Enum
 from pathlib import Path
 from typing import FrozenSet, Union, Iterable, Optional
 
+from mdwiz import bibtex, csljson, timing
+from mdwiz.cache import Cache
+
 
 class Bibliography(dict):
     class BibType(Enum):
@@ -40,36 +44,169 @@ class Bibliography(dict):
                 yield value.strip()
 
     @staticmethod
+    @timing.timed("bibliography")
     def from_file(
             bibliography: Union[Path, str], cwd: Optional[str] = None
     ) -> "Bibliography":
-        bibliography = (
-            bibliography if isinstance(bibliography, Path) else Path(bibliography)
-        )
+        """
+        Parse a bibliography into CSL-JSON entries. BibTeX files are parsed natively, use 'bibtex.parse' for their raw
+        fields.
+        """
+        bibliography = Bibliography._resolve(bibliography, cwd)
         if bibliography.suffix == ".bib":
-            parsed_data = subprocess.run(
-                ["pandoc-citeproc", "--bib2json", str(bibliography)],
-                capture_output=True,
-                shell=False,
-                text=True,
-                encoding="utf-8",
-                cwd=cwd,
+            entries = bibtex.parse(bibliography)
+            return Bibliography(
+                (key, bibtex.to_csl(key, entry)) for key, entry in entries.items()
             )
-
-            if parsed_data.returncode != 0:
-                raise RuntimeError(parsed_data.stderr)
-            else:
-                parsed_data = json.loads(parsed_data.stdout, encoding="utf-8")
         elif bibliography.suffix == ".json":
-            with bibliography.open("r", encoding="utf-8") as json_file:
-                parsed_data = json.load(json_file)
+            return Bibliography(
+                (citation["id"], citation)
+                for citation in csljson.iter_entries(bibliography)
+            )
         else:
             raise NotImplementedError(
                 f"Software does not know how to parse bibliography with extension '{bibliography.suffix}'"
             )
 
+    @staticmethod
+    @timing.timed("pandoc-citeproc", "subprocess")
+    def from_pandoc_citeproc(
+            bibliography: Union[Path, str], cwd: Optional[str] = None
+    ) -> "Bibliography":
+        """
+        Parse a bibliography into CSL-JSON entries using the external 'pandoc-citeproc'.
+        """
+        parsed_data = subprocess.run(
+            ["pandoc-citeproc", "--bib2json", str(bibliography)],
+            capture_output=True,
+            shell=False,
+            text=True,
+            encoding="utf-8",
+            cwd=cwd,
+        )
+
+        if parsed_data.returncode != 0:
+            raise RuntimeError(parsed_data.stderr)
+        parsed_data = json.loads(parsed_data.stdout)
         return Bibliography([(citation["id"], citation) for citation in parsed_data])
 
     @staticmethod
+    @timing.timed("bibliography keys")
+    def keys_from_file(
+            bibliography: Union[Path, str],
+            cwd: Optional[str] = None,
+            cache: Optional[Cache] = None,
+    ) -> FrozenSet[str]:
+        """
+        Load only the citation keys of a bibliography, reusing the keys parsed by an earlier run if possible.
+
+        :param bibliography: The bibliography file, relative to 'cwd' if specified.
+        :param cwd: The working directory of the conversion.
+        :param cache: The cache for the parsed keys or None to parse the file in any case.
+        :return: The keys of all entries.
+        """
+        if cache is None:
+            return Bibliography._parse_keys(bibliography, cwd)
+
+        path = Bibliography._resolve(bibliography, cwd)
+        stat = path.stat()
+        return Bibliography._cached_keys(
+            path.absolute(), stat.st_size, stat.st_mtime_ns, cache
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _cached_keys(
+            path: Path, size: int, mtime_ns: int, cache: Cache
+    ) -> FrozenSet[str]:
+        # Long-living processes keep the keys of the recently used bibliographies in memory, too
+        key = Cache.key(
+            "bibliography-keys",
+            str(path),
+            str(size),
+            str(mtime_ns),
+            Cache.hash_file(path),
+        )
+
+        # Keys are stored NUL-separated, as they may contain nearly any other character
+        cached = cache.get(key)
+        if cached is not None:
+            return frozenset(cached.decode("utf-8").split("\0")) if cached else frozenset()
+
+        keys = Bibliography._parse_keys(path, None)
+        cache.put(key, "\0".join(sorted(keys)).encode("utf-8"))
+        return keys
+
+    @staticmethod
+    @timing.timed("prune bibliography")
+    def prune(
+            bibliography: Union[Path, str],
+            keys: FrozenSet[str],
+            cwd: Optional[str] = None,
+            cache: Optional[Cache] = None,
+            directory: Optional[Path] = None,
+    ) -> Path:
+        """
+        Write a bibliography containing only the given entries, which pandoc processes much faster than a big shared
+        one.
+
+        :param bibliography: The BibTeX or CSL-JSON file, relative to 'cwd' if specified.
+        :param keys: The keys of the entries to keep. Entries they inherit from are kept as well.
+        :param cwd: The working directory of the conversion.
+        :param cache: Stores the pruned bibliography for later runs.
+        :param directory: The directory the pruned bibliography is written to if there is no cache.
+        :return: The pruned bibliography, which has the extension of the original one.
+        """
+        path = Bibliography._resolve(bibliography, cwd)
+        if cache is None:
+            pruned = directory / path.name
+            pruned.write_text(Bibliography._pruned(path, keys), encoding="utf-8")
+            return pruned
+
+        key = (
+            Cache.key(
+                "pruned-bibliography",
+                str(path.absolute()),
+                Cache.hash_file(path),
+                *sorted(keys),
+            )
+            + path.suffix
+        )
+        pruned = cache.lookup(key)
+        if pruned is None:
+            cache.put(key, Bibliography._pruned(path, keys).encode("utf-8"))
+            pruned = cache.lookup(key)
+        return pruned
+
+    @staticmethod
+    def _pruned(bibliography: Path, keys: FrozenSet[str]) -> str:
+        if bibliography.suffix == ".bib":
+            return bibtex.prune(bibliography, keys)
+        kept = [
+            text for key, text in csljson.iter_blocks(bibliography) if key in keys
+        ]
+        return f"[{', '.join(kept)}]"
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
     def is_available() -> bool:
         return shutil.which("pandoc-citeproc") is not None
+
+    @staticmethod
+    def _parse_keys(bibliography: Union[Path, str], cwd: Optional[str]) -> FrozenSet[str]:
+        bibliography = Bibliography._resolve(bibliography, cwd)
+        # Avoid keeping the entries, as only the keys are of interest
+        if bibliography.suffix == ".bib":
+            return frozenset(bibtex.iter_keys(bibliography))
+        elif bibliography.suffix == ".json":
+            return frozenset(csljson.iter_keys(bibliography))
+        return frozenset(Bibliography.from_file(bibliography).keys())
+
+    @staticmethod
+    def _resolve(bibliography: Union[Path, str], cwd: Optional[str]) -> Path:
+        bibliography = (
+            bibliography if isinstance(bibliography, Path) else Path(bibliography)
+        )
+        if cwd is not None:
+            bibliography = Path(cwd) / bibliography
+        return bibliography
@@ -0,0 +1,565 @@
+"""
+A streaming parser for BibTeX files, which does not require pandoc-citeproc.
+"""
+
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+Entry = Dict[str, str]
+
+MONTHS = {
+    "jan": "January",
+    "feb": "February",
+    "mar": "March",
+    "apr": "April",
+    "may": "May",
+    "jun": "June",
+    "jul": "July",
+    "aug": "August",
+    "sep": "September",
+    "oct": "October",
+    "nov": "November",
+    "dec": "December",
+}
+
+# The CSL types of the entry types, following pandoc-citeproc
+CSL_TYPES = {
+    "article": "article-journal",
+    "book": "book",
+    "booklet": "pamphlet",
+    "inbook": "chapter",
+    "incollection": "chapter",
+    "inproceedings": "paper-conference",
+    "conference": "paper-conference",
+    "manual": "book",
+    "mastersthesis": "thesis",
+    "phdthesis": "thesis",
+    "thesis": "thesis",
+    "proceedings": "book",
+    "techreport": "report",
+    "report": "report",
+    "unpublished": "manuscript",
+    "online": "webpage",
+    "electronic": "webpage",
+    "www": "webpage",
+    "patent": "patent",
+}
+
+# The CSL variables of the fields, which are copied as they are
+CSL_FIELDS = {
+    "title": "title",
+    "publisher": "publisher",
+    "school": "publisher",
+    "institution": "publisher",
+    "organization": "publisher",
+    "address": "publisher-place",
+    "location": "publisher-place",
+    "volume": "volume",
+    "edition": "edition",
+    "series": "collection-title",
+    "chapter": "chapter-number",
+    "doi": "DOI",
+    "url": "URL",
+    "isbn": "ISBN",
+    "issn": "ISSN",
+    "abstract": "abstract",
+    "note": "note",
+    "keywords": "keyword",
+    "language": "language",
+}
+
+CSL_NAMES = ("author", "editor", "translator")
+
+# The fields naming the entries whose fields are inherited
+PARENT_REGEX = re.compile(
+    r"\b(?:crossref|xdata)\s*=\s*(?:\{([^{}]*)\}|\"([^\"]*)\"|([^\s,{}\"]+))",
+    re.IGNORECASE,
+)
+
+
+class ParseError(ValueError):
+    def __init__(self, msg: str, line: int):
+        super().__init__(f"{msg} (line {line})")
+        self.line = line
+
+
+class _Scanner:
+    """
+    A cursor over a text stream, which is read in chunks and never held completely in memory.
+    """
+
+    BRACE_REGEX = re.compile(r"[{}]")
+    PAREN_REGEX = re.compile(r'[{}()"]')
+    IDENTIFIER_REGEX = re.compile(r"[^\s\"#%'(),={}]+")
+    WHITESPACE_REGEX = re.compile(r"\s*")
+
+    def __init__(self, stream: TextIO, chunk_size: int = 1024 * 1024):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._position = 0
+        self._line = 1
+        self._eof = False
+
+    @property
+    def line(self) -> int:
+        return self._line + self._buffer.count("\n", 0, self._position)
+
+    def peek(self) -> str:
+        if not self._ensure(1):
+            return ""
+        return self._buffer[self._position]
+
+    def advance(self, count: int = 1):
+        self._position += count
+
+    def skip_whitespace(self):
+        while self._ensure(1):
+            match = _Scanner.WHITESPACE_REGEX.match(self._buffer, self._position)
+            self._position = match.end()
+            if self._position < len(self._buffer):
+                return
+
+    def skip_to(self, character: str) -> bool:
+        """
+        Move behind the next occurrence of the character.
+        """
+        while self._ensure(1):
+            index = self._buffer.find(character, self._position)
+            if index != -1:
+                self._position = index + 1
+                return True
+            self._position = len(self._buffer)
+        return False
+
+    def identifier(self) -> str:
+        # Identifiers are short, so ensure enough look-ahead to not split one between chunks
+        self._ensure(1024)
+        match = _Scanner.IDENTIFIER_REGEX.match(self._buffer, self._position)
+        if match is None:
+            return ""
+        self._position = match.end()
+        return match.group(0)
+
+    def read_until(self, characters: str) -> str:
+        """
+        Read up to (but not including) the next of the given characters.
+        """
+        parts = []
+        while self._ensure(1):
+            start = self._position
+            while (
+                self._position < len(self._buffer)
+                and self._buffer[self._position] not in characters
+            ):
+                self._position += 1
+            parts.append(self._buffer[start : self._position])
+            if self._position < len(self._buffer):
+                break
+        return "".join(parts)
+
+    def balanced(self, closing: str, keep: bool = True) -> Optional[str]:
+        """
+        Read up to the closing delimiter of the current block, which must be on brace depth zero.
+
+        :param closing: Either '}' for blocks opened by a brace or ')' for blocks opened by a parenthesis.
+        :param keep: Return the content. If false, the content is skipped without copying it.
+        :return: The content without the closing delimiter.
+        """
+        regex = _Scanner.BRACE_REGEX if closing == "}" else _Scanner.PAREN_REGEX
+        parts = [] if keep else None
+        depth = 0
+        quoted = False
+        while self._ensure(1):
+            match = regex.search(self._buffer, self._position)
+            end = match.start() if match is not None else len(self._buffer)
+            if keep:
+                parts.append(self._buffer[self._position : end])
+            self._position = end
+            if match is None:
+                continue
+
+            character = match.group(0)
+            self._position += 1
+            if character == "{":
+                depth += 1
+            elif character == "}":
+                if depth == 0:
+                    if closing == "}":
+                        return "".join(parts) if keep else None
+                    raise ParseError("Unbalanced braces", self.line)
+                depth -= 1
+            elif character == '"' and depth == 0:
+                quoted = not quoted
+            elif character == ")" and depth == 0 and not quoted:
+                return "".join(parts) if keep else None
+
+            if keep:
+                parts.append(character)
+        raise ParseError("Unexpected end of file", self.line)
+
+    def _ensure(self, count: int) -> bool:
+        """
+        Make sure at least 'count' characters are buffered, if the stream contains them.
+        """
+        if len(self._buffer) - self._position >= count:
+            return True
+
+        # Drop the consumed part of the buffer
+        self._line += self._buffer.count("\n", 0, self._position)
+        self._buffer = self._buffer[self._position :]
+        self._position = 0
+        while not self._eof and len(self._buffer) < count:
+            chunk = self._stream.read(self._chunk_size)
+            if len(chunk) == 0:
+                self._eof = True
+            self._buffer += chunk
+        return len(self._buffer) > 0
+
+
+def _open(source: Union[Path, str, TextIO]):
+    if isinstance(source, (Path, str)):
+        return open(source, "r", encoding="utf-8")
+    return _NoClose(source)
+
+
+class _NoClose:
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def __enter__(self) -> TextIO:
+        return self.stream
+
+    def __exit__(self, *args):
+        pass
+
+
+def _entries(
+    scanner: _Scanner, keys_only: bool, strings: Dict[str, str]
+) -> Iterator[Tuple[str, Optional[Entry]]]:
+    while scanner.skip_to("@"):
+        # Everything outside of entries is a comment
+        scanner.skip_whitespace()
+        entry_type = scanner.identifier().lower()
+        scanner.skip_whitespace()
+        opening = scanner.peek()
+        if opening not in ("{", "("):
+            continue
+        scanner.advance()
+        closing = "}" if opening == "{" else ")"
+
+        if entry_type in ("comment", "preamble"):
+            scanner.balanced(closing, keep=False)
+        elif entry_type == "string":
+            if keys_only:
+                scanner.balanced(closing, keep=False)
+            else:
+                fields = _fields(scanner, closing, strings)
+                strings.update(fields)
+        else:
+            scanner.skip_whitespace()
+            key = scanner.read_until(",}) \t\r\n").strip()
+            scanner.skip_whitespace()
+            if scanner.peek() == ",":
+                scanner.advance()
+
+            if keys_only:
+                scanner.balanced(closing, keep=False)
+                yield key, None
+            else:
+                entry = _fields(scanner, closing, strings)
+                entry["ENTRYTYPE"] = entry_type
+                yield key, entry
+
+
+def _fields(scanner: _Scanner, closing: str, strings: Dict[str, str]) -> Entry:
+    fields = {}
+    while True:
+        scanner.skip_whitespace()
+        character = scanner.peek()
+        if character == closing:
+            scanner.advance()
+            return fields
+        elif character == ",":
+            scanner.advance()
+            continue
+        elif character == "":
+            raise ParseError("Unexpected end of file", scanner.line)
+
+        name = scanner.identifier().lower()
+        if len(name) == 0:
+            raise ParseError(f"Unexpected character '{character}'", scanner.line)
+        scanner.skip_whitespace()
+        if scanner.peek() != "=":
+            raise ParseError(f"Missing value of field '{name}'", scanner.line)
+        scanner.advance()
+        fields[name] = _value(scanner, strings)
+
+
+def _value(scanner: _Scanner, strings: Dict[str, str]) -> str:
+    parts = []
+    while True:
+        scanner.skip_whitespace()
+        character = scanner.peek()
+        if character == "{":
+            scanner.advance()
+            parts.append(scanner.balanced("}"))
+        elif character == '"':
+            scanner.advance()
+            parts.append(_quoted(scanner))
+        else:
+            token = scanner.identifier()
+            if len(token) == 0:
+                raise ParseError("Missing value", scanner.line)
+            if token.isdigit():
+                parts.append(token)
+            else:
+                parts.append(strings.get(token.lower(), MONTHS.get(token.lower(), "")))
+
+        scanner.skip_whitespace()
+        if scanner.peek() != "#":
+            return "".join(parts)
+        scanner.advance()
+
+
+def _quoted(scanner: _Scanner) -> str:
+    parts = []
+    while True:
+        parts.append(scanner.read_until('{"'))
+        character = scanner.peek()
+        if character == '"':
+            scanner.advance()
+            return "".join(parts)
+        elif character == "{":
+            scanner.advance()
+            parts.append("{" + scanner.balanced("}") + "}")
+        else:
+            raise ParseError("Unterminated string", scanner.line)
+
+
+def iter_keys(source: Union[Path, str, TextIO]) -> Iterator[str]:
+    """
+    Stream the keys of all entries without building the entries themselves.
+
+    >>> import io
+    >>> list(iter_keys(io.StringIO('@string{a = "b"} @comment{x} @article{key1, title={{A} b}} @book(key2, t="c")')))
+    ['key1', 'key2']
+    """
+    with _open(source) as stream:
+        for key, _ in _entries(_Scanner(stream), True, {}):
+            yield key
+
+
+def iter_entries(source: Union[Path, str, TextIO]) -> Iterator[Tuple[str, Entry]]:
+    """
+    Stream all entries with their fields. Abbreviations defined by '@string' are expanded, but cross references are
+    not resolved, as the parent may follow later.
+
+    >>> import io
+    >>> list(iter_entries(io.StringIO('@string{pub = "Press"} @book{k, publisher = pub # " Ltd", year = 2019}')))
+    [('k', {'publisher': 'Press Ltd', 'year': '2019', 'ENTRYTYPE': 'book'})]
+    """
+    with _open(source) as stream:
+        yield from _entries(_Scanner(stream), False, {})
+
+
+def iter_blocks(
+    source: Union[Path, str, TextIO]
+) -> Iterator[Tuple[str, Optional[str], str]]:
+    """
+    Stream the blocks of the file as they are written, without parsing their fields.
+
+    >>> import io
+    >>> list(iter_blocks(io.StringIO('Text @string{a = "b"} @article{key1, title={{A} b}}')))
+    [('string', None, '@string{a = "b"}'), ('article', 'key1', '@article{key1, title={{A} b}}')]
+
+    :return: The lower-case type, the key of entries or None and the text of each block.
+    """
+    with _open(source) as stream:
+        scanner = _Scanner(stream)
+        while scanner.skip_to("@"):
+            scanner.skip_whitespace()
+            entry_type = scanner.identifier()
+            scanner.skip_whitespace()
+            opening = scanner.peek()
+            if opening not in ("{", "("):
+                continue
+            scanner.advance()
+            closing = "}" if opening == "{" else ")"
+            content = scanner.balanced(closing)
+
+            key = None
+            if entry_type.lower() not in ("comment", "preamble", "string"):
+                key = content.split(",", 1)[0].strip()
+            yield entry_type.lower(), key, f"@{entry_type}{opening}{content}{closing}"
+
+
+def prune(source: Union[Path, str], keys: Iterable[str]) -> str:
+    """
+    Extract the entries with the given keys, the entries they inherit from and all '@string' and '@preamble' blocks,
+    keeping the order of the file.
+
+    :param source: The BibTeX file, which is read once more for each level of cross references.
+    :param keys: The keys of the entries of interest.
+    :return: The text of the pruned bibliography.
+    """
+    wanted = set(keys)
+    kept: Dict[int, str] = {}
+    while True:
+        missing = set()
+        for index, (entry_type, key, text) in enumerate(iter_blocks(source)):
+            if index in kept:
+                continue
+            if entry_type in ("string", "preamble"):
+                kept[index] = text
+            elif key is not None and key in wanted:
+                kept[index] = text
+                missing.update(parents(text))
+
+        missing.difference_update(wanted)
+        if len(missing) == 0:
+            break
+        wanted.update(missing)
+
+    return "".join(f"{kept[index]}\n\n" for index in sorted(kept))
+
+
+def parents(text: str) -> List[str]:
+    """
+    Find the keys of the entries an entry inherits from by 'crossref' or 'xdata'.
+
+    >>> parents('@inbook{c, crossref = {p}, xdata = "x1, x2"}')
+    ['p', 'x1', 'x2']
+    """
+    return [
+        parent.strip()
+        for match in PARENT_REGEX.finditer(text)
+        for parent in (match.group(1) or match.group(2) or match.group(3)).split(",")
+        if len(parent.strip()) > 0
+    ]
+
+
+def parse(source: Union[Path, str, TextIO]) -> Dict[str, Entry]:
+    """
+    Parse all entries and resolve their cross references.
+
+    >>> import io
+    >>> entries = parse(io.StringIO('@inbook{c, crossref = {p}, title = {C}} @book{p, title = {P}, year = 2000}'))
+    >>> entries['c']['year'], entries['c']['title'], entries['c']['booktitle']
+    ('2000', 'C', 'P')
+    """
+    entries = dict(iter_entries(source))
+    resolve_crossrefs(entries)
+    return entries
+
+
+def to_csl(key: str, entry: Entry) -> Dict[str, Any]:
+    """
+    Convert a parsed entry into the CSL-JSON shape pandoc-citeproc produces for the most common fields.
+
+    >>> import io
+    >>> entry = parse(io.StringIO('@article{k, author = {Doe, John and Jane {van} Roe}, title = {{The} Title},'
+    ...                           ' journal = {J}, year = 2019, month = mar, pages = {1--2}}'))['k']
+    >>> csl = to_csl('k', entry)
+    >>> csl['type'], csl['title'], csl['container-title'], csl['page'], csl['issued']
+    ('article-journal', 'The Title', 'J', '1-2', {'date-parts': [[2019, 3]]})
+    >>> csl['author']
+    [{'family': 'Doe', 'given': 'John'}, {'family': 'van Roe', 'given': 'Jane'}]
+    """
+    entry_type = entry.get("ENTRYTYPE", "misc")
+    csl: Dict[str, Any] = {"id": key, "type": CSL_TYPES.get(entry_type, "no-type")}
+
+    for name, variable in CSL_FIELDS.items():
+        if name in entry and variable not in csl:
+            csl[variable] = _plain(entry[name])
+    for name in CSL_NAMES:
+        if name in entry:
+            csl[name] = [_name(value) for value in _split_names(entry[name])]
+
+    container = entry.get("journal", entry.get("journaltitle", entry.get("booktitle")))
+    if container is not None and entry_type not in ("book", "proceedings"):
+        csl["container-title"] = _plain(container)
+    if "number" in entry:
+        csl["issue" if entry_type == "article" else "number"] = _plain(entry["number"])
+    if "pages" in entry:
+        csl["page"] = _plain(entry["pages"]).replace("--", "-")
+
+    issued = _date(entry)
+    if issued is not None:
+        csl["issued"] = {"date-parts": [issued]}
+    return csl
+
+
+def _plain(value: str) -> str:
+    # Braces only protect the case for BibTeX
+    return re.sub(r"(?<!\\)[{}]", "", value).strip()
+
+
+def _split_names(value: str) -> List[str]:
+    names, depth, start = [], 0, 0
+    for match in re.finditer(r"[{}]|\s+and\s+", value, re.IGNORECASE):
+        token = match.group(0)
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+        elif depth == 0:
+            names.append(value[start : match.start()])
+            start = match.end()
+    names.append(value[start:])
+    return [name.strip() for name in names if len(name.strip()) > 0]
+
+
+def _name(value: str) -> Dict[str, str]:
+    if value.startswith("{") and value.endswith("}") and value.count("{") == 1:
+        return {"literal": _plain(value)}
+    if "," in value:
+        family, given = value.split(",", 1)
+    else:
+        parts = value.rsplit(" ", 1)
+        # Lower-case particles like 'van' belong to the family name
+        while len(parts) == 2 and " " in parts[0]:
+            given, particle = parts[0].rsplit(" ", 1)
+            if not _plain(particle)[:1].islower():
+                break
+            parts = [given, f"{particle} {parts[1]}"]
+        given, family = parts if len(parts) == 2 else ("", parts[0])
+    name = {"family": _plain(family)}
+    if len(given.strip()) > 0:
+        name["given"] = _plain(given)
+    return name
+
+
+def _date(entry: Entry) -> Optional[List[int]]:
+    if "date" in entry:
+        parts = re.findall(r"\d+", entry["date"].split("/", 1)[0])
+        return [int(part) for part in parts[:3]] if len(parts) > 0 else None
+
+    year = re.search(r"\d+", entry.get("year", ""))
+    if year is None:
+        return None
+    month = entry.get("month", "").strip()
+    numbers = {full: index + 1 for index, full in enumerate(MONTHS.values())}
+    if month.isdigit():
+        return [int(year.group(0)), int(month)]
+    elif month in numbers:
+        return [int(year.group(0)), numbers[month]]
+    return [int(year.group(0))]
+
+
+def resolve_crossrefs(entries: Dict[str, Entry]):
+    """
+    Inherit missing fields from the entries referenced by 'crossref', as BibTeX does. The title of the parent is
+    available as 'booktitle'.
+    """
+    for entry in entries.values():
+        parent = entries.get(entry.get("crossref", None))
+        if parent is None:
+            continue
+        for name, value in parent.items():
+            if name == "ENTRYTYPE":
+                continue
+            entry.setdefault(name, value)
+        if "title" in parent:
+            entry.setdefault("booktitle", parent["title"])
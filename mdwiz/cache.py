@@ -0,0 +1,244 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import BinaryIO, IO, Iterator, Optional, Tuple, Union
+
+
+def _umask() -> int:
+    # Only readable by setting it, so it is read once before any other thread creates files
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _umask()
+
+
+@contextlib.contextmanager
+def atomic_writer(
+    path: Union[Path, str], encoding: Optional[str] = None
+) -> Iterator[IO]:
+    """
+    Open a temporary file next to the given path, which replaces it only once everything was written successfully.
+    Hence, readers never see a partially written file and a failure keeps the old one. The file keeps the mode of the
+    replaced one or gets the default mode of new files, instead of the private one of temporary files.
+
+    :param path: The file to write.
+    :param encoding: The encoding of a text file or None for a binary file.
+    :return: The opened temporary file.
+    """
+    path = Path(path)
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    handle, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+    try:
+        os.chmod(tmp_path, mode)
+        if encoding is None:
+            file = os.fdopen(handle, "wb")
+        else:
+            file = os.fdopen(handle, "w", encoding=encoding)
+        with file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class Cache:
+    """
+    A content-addressed cache on the file system which evicts the least recently used entries once it grows too big.
+    """
+
+    DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+    # The writes after which the size is determined again, as other processes write into the cache as well
+    SCAN_INTERVAL = 64
+
+    def __init__(self, directory: Union[Path, str], max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+        # The size of the cache as of the last scan plus the entries written since then
+        self._size: Optional[int] = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default() -> "Cache":
+        """
+        Create the cache in the directory given by MDWIZ_CACHE_DIR or in the platform-specific user cache.
+        """
+        directory = os.environ.get("MDWIZ_CACHE_DIR")
+        if directory is None:
+            if os.name == "nt" and "LOCALAPPDATA" in os.environ:
+                directory = Path(os.environ["LOCALAPPDATA"]) / "mdwiz" / "cache"
+            else:
+                directory = (
+                    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+                    / "mdwiz"
+                )
+        return Cache(directory)
+
+    @staticmethod
+    def key(*parts: Union[None, str, bytes]) -> str:
+        """
+        Hash the given parts into a key. Each part is length-prefixed, so ('ab', 'c') and ('a', 'bc') differ.
+
+        >>> Cache.key('ab', 'c') == Cache.key('a', 'bc')
+        False
+
+        :param parts: The values which identify an entry.
+        :return: A hexadecimal digest.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if part is None:
+                part = b"\x00"
+            elif isinstance(part, str):
+                part = part.encode("utf-8")
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_file(path: Union[Path, str], chunk_size: int = 1024 * 1024) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        file = self.open(key)
+        if file is None:
+            return None
+        with file:
+            return file.read()
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """
+        Open an entry for reading it in chunks.
+
+        :param key: The key of the entry.
+        :return: The opened file, which the caller has to close, or None if there is no such entry.
+        """
+        path = self._path(key)
+        try:
+            file = path.open("rb")
+        except FileNotFoundError:
+            return None
+
+        # Mark the entry as recently used for the eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return file
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """
+        Find the file of an entry, i.e. to pass it to another process. Keys may end with an extension that process
+        expects.
+
+        :param key: The key of the entry.
+        :return: The path of the entry or None, if there is no such entry.
+        """
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes):
+        with self.writer(key) as file:
+            file.write(data)
+
+    @contextlib.contextmanager
+    def writer(self, key: str) -> Iterator[BinaryIO]:
+        """
+        Write an entry in chunks. It is only stored if the block finishes without an exception.
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write atomically, so concurrent readers never see partial entries
+        with atomic_writer(path) as file:
+            yield file
+
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        with self._lock:
+            self._writes += 1
+            if self._size is not None:
+                self._size += size
+            scan = (
+                self._size is None
+                or self._size > self.max_size
+                or self._writes >= Cache.SCAN_INTERVAL
+            )
+        if scan:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits into its maximal size. Directories like the
+        persistent PDF builds are entries as well, which were last used when any of their files was.
+        """
+        entries = []
+        total_size = 0
+        for path in self.directory.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                if path.is_dir():
+                    mtime, size = Cache._directory_usage(path)
+                else:
+                    stat = path.stat()
+                    mtime, size = stat.st_mtime_ns, stat.st_size
+            except FileNotFoundError:
+                continue
+            entries.append((mtime, size, path))
+            total_size += size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            total_size -= size
+
+        with self._lock:
+            self._size = total_size
+            self._writes = 0
+
+    @staticmethod
+    def _directory_usage(directory: Path) -> Tuple[int, int]:
+        """
+        :return: The latest modification of the directory or its files and their total size.
+        """
+        mtime = directory.stat().st_mtime_ns
+        size = 0
+        for root, _, files in os.walk(directory):
+            for file in files:
+                try:
+                    stat = os.stat(os.path.join(root, file))
+                except FileNotFoundError:
+                    continue
+                mtime = max(mtime, stat.st_mtime_ns)
+                size += stat.st_size
+        return mtime, size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
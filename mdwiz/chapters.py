@@ -0,0 +1,137 @@
+import re
+from pathlib import Path
+from typing import FrozenSet, Sequence
+
+
+class Chapter:
+    """
+    A single Markdown file of a multi-file document, prepared for being converted on its own.
+    """
+
+    # Paragraphs which survive the conversion unchanged and mark where the fragments are cut or spliced
+    BODY_PLACEHOLDER = "MDWIZCHAPTERBODY"
+    END_MARKER = "MDWIZCHAPTEREND"
+
+    LABEL_REGEX = re.compile(r"\{#((?:fig|eq|tbl|sec):[\w:.\-]*\w)")
+    REFERENCE_REGEX = re.compile(r"@((?:fig|eq|tbl|sec):[\w:.\-]*\w)")
+    FRONT_MATTER_REGEX = re.compile(
+        r"\A\s*(---[ \t]*\n.*?\n(?:---|\.\.\.)[ \t]*)(?:\n|\Z)", re.DOTALL
+    )
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.text = path.read_text(encoding="utf-8")
+
+    def labels(self) -> FrozenSet[str]:
+        """
+        Collect the pandoc-xnos labels defined in this chapter.
+
+        >>> sorted(Chapter.from_text("![A](a.png){#fig:a}\\n\\n$$x$$ {#eq:b}").labels())
+        ['eq:b', 'fig:a']
+        """
+        return frozenset(Chapter.LABEL_REGEX.findall(self.text))
+
+    def references(self) -> FrozenSet[str]:
+        """
+        Collect the pandoc-xnos labels referenced in this chapter.
+
+        >>> sorted(Chapter.from_text("See @fig:a, {+@eq:b} and @doe.").references())
+        ['eq:b', 'fig:a']
+        """
+        return frozenset(Chapter.REFERENCE_REGEX.findall(self.text))
+
+    def front_matter(self) -> str:
+        """
+        Extract the leading YAML metadata block, which is required for the document wrapper.
+
+        >>> Chapter.from_text("---\\ntitle: A\\n---\\n\\n# Chapter").front_matter()
+        '---\\ntitle: A\\n---'
+        """
+        match = Chapter.FRONT_MATTER_REGEX.match(self.text)
+        return match.group(1) if match is not None else ""
+
+    def source(self, foreign_labels: FrozenSet[str], metadata: str = "") -> str:
+        r"""
+        Create the Markdown to convert. Labels defined in other chapters get stub definitions behind the end marker,
+        so pandoc-xnos turns the references into LaTeX references resolved by TeX instead of citations.
+
+        >>> print(Chapter.from_text("# Results").source(frozenset(), "---\nlang: de\n---"))
+        ---
+        lang: de
+        ---
+        <BLANKLINE>
+        # Results
+
+        :param foreign_labels: All the labels defined in the other chapters.
+        :param metadata: The metadata of the whole document as built by 'metadata', which the filters and pandoc
+            render the chapter with like the whole document.
+        :return: The Markdown source of the chapter.
+        """
+        stubs = sorted(self.references().intersection(foreign_labels) - self.labels())
+        parts = [metadata] if len(metadata) > 0 else []
+        parts.append(self.text)
+        if len(stubs) > 0:
+            parts.append(Chapter.END_MARKER)
+            parts.extend(Chapter._stub(label) for label in stubs)
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def metadata(chapters: Sequence["Chapter"]) -> str:
+        """
+        Combine the metadata blocks of all chapters, which pandoc merges like those of multiple input files.
+        """
+        front_matters = [chapter.front_matter() for chapter in chapters]
+        return "\n\n".join(matter for matter in front_matters if len(matter) > 0)
+
+    @staticmethod
+    def wrapper(chapters: Sequence["Chapter"]) -> str:
+        """
+        Create a document which contains the metadata of all chapters but only a placeholder as body.
+        """
+        metadata = Chapter.metadata(chapters)
+        if len(metadata) == 0:
+            return Chapter.BODY_PLACEHOLDER
+        return "\n\n".join((metadata, Chapter.BODY_PLACEHOLDER))
+
+    @staticmethod
+    def cut(fragment: str) -> str:
+        """
+        Remove the converted stubs from a fragment.
+
+        >>> Chapter.cut("Text\\n\\nMDWIZCHAPTEREND\\n\\n\\\\begin{figure}")
+        'Text\\n'
+        """
+        position = fragment.find(Chapter.END_MARKER)
+        if position == -1:
+            return fragment
+        return fragment[:position].rstrip() + "\n"
+
+    @staticmethod
+    def splice(wrapper: str, fragments: Sequence[str]) -> str:
+        position = wrapper.find(Chapter.BODY_PLACEHOLDER)
+        if position == -1:
+            raise ValueError("The template dropped the document body")
+        return (
+            wrapper[:position]
+            + "\n".join(fragments)
+            + wrapper[position + len(Chapter.BODY_PLACEHOLDER):]
+        )
+
+    @staticmethod
+    def from_text(text: str, path: Path = Path("chapter.md")) -> "Chapter":
+        chapter = Chapter.__new__(Chapter)
+        chapter.path = path
+        chapter.text = text
+        return chapter
+
+    @staticmethod
+    def _stub(label: str) -> str:
+        kind = label.split(":", 1)[0]
+        if kind == "fig":
+            return f"![stub](stub.png){{#{label}}}"
+        elif kind == "eq":
+            return f"$$0$$ {{#{label}}}"
+        elif kind == "tbl":
+            return f"| a |\n|---|\n| 0 |\n\n: stub {{#{label}}}"
+        else:
+            return f"# stub {{#{label}}}"
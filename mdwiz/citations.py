@@ -0,0 +1,111 @@
+"""
+Find the citations of Markdown sources as pandoc does, without converting them.
+"""
+
+import re
+from pathlib import Path
+from typing import FrozenSet, Iterable, Iterator, Optional
+
+# Pandoc keys start with an alphanumeric character and may contain punctuation, but not at their end
+CITATION_REGEX = re.compile(
+    r"(?<![\w\\])@(?:\{([^{}\s]+)\}|(\w(?:[\w:.#$%&\-+?<>~/]*\w)?))"
+)
+INLINE_CODE_REGEX = re.compile(r"(`+).+?\1")
+FENCE_REGEX = re.compile(r"^\s{0,3}(`{3,}|~{3,})")
+XNOS_PREFIXES = ("fig:", "eq:", "tbl:", "sec:")
+
+
+def iter_citations(text: str) -> Iterator[str]:
+    """
+    Yield the keys of all citations in the order of their occurrence in a single pass. Code, comments, the YAML
+    front matter and references of pandoc-xnos are skipped.
+
+    >>> list(iter_citations("@doe says [see @a1, p. 4; -@a2]. See @fig:x, `@code` and mail@example.org.\\n"))
+    ['doe', 'a1', 'a2']
+
+    :param text: The Markdown source.
+    :return: An iterator over the cited keys, which may contain duplicates.
+    """
+    fence = None
+    in_comment = False
+    lines = text.splitlines()
+
+    # Skip the front matter, which may contain addresses
+    start = 0
+    if len(lines) > 0 and lines[0].rstrip() == "---":
+        for index in range(1, len(lines)):
+            if lines[index].rstrip() in ("---", "..."):
+                start = index + 1
+                break
+
+    for line in lines[start:]:
+        # Skip fenced code blocks
+        fence_match = FENCE_REGEX.match(line)
+        if fence is not None:
+            if fence_match is not None and fence_match.group(1).startswith(fence):
+                fence = None
+            continue
+        elif fence_match is not None:
+            fence = fence_match.group(1)
+            continue
+
+        # Skip HTML comments, which may span multiple lines
+        if in_comment:
+            end = line.find("-->")
+            if end == -1:
+                continue
+            line = line[end + 3 :]
+            in_comment = False
+        line = re.sub(r"<!--.*?-->", "", line)
+        comment_start = line.find("<!--")
+        if comment_start != -1:
+            line = line[:comment_start]
+            in_comment = True
+
+        line = INLINE_CODE_REGEX.sub("", line)
+        for match in CITATION_REGEX.finditer(line):
+            key = match.group(1) or match.group(2)
+            if not key.startswith(XNOS_PREFIXES):
+                yield key
+
+
+def cited_keys(files: Iterable[Path]) -> FrozenSet[str]:
+    keys = set()
+    for file in files:
+        keys.update(iter_citations(file.read_text(encoding="utf-8")))
+    return frozenset(keys)
+
+
+def nocite_keys(text: str) -> Optional[FrozenSet[str]]:
+    """
+    Find the keys listed in the 'nocite' field of the front matter, which are part of the references without being
+    cited.
+
+    >>> sorted(nocite_keys("---\\ntitle: A\\nnocite: |\\n  @a, @b\\n---\\nText"))
+    ['a', 'b']
+    >>> nocite_keys("---\\nnocite: '@*'\\n---\\n") is None
+    True
+
+    :param text: The Markdown source.
+    :return: The keys or None, if all entries of the bibliography are listed by '@*'.
+    """
+    lines = text.splitlines()
+    if len(lines) == 0 or lines[0].rstrip() != "---":
+        return frozenset()
+
+    keys = set()
+    in_nocite = False
+    for line in lines[1:]:
+        if line.rstrip() in ("---", "..."):
+            break
+        if not line.startswith((" ", "\t", "-")):
+            # A new field of the front matter starts
+            in_nocite = line.startswith("nocite:")
+        if in_nocite:
+            if "@*" in line:
+                return None
+            keys.update(
+                match.group(1) or match.group(2)
+                for match in CITATION_REGEX.finditer(line)
+            )
+    return frozenset(keys)
@@ -1,17 +1,56 @@
+import functools
+import io
+import json
+import logging
+import os
 import re
 import shutil
 import subprocess
 import sys
 import tempfile
+import threading
 import warnings
 from collections.abc import MutableSequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, FrozenSet, Union, Sequence
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Dict,
+    List,
+    Optional,
+    FrozenSet,
+    Union,
+    Sequence,
+    TextIO,
+    Tuple,
+)
 
+from mdwiz import timing
 from mdwiz.bibliography import Bibliography
+from mdwiz.cache import Cache
+from mdwiz.chapters import Chapter
+from mdwiz.citations import cited_keys, nocite_keys
+from mdwiz.dependencies import Dependencies
+
+if TYPE_CHECKING:
+    from mdwiz.assets import AssetStage
+    from mdwiz.filters import FilterPipeline
 
 
 class Converter(MutableSequence):
+    # The number of characters read from pandoc at once
+    CHUNK_SIZE = 64 * 1024
+    DEFAULT_PARAMETERS = (
+        "--from=markdown+smart+tex_math_dollars",
+        "--to=latex",
+        "--standalone",
+        "--listings",
+        "--filter=pandoc-xnos",
+        "--filter=pantable",
+        "--table-of-contents",
+    )
+
     class PandocException(Exception):
         def __init__(self, msg: str, status_code: int):
             super().__init__(msg)
@@ -23,34 +62,92 @@ class Converter(MutableSequence):
             self.missing_references = missing_references
 
         def __str__(self):
-            return f"Missing references: {', '.join(self.missing_references)}"
+            return f"Missing references: {', '.join(sorted(self.missing_references))}"
 
         @staticmethod
+        @timing.timed("citation check")
         def check_references(
-                citation_file: Union[Path, str], latex_code: str, cwd: Optional[str] = None
-        ):
-            bibliography = Bibliography.from_file(citation_file, cwd=cwd)
-            missing_references = bibliography.find_missing_citations(latex_code)
+                citation_file: Optional[Union[Path, str]],
+                markdown_files: Sequence[Path],
+                cwd: Optional[str] = None,
+                cache: Optional[Cache] = None,
+        ) -> FrozenSet[str]:
+            """
+            Find the keys cited in the Markdown sources which are not part of the bibliography, without running pandoc.
 
+            :param citation_file: The bibliography, relative to 'cwd' if specified. If None, all citations are missing.
+            :param markdown_files: The Markdown files to scan for citations.
+            :param cwd: The working directory of the conversion.
+            :param cache: The cache for the keys of the bibliography.
+            :return: The missing keys.
+            """
+            available_references = frozenset()
+            if citation_file is not None:
+                available_references = Bibliography.keys_from_file(
+                    citation_file, cwd=cwd, cache=cache
+                )
+            return cited_keys(markdown_files).difference(available_references)
+
+        @staticmethod
+        def warn(missing_references: FrozenSet[str]):
             if len(missing_references) > 0:
                 warnings.warn(Converter.MissingReferenceWarning(missing_references))
 
+    class Target:
+        """
+        A format the document is rendered to, with its own template, CSL style and output file.
+        """
+
+        # Formats pandoc refuses to write to stdout
+        BINARY_FORMATS = ("docx", "odt", "epub", "epub2", "epub3", "pptx")
+        EXTENSIONS = {
+            "latex": "tex",
+            "beamer": "tex",
+            "html4": "html",
+            "html5": "html",
+            "markdown": "md",
+            "plain": "txt",
+        }
+
+        def __init__(
+                self,
+                output_format: str,
+                output: Optional[Path] = None,
+                template_file: Optional[Path] = None,
+                csl_file: Optional[Path] = None,
+        ):
+            self.output_format = output_format
+            self.output = output
+            self.template_file = template_file
+            self.csl_file = csl_file
+
+        def is_latex(self) -> bool:
+            return self.output_format in ("latex", "beamer")
+
+        def is_binary(self) -> bool:
+            return self.output_format in Converter.Target.BINARY_FORMATS
+
+        def extension(self) -> str:
+            """
+            >>> Converter.Target("latex").extension(), Converter.Target("docx").extension()
+            ('tex', 'docx')
+            """
+            return Converter.Target.EXTENSIONS.get(
+                self.output_format, self.output_format
+            )
+
     def __init__(
             self,
             markdown_files: Sequence[Path],
             citation_file: Optional[Path] = None,
             template_file: Optional[Path] = None,
             csl_file: Optional[Path] = None,
+            cache: Optional[Cache] = None,
+            in_process_filters: bool = False,
+            prune_bibliography: bool = False,
+            assets: Optional["AssetStage"] = None,
     ):
-        self._parameters = [
-            "--from=markdown+smart+tex_math_dollars",
-            "--to=latex",
-            "--standalone",
-            "--listings",
-            "--filter=pandoc-xnos",
-            "--filter=pantable",
-            "--table-of-contents",
-        ]
+        self._parameters = list(Converter.DEFAULT_PARAMETERS)
 
         if len(markdown_files) == 0 or not all(
                 file.is_file() for file in markdown_files
@@ -60,6 +157,10 @@ class Converter(MutableSequence):
             file.absolute() for file in Converter._sort_files(markdown_files)
         ]
         self.csl_file = csl_file
+        self.cache = cache
+        self.in_process_filters = in_process_filters
+        self.assets = assets
+        self._pipeline = None
 
         # Add citation processing
         self.citation_file = Converter._prepare_path(
@@ -72,6 +173,13 @@ class Converter(MutableSequence):
                 self.append("--biblatex")
             self.append(f"--bibliography={self.citation_file}")
 
+        # Pass only the cited entries to the tools processing the bibliography
+        self.prune_bibliography = prune_bibliography
+        self.pruned_bibliography = None
+        self._pruned_state = None
+        self._prune_directory = None
+        self._update_pruned_bibliography()
+
         # Add custom template
         self.template_file = Converter._prepare_path(
             template_file, self.markdown_files[0]
@@ -101,40 +209,581 @@ class Converter(MutableSequence):
         self._parameters.insert(index, element)
 
     def convert(self) -> str:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_file = Path(tmp_dir) / "output.tex"
-            result = subprocess.run(
-                [
-                    "pandoc",
-                    *self._parameters,
-                    "-o",
-                    str(output_file),
-                    *[str(file) for file in self.markdown_files],
-                ],
-                capture_output=True,
-                shell=False,
-                text=True,
-                cwd=str(self.markdown_files[0].parent),
-            )
-
-            if result.returncode != 0:
-                raise Converter.PandocException(result.stderr, result.returncode)
-            latex_output = output_file.read_text(encoding="utf-8")
-
-            # Check references, if specified
-            if self.citation_file is not None:
-                Converter.MissingReferenceWarning.check_references(
-                    self.citation_file,
-                    latex_output,
-                    cwd=str(self.markdown_files[0].parent),
+        latex_output = io.StringIO()
+        self.convert_to(latex_output)
+        return latex_output.getvalue()
+
+    @timing.timed("convert")
+    def convert_to(self, sink: TextIO):
+        """
+        Convert the document, writing the output of pandoc into the sink while it is produced.
+
+        :param sink: Receives the LaTeX in chunks, i.e. an open file, stdout or a socket wrapper.
+        """
+        self._prepare()
+        if self.cache is None:
+            self._convert(sink)
+            return
+
+        # Reuse the output of an earlier run with exactly the same inputs
+        key = self.cache_key()
+        cached = self.cache.open(key)
+        if cached is not None:
+            if self.assets is not None:
+                # The output references the prepared images, which may have been evicted from the cache meanwhile
+                self._input()
+            with io.TextIOWrapper(cached, encoding="utf-8", newline="") as file:
+                shutil.copyfileobj(file, sink, Converter.CHUNK_SIZE)
+            return
+
+        with self.cache.writer(key) as entry:
+            self._convert(_Tee(sink, entry))
+
+    def missing_references(self) -> FrozenSet[str]:
+        return Converter.MissingReferenceWarning.check_references(
+            self.citation_file,
+            self.markdown_files,
+            cwd=str(self.markdown_files[0].parent),
+            cache=self.cache,
+        )
+
+    def cache_key(self) -> str:
+        """
+        Derive a key which changes whenever the output of the conversion might change, without starting any process.
+        """
+        working_directory = self.markdown_files[0].parent
+        parts = ["document", *self._parameters]
+        for file in self.markdown_files:
+            parts.extend((str(file), Cache.hash_file(file)))
+        # pantable reads the CSV files of tables itself
+        dependencies = Dependencies.scan(self.markdown_files)
+        for file in dependencies.tables:
+            parts.extend((str(file), Cache.hash_file(file)))
+        # The paths of prepared images depend on their content
+        if self.assets is not None:
+            parts.append(self.assets.fingerprint())
+            for file in dependencies.images:
+                parts.extend((str(file), Cache.hash_file(file)))
+        for file in (self.citation_file, self.csl_file, self.template_file):
+            if file is not None:
+                parts.append(Cache.hash_file(working_directory / file))
+            else:
+                parts.append(None)
+        parts.append(Converter._tool_fingerprint("pandoc-citeproc"))
+        parts.extend(self._tool_fingerprints())
+        return Cache.key(*parts)
+
+    @property
+    def pipeline(self) -> "FilterPipeline":
+        """
+        The filters applied in-process, which record their timings.
+        """
+        if self._pipeline is None:
+            from mdwiz.filters import FilterPipeline
+
+            self._pipeline = FilterPipeline.from_names(
+                self._filters(), cache=self.cache
+            )
+        return self._pipeline
+
+    @timing.timed("convert chapters")
+    def convert_chapters(self, jobs: Optional[int] = None) -> str:
+        """
+        Convert each Markdown file into a LaTeX fragment on its own and splice them into the converted document wrapper.
+        Fragments are converted concurrently and, if a cache is available, only changed chapters are converted again.
+
+        :param jobs: The maximal number of concurrent pandoc processes. Defaults to the number of CPUs.
+        :return: The converted document.
+        """
+        if len(self.markdown_files) < 2:
+            return self.convert()
+        elif self.citation_file is not None and "--biblatex" not in self:
+            # Pandoc would render the references of each chapter on its own
+            logging.info("Chapter-wise conversion requires BibLaTeX, converting as whole.")
+            return self.convert()
+
+        self._prepare()
+        chapters = [Chapter(file) for file in self.markdown_files]
+        labels = [chapter.labels() for chapter in chapters]
+        metadata = Chapter.metadata(chapters)
+        fragment_parameters = [
+            parameter
+            for parameter in self._parameters
+            if parameter not in ("--standalone", "--table-of-contents")
+            and not parameter.startswith("--template=")
+        ]
+
+        def convert_fragment(index: int) -> str:
+            chapter = chapters[index]
+            foreign_labels = frozenset().union(
+                *(label for i, label in enumerate(labels) if i != index)
+            )
+            source = chapter.source(foreign_labels, metadata)
+            if self.assets is not None:
+                (source,) = self.assets.rewrite([source], chapter.path.parent)
+            # pantable reads the CSV files of tables itself, like the images are read when the document is built
+            dependencies = Dependencies.scan([chapter.path])
+            fragment = self._convert_cached(
+                "fragment",
+                fragment_parameters,
+                source,
+                chapter.path.parent,
+                (*dependencies.tables, *dependencies.images),
+            )
+            return Chapter.cut(fragment)
+
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+            wrapper = executor.submit(
+                timing.inherit(self._convert_cached),
+                "wrapper",
+                self._parameters,
+                Chapter.wrapper(chapters),
+                self.markdown_files[0].parent,
+                (self.citation_file, self.csl_file, self.template_file),
+            )
+            fragments = list(
+                executor.map(timing.inherit(convert_fragment), range(len(chapters)))
+            )
+            latex_output = Chapter.splice(wrapper.result(), fragments)
+
+        return latex_output
+
+    @timing.timed("convert targets")
+    def convert_targets(
+            self, targets: Sequence["Converter.Target"], jobs: Optional[int] = None
+    ) -> Dict[str, Optional[str]]:
+        """
+        Parse the Markdown once into the pandoc AST and render all the targets from it concurrently. As filters like
+        pandoc-xnos produce different output per format, they are applied for each target on its own.
+
+        :param targets: The formats to render, each with its own settings.
+        :param jobs: The maximal number of concurrent pandoc processes. Defaults to the number of targets.
+        :return: The rendered documents by format, or None for targets written to their output file.
+        """
+        for target in targets:
+            if target.is_binary() and target.output is None:
+                raise ValueError(
+                    f"The format '{target.output_format}' requires an output file"
                 )
 
-            return latex_output
+        self._prepare()
+        cwd = self.markdown_files[0].parent
+        files, source = self._input()
+        with timing.span("parse"):
+            document = Converter._run_pandoc(
+                Converter._reader_parameters(self._parameters),
+                cwd,
+                files=files,
+                source=source,
+            )
+
+        with ThreadPoolExecutor(max_workers=jobs or len(targets)) as executor:
+            outputs = list(
+                executor.map(
+                    timing.inherit(lambda target: self._render(document, target)),
+                    targets,
+                )
+            )
+        return {
+            target.output_format: output for target, output in zip(targets, outputs)
+        }
+
+    def _render(self, document: str, target: "Converter.Target") -> Optional[str]:
+        cwd = self.markdown_files[0].parent
+        parameters = self._target_parameters(target)
+        if self.in_process_filters:
+            document = Converter._filter_document(
+                self.pipeline, document, parameters, cwd
+            )
+
+        with timing.span(f"render {target.output_format}"):
+            if target.output is None:
+                return Converter._run_pandoc(parameters, cwd, source=document)
+
+            # Replace the output file only once it is completely written
+            handle, tmp_path = tempfile.mkstemp(
+                dir=str(target.output.parent), suffix=f".{target.extension()}"
+            )
+            os.close(handle)
+            try:
+                Converter._run_pandoc(
+                    [*parameters, "-o", tmp_path], cwd, source=document
+                )
+                os.replace(tmp_path, target.output)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            return None
+
+    def _target_parameters(self, target: "Converter.Target") -> List[str]:
+        """
+        Derive the parameters rendering the AST into the target from those of the LaTeX conversion.
+        """
+        parameters = []
+        for parameter in self._parameters:
+            if parameter.startswith("--from="):
+                parameter = "--from=json"
+            elif parameter.startswith("--to="):
+                parameter = f"--to={target.output_format}"
+            elif parameter in ("--biblatex", "--listings") and not target.is_latex():
+                continue
+            elif parameter.startswith("--template=") and (
+                    target.template_file is not None or not target.is_latex()
+            ):
+                continue
+            elif parameter.startswith("--csl=") and target.csl_file is not None:
+                continue
+            elif parameter.startswith("--filter=") and self.in_process_filters:
+                continue
+            elif (
+                    parameter.startswith("--bibliography=")
+                    and self.pruned_bibliography is not None
+                    and not target.is_latex()
+            ):
+                parameter = f"--bibliography={self.pruned_bibliography}"
+            parameters.append(parameter)
+
+        if target.template_file is not None:
+            parameters.append(f"--template={target.template_file}")
+        if target.csl_file is not None and self.citation_file is not None:
+            parameters.append(f"--csl={target.csl_file}")
+        return parameters
+
+    def _convert_cached(
+            self,
+            kind: str,
+            parameters: Sequence[str],
+            source: str,
+            cwd: Path,
+            dependencies: Sequence[Union[None, Path, str]] = (),
+    ) -> str:
+        if self.cache is None:
+            return self._pandoc(parameters, cwd, source=source)
+
+        key = Cache.key(
+            kind,
+            *parameters,
+            str(cwd),
+            source,
+            *(
+                Cache.hash_file(cwd / file) if file is not None else None
+                for file in dependencies
+            ),
+            *self._tool_fingerprints(),
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached.decode("utf-8")
+
+        output = self._pandoc(parameters, cwd, source=source)
+        self.cache.put(key, output.encode("utf-8"))
+        return output
+
+    def _convert(self, sink: TextIO):
+        files, source = self._input()
+        self._pandoc(
+            self._parameters,
+            self.markdown_files[0].parent,
+            files=files,
+            source=source,
+            sink=sink,
+        )
+
+    def _input(self) -> Tuple[Sequence[Path], Optional[str]]:
+        """
+        Determine what pandoc reads: The Markdown files or, if the images are prepared, the Markdown referencing the
+        prepared images instead of the original ones.
+
+        :return: The files to read and the source passed via stdin otherwise.
+        """
+        if self.assets is None:
+            return self.markdown_files, None
+        sources = self.assets.rewrite(
+            [file.read_text(encoding="utf-8") for file in self.markdown_files],
+            self.markdown_files[0].parent,
+        )
+        # Pandoc separates the content of multiple files by a blank line as well
+        return (), "\n\n".join(sources)
+
+    def _pandoc(
+            self,
+            parameters: Sequence[str],
+            cwd: Path,
+            files: Sequence[Path] = (),
+            source: Optional[str] = None,
+            sink: Optional[TextIO] = None,
+    ) -> Optional[str]:
+        """
+        Run pandoc with the filters applied in-process if requested.
+
+        :return: The output of pandoc, or None if it was written into the sink.
+        """
+        return Converter._run_filtered(
+            self.pipeline if self.in_process_filters else None,
+            parameters,
+            cwd,
+            files=files,
+            source=source,
+            sink=sink,
+        )
 
     @staticmethod
+    def _run_filtered(
+            pipeline: Optional["FilterPipeline"],
+            parameters: Sequence[str],
+            cwd: Path,
+            files: Sequence[Path] = (),
+            source: Optional[str] = None,
+            sink: Optional[TextIO] = None,
+    ) -> Optional[str]:
+        """
+        Run pandoc with the parameters of the whole conversion, applying the filters of the pipeline in-process if
+        specified.
+
+        :return: The output of pandoc, or None if it was written into the sink.
+        """
+        if pipeline is None:
+            return Converter._run_pandoc(
+                parameters, cwd, files=files, source=source, sink=sink
+            )
+
+        # Parse once into the JSON AST, apply all filters on it and render it once
+        document = Converter._run_pandoc(
+            Converter._reader_parameters(parameters),
+            cwd,
+            files=files,
+            source=source,
+        )
+        return Converter._run_pandoc(
+            Converter._writer_parameters(parameters),
+            cwd,
+            source=Converter._filter_document(pipeline, document, parameters, cwd),
+            sink=sink,
+        )
+
+    @staticmethod
+    def _filter_document(
+            pipeline: "FilterPipeline",
+            document: str,
+            parameters: Sequence[str],
+            cwd: Path,
+    ) -> str:
+        """
+        Apply the filters to the JSON AST, as they would have been applied by the pandoc run with the parameters.
+        """
+        return json.dumps(
+            pipeline.apply(
+                json.loads(document), Converter._output_format(parameters), cwd=cwd
+            )
+        )
+
+    @staticmethod
+    def _reader_parameters(parameters: Sequence[str]) -> List[str]:
+        """
+        >>> Converter._reader_parameters(["--from=markdown", "--to=latex", "--filter=pantable"])
+        ['--from=markdown', '--to=json']
+        """
+        return [
+            *(parameter for parameter in parameters if parameter.startswith("--from=")),
+            "--to=json",
+        ]
+
+    @staticmethod
+    def _writer_parameters(parameters: Sequence[str]) -> List[str]:
+        """
+        >>> Converter._writer_parameters(["--from=markdown", "--to=latex", "--filter=pantable"])
+        ['--from=json', '--to=latex']
+        """
+        return [
+            "--from=json",
+            *(
+                parameter
+                for parameter in parameters
+                if not parameter.startswith(("--from=", "--filter="))
+            ),
+        ]
+
+    @staticmethod
+    def _output_format(parameters: Sequence[str]) -> str:
+        return next(
+            (
+                parameter[len("--to="):]
+                for parameter in parameters
+                if parameter.startswith("--to=")
+            ),
+            "latex",
+        )
+
+    def _tool_fingerprints(self) -> Sequence[Optional[str]]:
+        if self.in_process_filters:
+            return [Converter._tool_fingerprint("pandoc"), self.pipeline.fingerprint()]
+        return [
+            Converter._tool_fingerprint(tool) for tool in ("pandoc", *self._filters())
+        ]
+
+    def _prepare(self):
+        """
+        Bring the pruned bibliography up to date and warn about missing references, before any conversion.
+        """
+        self._update_pruned_bibliography()
+        self._warn_missing_references()
+
+    def _update_pruned_bibliography(self):
+        """
+        Prune the bibliography to the entries cited right now, as the Markdown files and the bibliography may change
+        between the conversions of the same converter, i.e. while watching.
+        """
+        if not self.prune_bibliography or self.citation_file is None:
+            return
+
+        keys = self._referenced_keys()
+        cwd = str(self.markdown_files[0].parent)
+        stat = Bibliography._resolve(self.citation_file, cwd).stat()
+        state = (keys, stat.st_mtime_ns, stat.st_size)
+        if state == self._pruned_state:
+            return
+        self._pruned_state = state
+
+        if keys is None:
+            self.pruned_bibliography = None
+        else:
+            if self.cache is None and self._prune_directory is None:
+                self._prune_directory = tempfile.TemporaryDirectory(prefix="mdwiz-")
+            self.pruned_bibliography = Bibliography.prune(
+                self.citation_file,
+                keys,
+                cwd=cwd,
+                cache=self.cache,
+                directory=(
+                    None
+                    if self._prune_directory is None
+                    else Path(self._prune_directory.name)
+                ),
+            )
+
+        if "--biblatex" not in self:
+            index = next(
+                index
+                for index, parameter in enumerate(self._parameters)
+                if parameter.startswith("--bibliography=")
+            )
+            self[index] = (
+                f"--bibliography={self.pruned_bibliography or self.citation_file}"
+            )
+
+    def _referenced_keys(self) -> Optional[FrozenSet[str]]:
+        """
+        Collect the cited keys and those listed by 'nocite'.
+
+        :return: The keys or None, if all entries are part of the references.
+        """
+        keys = set(cited_keys(self.markdown_files))
+        for file in self.markdown_files:
+            listed = nocite_keys(file.read_text(encoding="utf-8"))
+            if listed is None:
+                return None
+            keys.update(listed)
+        return frozenset(keys)
+
+    def _warn_missing_references(self):
+        # Check references, if specified
+        if self.citation_file is not None:
+            Converter.MissingReferenceWarning.warn(self.missing_references())
+
+    @staticmethod
+    @timing.timed("pandoc", "subprocess")
+    def _run_pandoc(
+            parameters: Sequence[str],
+            cwd: Path,
+            files: Sequence[Path] = (),
+            source: Optional[str] = None,
+            sink: Optional[TextIO] = None,
+    ) -> Optional[str]:
+        """
+        Run pandoc, which writes its output to stdout instead of a temporary file.
+
+        :param sink: Receives the output in chunks. If None, the output is returned.
+        :return: The output of pandoc, or None if it was written into the sink.
+        """
+        output = io.StringIO() if sink is None else sink
+        process = subprocess.Popen(
+            ["pandoc", *parameters, *[str(file) for file in files]],
+            stdin=subprocess.DEVNULL if source is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=False,
+            text=True,
+            encoding="utf-8",
+            cwd=str(cwd),
+        )
+
+        # Feed stdin and drain stderr concurrently, so pandoc never blocks on a full pipe
+        errors = []
+        threads = [
+            threading.Thread(
+                target=lambda: errors.append(process.stderr.read()), daemon=True
+            )
+        ]
+        if source is not None:
+            threads.append(
+                threading.Thread(
+                    target=Converter._feed, args=(process.stdin, source), daemon=True
+                )
+            )
+        for thread in threads:
+            thread.start()
+
+        try:
+            with process.stdout:
+                for chunk in iter(
+                        lambda: process.stdout.read(Converter.CHUNK_SIZE), ""
+                ):
+                    output.write(chunk)
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.wait()
+            for thread in threads:
+                thread.join()
+            process.stderr.close()
+
+        if process.returncode != 0:
+            raise Converter.PandocException("".join(errors), process.returncode)
+        return output.getvalue() if sink is None else None
+
+    @staticmethod
+    def _feed(stdin: TextIO, source: str):
+        try:
+            with stdin:
+                stdin.write(source)
+        except (BrokenPipeError, OSError):
+            # Pandoc stopped early, which is reported by its return code
+            pass
+
+    def _filters(self) -> Sequence[str]:
+        return [
+            parameter[len("--filter="):]
+            for parameter in self._parameters
+            if parameter.startswith("--filter=")
+        ]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
     def is_available() -> bool:
         return shutil.which("pandoc") is not None
 
+    @staticmethod
+    def _tool_fingerprint(name: str) -> Optional[str]:
+        """
+        Identify the installed version of an executable by its location, size and modification time.
+        """
+        path = shutil.which(name)
+        if path is None:
+            return None
+        stat = Path(path).resolve().stat()
+        return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
     @staticmethod
     def _prepare_path(
             input_path: Optional[Path], reference_path: Path
@@ -169,3 +818,17 @@ class Converter(MutableSequence):
 
         ids, files = zip(*sorted(zip(ids, files)))
         return files
+
+
+class _Tee:
+    """
+    Write the output into the sink and a cache entry at once.
+    """
+
+    def __init__(self, sink: TextIO, entry: BinaryIO):
+        self.sink = sink
+        self.entry = entry
+
+    def write(self, text: str) -> int:
+        self.entry.write(text.encode("utf-8"))
+        return self.sink.write(text)
@@ -0,0 +1,218 @@
+"""
+A streaming parser for CSL-JSON bibliographies. Only a single entry is decoded at a time, so the memory use stays flat
+even for exports of hundreds of megabytes. Entries are located by their byte offsets, which allows to load them on
+demand.
+"""
+
+import codecs
+import json
+import re
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Tuple, Union
+
+Entry = Dict[str, Any]
+
+# Larger entries are considered broken instead of buffering the rest of the file
+MAX_ENTRY_SIZE = 16 * 1024 * 1024
+
+
+class ParseError(ValueError):
+    def __init__(self, msg: str, offset: int):
+        super().__init__(f"{msg} (byte {offset})")
+        self.offset = offset
+
+
+class _Scanner:
+    """
+    A cursor over a binary stream, which is decoded in chunks and never held completely in memory.
+    """
+
+    WHITESPACE_REGEX = re.compile(r"[ \t\n\r]*")
+    DECODER = json.JSONDecoder()
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = 1024 * 1024):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+        # The byte offset of the position in the stream
+        self.offset = 0
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character without consuming it, or an empty string at the end.
+        """
+        while True:
+            end = _Scanner.WHITESPACE_REGEX.match(self._buffer, self._position).end()
+            self._advance(end)
+            if end < len(self._buffer):
+                return self._buffer[end]
+            if not self._read():
+                return ""
+
+    def advance(self):
+        self._advance(self._position + 1)
+
+    def value(self) -> Tuple[Any, str]:
+        """
+        Decode the value at the current position.
+
+        :return: The value and its text as written.
+        """
+        while True:
+            try:
+                value, end = _Scanner.DECODER.raw_decode(self._buffer, self._position)
+                break
+            except json.JSONDecodeError as ex:
+                # The value may continue in the next chunk
+                if (
+                    len(self._buffer) - self._position > MAX_ENTRY_SIZE
+                    or not self._read()
+                ):
+                    raise ParseError(ex.msg, self.offset)
+
+        text = self._buffer[self._position : end]
+        self._advance(end)
+        return value, text
+
+    def _advance(self, end: int):
+        consumed = self._buffer[self._position : end]
+        self.offset += (
+            len(consumed) if consumed.isascii() else len(consumed.encode("utf-8"))
+        )
+        self._position = end
+
+    def _read(self) -> bool:
+        """
+        Append the next chunk to the buffer, dropping its consumed part.
+        """
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        if self.offset == 0 and chunk.startswith(codecs.BOM_UTF8):
+            chunk = chunk[len(codecs.BOM_UTF8) :]
+            self.offset = len(codecs.BOM_UTF8)
+        self._eof = len(chunk) == 0
+        self._buffer = self._buffer[self._position :] + self._decoder.decode(
+            chunk, final=self._eof
+        )
+        self._position = 0
+        return True
+
+
+def _open(source: Union[Path, str, BinaryIO]):
+    if isinstance(source, (Path, str)):
+        return open(source, "rb")
+    return _NoClose(source)
+
+
+class _NoClose:
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+
+    def __enter__(self) -> BinaryIO:
+        return self.stream
+
+    def __exit__(self, *args):
+        pass
+
+
+def _entries(
+    source: Union[Path, str, BinaryIO]
+) -> Iterator[Tuple[Entry, str, int, int]]:
+    with _open(source) as stream:
+        scanner = _Scanner(stream)
+        if scanner.peek() != "[":
+            raise ParseError("Expected an array of entries", scanner.offset)
+        scanner.advance()
+        if scanner.peek() == "]":
+            return
+
+        while True:
+            scanner.peek()
+            start = scanner.offset
+            entry, text = scanner.value()
+            if not isinstance(entry, dict) or "id" not in entry:
+                raise ParseError("Expected an entry with an id", start)
+            yield entry, text, start, scanner.offset
+
+            separator = scanner.peek()
+            scanner.advance()
+            if separator == "]":
+                return
+            elif separator != ",":
+                raise ParseError("Expected ',' or ']'", scanner.offset - 1)
+
+
+def iter_keys(source: Union[Path, str, BinaryIO]) -> Iterator[str]:
+    """
+    Stream the ids of all entries, keeping only the current entry in memory.
+
+    >>> import io
+    >>> list(iter_keys(io.BytesIO(b'[{"id": "doe", "author": [{"family": "Doe"}]}, {"id": 42}]')))
+    ['doe', '42']
+    """
+    for entry, _, _, _ in _entries(source):
+        yield str(entry["id"])
+
+
+def iter_entries(source: Union[Path, str, BinaryIO]) -> Iterator[Entry]:
+    for entry, _, _, _ in _entries(source):
+        yield entry
+
+
+def iter_blocks(source: Union[Path, str, BinaryIO]) -> Iterator[Tuple[str, str]]:
+    """
+    Stream the entries as they are written, i.e. to copy some of them without formatting them again.
+
+    >>> import io
+    >>> list(iter_blocks(io.BytesIO('[{"id": "dö",\\n  "title": "A"}]'.encode("utf-8"))))
+    [('dö', '{"id": "dö",\\n  "title": "A"}')]
+    """
+    for entry, text, _, _ in _entries(source):
+        yield str(entry["id"]), text
+
+
+def iter_offsets(
+    source: Union[Path, str, BinaryIO]
+) -> Iterator[Tuple[str, int, int]]:
+    """
+    Stream the ids of all entries with the byte range they occupy in the file.
+
+    >>> import io
+    >>> list(iter_offsets(io.BytesIO('[{"id": "ä"}, {"id": "b"}]'.encode("utf-8"))))
+    [('ä', 1, 13), ('b', 15, 26)]
+    """
+    for entry, _, start, end in _entries(source):
+        yield str(entry["id"]), start, end
+
+
+class Index(Mapping):
+    """
+    The entries of a CSL-JSON file by their ids, which are only loaded once accessed. Only the byte offsets of the
+    entries are kept in memory.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        self.path = Path(path)
+        self._offsets = {
+            key: (start, end) for key, start, end in iter_offsets(path)
+        }
+
+    def __getitem__(self, key: str) -> Entry:
+        start, end = self._offsets[key]
+        with self.path.open("rb") as file:
+            file.seek(start)
+            return json.loads(file.read(end - start).decode("utf-8"))
+
+    def __contains__(self, key) -> bool:
+        return key in self._offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
@@ -0,0 +1,262 @@
+"""
+Find the files a conversion reads besides those given to pandoc directly, i.e. images, LaTeX files included by raw
+LaTeX and the CSV files of pantable tables. Build systems use the resulting manifest, written as Makefile fragment or
+JSON, to skip documents whose inputs are unchanged.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from mdwiz.citations import FENCE_REGEX
+
+IMAGE_REGEX = re.compile(r"!\[(?:[^\[\]]|\[[^\[\]]*\])*\]\(\s*(<[^>]+>|[^)\s]+)")
+HTML_IMAGE_REGEX = re.compile(
+    r"<img\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE
+)
+LATEX_INCLUDE_REGEX = re.compile(
+    r"\\(includegraphics|input|include|subfile)\*?(?:\[[^\]]*\])*\{([^{}]+)\}"
+)
+TABLE_INCLUDE_REGEX = re.compile(r"^\s*include:\s*[\"']?([^\"'#]+?)[\"']?\s*$")
+
+# The extensions LaTeX tries if a file is included without one
+GRAPHIC_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".eps")
+
+
+class Dependencies:
+    """
+    The files referenced by Markdown sources, which exist on the file system.
+    """
+
+    def __init__(self):
+        self.images: List[Path] = []
+        self.includes: List[Path] = []
+        self.tables: List[Path] = []
+
+    def __iter__(self):
+        return iter((*self.images, *self.includes, *self.tables))
+
+    @staticmethod
+    def scan(markdown_files: Iterable[Path]) -> "Dependencies":
+        """
+        Collect the references of the Markdown files, which pandoc resolves relative to the directory of the first.
+        Included LaTeX files are scanned as well.
+        """
+        dependencies = Dependencies()
+        markdown_files = list(markdown_files)
+        if len(markdown_files) == 0:
+            return dependencies
+        directory = markdown_files[0].parent
+
+        for file in markdown_files:
+            dependencies._scan_markdown(file.read_text(encoding="utf-8"), directory)
+        for file in dependencies.includes:
+            # Appended while iterating, so nested includes are scanned as well
+            dependencies._scan_latex(
+                file.read_text(encoding="utf-8", errors="replace"), directory
+            )
+        return dependencies
+
+    def _scan_markdown(self, text: str, directory: Path):
+        for kind, reference, _, _ in iter_references(text):
+            if kind == "image":
+                self._add(self.images, directory, reference)
+            elif kind == "graphic":
+                self._add(self.images, directory, reference, GRAPHIC_EXTENSIONS)
+            elif kind == "include":
+                self._add(self.includes, directory, reference, (".tex",))
+            else:
+                self._add(self.tables, directory, reference)
+
+    def _scan_latex(self, text: str, directory: Path):
+        for match in LATEX_INCLUDE_REGEX.finditer(text):
+            command, name = match.group(1), match.group(2).strip()
+            if command == "includegraphics":
+                self._add(self.images, directory, name, GRAPHIC_EXTENSIONS)
+            else:
+                self._add(self.includes, directory, name, (".tex",))
+
+    @staticmethod
+    def _add(
+        files: List[Path],
+        directory: Path,
+        reference: str,
+        extensions: Sequence[str] = (),
+    ):
+        path = resolve(directory, reference, extensions)
+        if path is not None and path not in files:
+            files.append(path)
+
+
+def iter_references(text: str) -> Iterator[Tuple[str, str, int, int]]:
+    r"""
+    Find the references of Markdown to other files, skipping those within code blocks.
+
+    >>> list(iter_references("![A figure](figure.svg)\n\\includegraphics[width=2cm]{logo}"))
+    [('image', 'figure.svg', 12, 22), ('graphic', 'logo', 52, 56)]
+
+    :return: The kind of each reference, which is 'image', 'graphic' (included by LaTeX), 'include' or 'table', the
+        referenced file as written and the range of characters it occupies in the text.
+    """
+    fence = None
+    table = False
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        start, offset = offset, offset + len(line)
+        fence_match = FENCE_REGEX.match(line)
+        if fence is not None:
+            if fence_match is not None and fence_match.group(1).startswith(fence):
+                fence = None
+            elif table:
+                # The YAML header of pantable may include the table from a CSV file
+                match = TABLE_INCLUDE_REGEX.match(line.rstrip("\r\n"))
+                if match is not None:
+                    begin, end = start + match.start(1), start + match.end(1)
+                    yield "table", match.group(1), begin, end
+            continue
+        elif fence_match is not None:
+            fence = fence_match.group(1)
+            table = "table" in line[fence_match.end():]
+            continue
+
+        references = []
+        for match in IMAGE_REGEX.finditer(line):
+            # Paths with spaces are enclosed in angle brackets
+            bracketed = match.group(1).startswith("<")
+            references.append(
+                (
+                    "image",
+                    match.group(1).strip("<>"),
+                    start + match.start(1) + bracketed,
+                    start + match.end(1) - bracketed,
+                )
+            )
+        for match in HTML_IMAGE_REGEX.finditer(line):
+            references.append(
+                ("image", match.group(1), start + match.start(1), start + match.end(1))
+            )
+        for match in LATEX_INCLUDE_REGEX.finditer(line):
+            kind = "graphic" if match.group(1) == "includegraphics" else "include"
+            name = match.group(2)
+            stripped = name.strip()
+            begin = start + match.start(2) + name.find(stripped)
+            references.append((kind, stripped, begin, begin + len(stripped)))
+        yield from sorted(references, key=lambda reference: reference[2])
+
+
+def resolve(
+    directory: Path, reference: str, extensions: Sequence[str] = ()
+) -> Optional[Path]:
+    """
+    Find the file a reference points to, trying the given extensions if it has none.
+
+    :return: The existing file or None, i.e. for URLs.
+    """
+    if re.match(r"^[a-zA-Z][a-zA-Z0-9+.\-]*:", reference) and not re.match(
+        r"^[a-zA-Z]:[\\/]", reference
+    ):
+        # URLs and data URIs are not part of the file system
+        return None
+
+    path = directory / reference
+    candidates = [path]
+    if path.suffix == "":
+        candidates.extend(
+            path.with_name(f"{path.name}{extension}") for extension in extensions
+        )
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+class Manifest:
+    """
+    All inputs of a conversion and the outputs built from them.
+    """
+
+    def __init__(
+        self,
+        targets: Sequence[Path],
+        markdown_files: Sequence[Path],
+        bibliographies: Sequence[Path] = (),
+        template: Optional[Path] = None,
+        csl: Optional[Path] = None,
+    ):
+        self.targets = list(targets)
+        self.inputs: Dict[str, List[Path]] = {
+            "markdown": list(markdown_files),
+            "bibliography": list(bibliographies),
+            "template": [template] if template is not None else [],
+            "csl": [csl] if csl is not None else [],
+        }
+        dependencies = Dependencies.scan(markdown_files)
+        self.inputs["images"] = dependencies.images
+        self.inputs["includes"] = dependencies.includes
+        self.inputs["tables"] = dependencies.tables
+
+    def files(self) -> List[Path]:
+        # A file may be referenced in multiple ways, i.e. as template and by \input
+        return list(
+            dict.fromkeys(file for files in self.inputs.values() for file in files)
+        )
+
+    def to_make(self, cwd: Path) -> str:
+        """
+        Create a Makefile fragment like 'gcc -MMD -MP' does, with an empty rule for each input so that make does not
+        fail once one of them is deleted.
+
+        >>> print(Manifest([Path("out.tex")], []).to_make(Path(".")), end="")
+        out.tex:
+        """
+        targets = " ".join(Manifest._escape(target, cwd) for target in self.targets)
+        inputs = [Manifest._escape(file, cwd) for file in self.files()]
+        lines = [f"{targets}:{''.join(f' {file}' for file in inputs)}"]
+        lines.extend(f"\n{file}:" for file in inputs)
+        return "\n".join(lines) + "\n"
+
+    def to_json(self, cwd: Path) -> str:
+        return json.dumps(
+            {
+                "targets": [Manifest._relative(target, cwd) for target in self.targets],
+                **{
+                    kind: [Manifest._relative(file, cwd) for file in files]
+                    for kind, files in self.inputs.items()
+                },
+            },
+            indent=2,
+        )
+
+    def write(self, path: Path, cwd: Path):
+        """
+        Write the manifest as JSON, if the path ends with '.json', or as Makefile fragment otherwise.
+        """
+        from mdwiz.cache import atomic_writer
+
+        with atomic_writer(path, encoding="utf-8") as file:
+            file.write(
+                self.to_json(cwd) if path.suffix == ".json" else self.to_make(cwd)
+            )
+
+    @staticmethod
+    def _relative(path: Path, cwd: Path) -> str:
+        try:
+            return os.path.relpath(path, cwd) if path.is_absolute() else str(path)
+        except ValueError:
+            # On another drive
+            return str(path)
+
+    @staticmethod
+    def _escape(path: Path, cwd: Path) -> str:
+        r"""
+        >>> Manifest._escape(Path("my file$.png"), Path("."))
+        'my\\ file$$.png'
+        """
+        return (
+            Manifest._relative(path, cwd)
+            .replace(" ", "\\ ")
+            .replace("#", "\\#")
+            .replace("$", "$$")
+        )
@@ -1,5 +1,8 @@
 from pathlib import Path
-from typing import Sequence, Optional
+from typing import TYPE_CHECKING, Sequence, Optional, Union
+
+if TYPE_CHECKING:
+    from mdwiz.filetypes.index import FileIndex
 
 
 class FileType:
@@ -9,18 +12,23 @@ class FileType:
     def locate_files(
         self,
         root: Path,
-        reference_file: Optional[Path] = None,
+        reference_file: Union[None, Path, Sequence[Path]] = None,
         recursive: bool = True,
         min_size: int = 0,
+        index: Optional["FileIndex"] = None,
     ) -> Sequence[Path]:
 
-        # Generate all the candidate files
+        # Generate all the candidate files, preferably from an index shared by all file types
         candidates = []
-        for extension in self.file_extensions():
-            extension = f"*.{extension}"
-            candidates.extend(
-                root.rglob(extension) if recursive else root.glob(extension)
-            )
+        if index is not None and index.root == root.absolute():
+            for extension in self.file_extensions():
+                candidates.extend(index.files(extension, recursive=recursive))
+        else:
+            for extension in self.file_extensions():
+                extension = f"*.{extension}"
+                candidates.extend(
+                    root.rglob(extension) if recursive else root.glob(extension)
+                )
 
         # Filter out files by their size, i.e. to allow the redirection of a 'tex' file not being accidently parsed as template.
         candidates = [
@@ -31,8 +39,13 @@ class FileType:
 
         # If more than one candidate is available, try to find its stem
         if len(candidates) > 1 and reference_file is not None:
+            reference_stems = (
+                {reference_file.stem}
+                if isinstance(reference_file, Path)
+                else {file.stem for file in reference_file}
+            )
             for candidate in candidates:
-                if candidate.stem == reference_file.stem:
+                if candidate.stem in reference_stems:
                     return (candidate,)
 
         return candidates
@@ -0,0 +1,203 @@
+import fnmatch
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from mdwiz.cache import Cache
+
+
+class FileIndex:
+    """
+    All files below a root directory grouped by their extension, collected in a single walk.
+    """
+
+    # Directories which never contain documents but may be huge
+    PRUNED_DIRECTORIES = (
+        ".git",
+        ".hg",
+        ".svn",
+        "node_modules",
+        "__pycache__",
+        ".venv",
+        "venv",
+        ".tox",
+        ".mypy_cache",
+        ".pytest_cache",
+    )
+    IGNORE_FILE = ".mdwizignore"
+
+    # The indices loaded by this process, which matters for long-living processes like the server
+    _loaded = {}
+
+    def __init__(
+        self,
+        root: Path,
+        files: Sequence[str],
+        directories: Dict[str, int],
+        ignore_file: Optional[Tuple[int, int]] = None,
+    ):
+        self.root = root
+        self.directories = directories
+        self.ignore_file = ignore_file
+        self._files = files
+        self._extensions = {}
+        for file in files:
+            name = file.rsplit("/", 1)[-1]
+            extension = name.rsplit(".", 1)[1] if "." in name else ""
+            self._extensions.setdefault(extension, []).append(file)
+
+    def files(self, extension: str, recursive: bool = True) -> List[Path]:
+        """
+        Query all the files with the given extension.
+
+        :param extension: The extension without the leading dot.
+        :param recursive: Include files in subdirectories.
+        :return: The absolute paths of the files.
+        """
+        return [
+            self.root / file
+            for file in self._extensions.get(extension, ())
+            if recursive or "/" not in file
+        ]
+
+    @staticmethod
+    def build(root: Path) -> "FileIndex":
+        """
+        Walk the directory once, skipping the default pruned directories and the patterns of the ignore file.
+        """
+        root = root.absolute()
+        patterns = FileIndex._ignore_patterns(root)
+        files = []
+        directories = {}
+
+        pending = [""]
+        while len(pending) > 0:
+            relative_directory = pending.pop()
+            directory = root / relative_directory if relative_directory else root
+            try:
+                directories[relative_directory] = directory.stat().st_mtime_ns
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+
+            for entry in entries:
+                relative_path = (
+                    f"{relative_directory}/{entry.name}"
+                    if relative_directory
+                    else entry.name
+                )
+                is_directory = entry.is_dir(follow_symlinks=False)
+                if FileIndex._is_ignored(
+                    relative_path, entry.name, is_directory, patterns
+                ):
+                    continue
+                if is_directory:
+                    pending.append(relative_path)
+                elif entry.is_file():
+                    files.append(relative_path)
+
+        files.sort()
+        return FileIndex(root, files, directories, FileIndex._ignore_file_stat(root))
+
+    @staticmethod
+    def load(root: Path, cache: Cache) -> "FileIndex":
+        """
+        Reuse the index of an earlier run, if no directory was modified since. Otherwise, walk the directory again.
+        """
+        root = root.absolute()
+        index = FileIndex._loaded.get(root)
+        if index is not None and index.is_valid():
+            return index
+
+        key = Cache.key("file-index", str(root))
+        cached = cache.get(key)
+        if cached is not None:
+            cached = json.loads(cached.decode("utf-8"))
+            ignore_file = cached["ignore_file"]
+            index = FileIndex(
+                root,
+                cached["files"],
+                cached["directories"],
+                tuple(ignore_file) if ignore_file is not None else None,
+            )
+            if index.is_valid():
+                FileIndex._loaded[root] = index
+                return index
+
+        index = FileIndex.build(root)
+        FileIndex._loaded[root] = index
+        cache.put(
+            key,
+            json.dumps(
+                {
+                    "files": index._files,
+                    "directories": index.directories,
+                    "ignore_file": index.ignore_file,
+                }
+            ).encode("utf-8"),
+        )
+        return index
+
+    def is_valid(self) -> bool:
+        """
+        Check whether no file was added, removed or renamed since the index was created, without listing directories.
+        """
+        if FileIndex._ignore_file_stat(self.root) != self.ignore_file:
+            return False
+        for relative_directory, modification_time in self.directories.items():
+            directory = self.root / relative_directory if relative_directory else self.root
+            try:
+                if directory.stat().st_mtime_ns != modification_time:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def _ignore_patterns(root: Path) -> List[str]:
+        try:
+            lines = (root / FileIndex.IGNORE_FILE).read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return []
+        return [
+            line.strip()
+            for line in lines
+            if len(line.strip()) > 0 and not line.strip().startswith("#")
+        ]
+
+    @staticmethod
+    def _ignore_file_stat(root: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (root / FileIndex.IGNORE_FILE).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _is_ignored(
+        relative_path: str, name: str, is_directory: bool, patterns: Sequence[str]
+    ) -> bool:
+        """
+        Match a path against the ignore patterns, which follow a subset of the '.gitignore' syntax.
+
+        >>> FileIndex._is_ignored("data/raw", "raw", True, ["raw/"])
+        True
+        >>> FileIndex._is_ignored("a/raw", "raw", False, ["raw/", "/a"])
+        False
+        >>> FileIndex._is_ignored("a/b.tex", "b.tex", False, ["a/*.tex"])
+        True
+        """
+        if is_directory and name in FileIndex.PRUNED_DIRECTORIES:
+            return True
+        for pattern in patterns:
+            if pattern.endswith("/"):
+                if not is_directory:
+                    continue
+                pattern = pattern[:-1]
+            if pattern.startswith("/") or "/" in pattern:
+                if fnmatch.fnmatchcase(relative_path, pattern.lstrip("/")):
+                    return True
+            elif fnmatch.fnmatchcase(name, pattern):
+                return True
+        return False
@@ -0,0 +1,546 @@
+"""
+Pandoc filters applied to the JSON AST within the mdwiz process, so a conversion parses and renders only once instead of
+starting an interpreter and copying the whole document for each filter.
+"""
+
+import abc
+import contextlib
+import copy
+import functools
+import hashlib
+import importlib
+import inspect
+import io
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from mdwiz import timing
+from mdwiz.cache import Cache
+from mdwiz.dependencies import TABLE_INCLUDE_REGEX
+
+Document = Dict
+
+
+class Filter(abc.ABC):
+    def __init__(self, name: str):
+        self.name = name
+
+    @abc.abstractmethod
+    def apply(
+        self, document: Document, output_format: str, cwd: Optional[Path] = None
+    ) -> Document:
+        """
+        Transform the document.
+
+        :param document: The pandoc JSON AST, which may be changed in place.
+        :param output_format: The format the document is rendered to, i.e. 'latex'.
+        :param cwd: The directory relative file names in the document refer to.
+        :return: The transformed document.
+        """
+
+    def fingerprint(self) -> str:
+        """
+        Identify the filter and its version for caching.
+        """
+        return self.name
+
+
+class FunctionFilter(Filter):
+    """
+    A filter implemented by a Python function, which either changes the document in place or returns a new one.
+    """
+
+    def __init__(
+        self,
+        function: Callable[[Document, str], Optional[Document]],
+        name: Optional[str] = None,
+    ):
+        super().__init__(name or f"{function.__module__}.{function.__qualname__}")
+        self.function = function
+
+    def apply(
+        self, document: Document, output_format: str, cwd: Optional[Path] = None
+    ) -> Document:
+        result = self.function(document, output_format)
+        return document if result is None else result
+
+    def fingerprint(self) -> str:
+        code = getattr(self.function, "__code__", None)
+        if code is None:
+            return self.name
+        return f"{self.name}:{hashlib.sha256(code.co_code).hexdigest()}"
+
+
+class ProcessFilter(Filter):
+    """
+    An external filter executable, called exactly like pandoc does.
+    """
+
+    def apply(
+        self, document: Document, output_format: str, cwd: Optional[Path] = None
+    ) -> Document:
+        result = subprocess.run(
+            [self.name, output_format],
+            input=json.dumps(document),
+            capture_output=True,
+            shell=False,
+            text=True,
+            encoding="utf-8",
+            cwd=None if cwd is None else str(cwd),
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Filter '{self.name}' failed: {result.stderr}")
+        return json.loads(result.stdout)
+
+
+class ModuleFilter(Filter):
+    """
+    A filter written in Python whose 'main(stdin, stdout)' is called on in-memory streams, like the pandoc-xnos family.
+    Such filters keep the labels and options of a document in module globals, so these globals are reset to their
+    values after the import before each document instead of leaking them into the next one. As the globals and the
+    process state are shared, only a single document is filtered at a time.
+
+    :param name: The name of the filter.
+    :param modules: The modules whose 'main' is called in order.
+    :param shared: Further modules keeping state for all of them, which are reset as well.
+    """
+
+    def __init__(self, name: str, modules: Sequence[str], shared: Sequence[str] = ()):
+        super().__init__(name)
+        self.shared = [importlib.import_module(module) for module in shared]
+        self.modules = [importlib.import_module(module) for module in modules]
+        self._initial_state = [
+            (module, _module_state(module)) for module in (*self.shared, *self.modules)
+        ]
+
+    def apply(
+        self, document: Document, output_format: str, cwd: Optional[Path] = None
+    ) -> Document:
+        with _process_state(self.name, output_format):
+            for module, state in self._initial_state:
+                vars(module).update(copy.deepcopy(state))
+            for module in self.modules:
+                stdout = io.StringIO()
+                module.main(io.StringIO(json.dumps(document)), stdout)
+                document = json.loads(stdout.getvalue())
+        return document
+
+    def fingerprint(self) -> str:
+        return ":".join(
+            (self.name, *(getattr(module, "__version__", "") for module in self.modules))
+        )
+
+
+def _module_state(module: ModuleType) -> Dict[str, Any]:
+    """
+    Copy the data a module keeps in its globals, skipping the functions, classes and modules it defines or imports.
+    """
+    state = {}
+    for name, value in vars(module).items():
+        if name.startswith("__") or inspect.ismodule(value) or callable(value):
+            continue
+        try:
+            state[name] = copy.deepcopy(value)
+        except Exception:
+            # Values like locks or open files are not copyable, but neither document specific
+            continue
+    return state
+
+
+class PanfluteFilter(Filter):
+    """
+    A filter built on panflute, whose 'main(doc)' transforms a document without any IO, like pantable.
+    """
+
+    def __init__(self, name: str, module: str):
+        super().__init__(name)
+        self.panflute = importlib.import_module("panflute")
+        self.module = importlib.import_module(module)
+
+    def __getstate__(self) -> Dict:
+        # Modules are imported again in worker processes instead of being pickled
+        return {"name": self.name, "module": self.module.__name__}
+
+    def __setstate__(self, state: Dict):
+        self.__init__(state["name"], state["module"])
+
+    def apply(
+        self, document: Document, output_format: str, cwd: Optional[Path] = None
+    ) -> Document:
+        doc = self.panflute.load(io.StringIO(json.dumps(document)))
+        doc.format = output_format
+        # Relative paths would refer to the working directory of the process, which 'TableFilter' avoids
+        with _process_state(self.name, output_format):
+            doc = self.module.main(doc)
+        stdout = io.StringIO()
+        self.panflute.dump(doc, stdout)
+        return json.loads(stdout.getvalue())
+
+    def fingerprint(self) -> str:
+        return f"{self.name}:{getattr(self.module, '__version__', '')}"
+
+
+class TableFilter(Filter):
+    """
+    Render the CSV tables of pantable one by one, so each rendered table is cached by its options and the content of
+    its CSV file. Only the tables missing in the cache are passed to pantable, split into batches rendered
+    concurrently: An external pantable renders each batch in a process of its own, while an in-process one renders
+    them in a pool of worker processes on machines with multiple CPUs, as the GIL and the process state of the filters
+    serialize threads. Otherwise, and for renderers which cannot be passed to other processes, the batches are
+    rendered one after another.
+    """
+
+    # The class of the Divs keeping the tables of a batch apart
+    MARKER = "mdwiz-table"
+
+    def __init__(
+        self,
+        renderer: Filter,
+        cache: Optional[Cache] = None,
+        jobs: Optional[int] = None,
+    ):
+        super().__init__(renderer.name)
+        self.renderer = renderer
+        self.cache = cache
+        self.jobs = jobs or os.cpu_count() or 1
+
+    def apply(
+        self, document: Document, output_format: str, cwd: Optional[Path] = None
+    ) -> Document:
+        tables = list(_iter_tables(document["blocks"]))
+        if len(tables) == 0:
+            return document
+
+        keys = [self._key(table, document, output_format, cwd) for table in tables]
+        rendered: Dict[str, str] = {}
+        if self.cache is not None:
+            for key in keys:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    rendered[key] = cached.decode("utf-8")
+
+        # Identical tables are rendered only once
+        missing = {
+            key: table for key, table in zip(keys, tables) if key not in rendered
+        }
+        if len(missing) > 0:
+            batch_count = min(self.jobs, len(missing))
+            batches = [list(missing)[i::batch_count] for i in range(batch_count)]
+            documents = [
+                self._batch([missing[key] for key in batch], document, cwd)
+                for batch in batches
+            ]
+            render = functools.partial(
+                _render_batch, self.renderer, output_format=output_format, cwd=cwd
+            )
+            if batch_count == 1:
+                results = map(render, documents)
+            elif isinstance(self.renderer, ProcessFilter):
+                with ThreadPoolExecutor(max_workers=batch_count) as executor:
+                    results = list(executor.map(timing.inherit(render), documents))
+            elif (os.cpu_count() or 1) > 1 and _is_picklable(self.renderer):
+                try:
+                    results = list(_worker_pool().map(render, documents))
+                except BrokenProcessPool:
+                    # A worker died, i.e. killed for its memory, so the next document gets a new pool
+                    _worker_pool.cache_clear()
+                    raise
+            else:
+                results = map(render, documents)
+
+            for batch, blocks in zip(batches, results):
+                for key, table_blocks in zip(batch, blocks):
+                    rendered[key] = json.dumps(table_blocks)
+                    if self.cache is not None:
+                        self.cache.put(key, rendered[key].encode("utf-8"))
+            logging.debug(f"Rendered {len(missing)} of {len(tables)} tables.")
+
+        # Copied for each occurrence, as later filters may change the blocks in place
+        replacements = (json.loads(rendered[key]) for key in keys)
+        return {
+            **document, "blocks": _splice_tables(document["blocks"], replacements)
+        }
+
+    def fingerprint(self) -> str:
+        return self.renderer.fingerprint()
+
+    def _key(
+        self,
+        table: Dict,
+        document: Document,
+        output_format: str,
+        cwd: Optional[Path],
+    ) -> str:
+        parts = [
+            "table",
+            self.renderer.fingerprint(),
+            pandoc_version(),
+            json.dumps(document.get("pandoc-api-version")),
+            output_format,
+            json.dumps(table["c"]),
+        ]
+        # The CSV file is hashed in chunks without being parsed, which is only required for tables not cached yet
+        directory = cwd if cwd is not None else Path.cwd()
+        for line in table["c"][1].splitlines():
+            match = TABLE_INCLUDE_REGEX.match(line)
+            if match is not None:
+                path = directory / match.group(1)
+                parts.append(Cache.hash_file(path) if path.is_file() else None)
+        return Cache.key(*parts)
+
+    @staticmethod
+    def _batch(
+        tables: Sequence[Dict], document: Document, cwd: Optional[Path]
+    ) -> Document:
+        """
+        Put the tables into a document of their own, each wrapped into a marked Div to find it afterwards.
+        """
+        directory = (cwd if cwd is not None else Path.cwd()).absolute()
+        return {
+            **{key: value for key, value in document.items() if key != "blocks"},
+            "meta": {},
+            "blocks": [
+                {
+                    "t": "Div",
+                    "c": [
+                        ["", [TableFilter.MARKER], []],
+                        [_absolute_include(table, directory)],
+                    ],
+                }
+                for table in tables
+            ],
+        }
+
+
+def _render_batch(
+    renderer: Filter, batch: Document, output_format: str, cwd: Optional[Path]
+) -> List[List[Dict]]:
+    """
+    Render a document created by 'TableFilter._batch', possibly within a worker process.
+
+    :return: The blocks of each table.
+    """
+    result = renderer.apply(batch, output_format, cwd=cwd)
+    blocks = [
+        block["c"][1]
+        for block in result["blocks"]
+        if block.get("t") == "Div" and TableFilter.MARKER in block["c"][0][1]
+    ]
+    if len(blocks) != len(batch["blocks"]):
+        raise RuntimeError(f"Filter '{renderer.name}' did not keep the tables apart")
+    return blocks
+
+
+def _is_picklable(renderer: Filter) -> bool:
+    try:
+        pickle.dumps(renderer)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        # i.e. functions defined within other functions
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _worker_pool() -> ProcessPoolExecutor:
+    """
+    Create the worker processes once and keep them for all documents, i.e. of the server. They are spawned instead of
+    forked, as a fork would copy the locks held by other threads of the process.
+    """
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _is_table(value) -> bool:
+    return (
+        isinstance(value, dict)
+        and value.get("t") == "CodeBlock"
+        and "table" in value["c"][0][1]
+    )
+
+
+def _absolute_include(table: Dict, directory: Path) -> Dict:
+    """
+    Let the YAML header of a table include its CSV file by absolute path, as the working directory is shared by all
+    conversions of the process.
+    """
+    lines = table["c"][1].split("\n")
+    for index, line in enumerate(lines):
+        match = TABLE_INCLUDE_REGEX.match(line)
+        if match is not None:
+            path = (directory / match.group(1)).as_posix()
+            lines[index] = f"{line[:match.start(1)]}{path}{line[match.end(1):]}"
+    return {**table, "c": [table["c"][0], "\n".join(lines)]}
+
+
+def _iter_tables(value) -> Iterator[Dict]:
+    """
+    Find the code blocks pantable renders, including those nested in other blocks.
+    """
+    if _is_table(value):
+        yield value
+    elif isinstance(value, list):
+        for item in value:
+            yield from _iter_tables(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_tables(item)
+
+
+def _splice_tables(value, replacements: Iterator[List[Dict]]):
+    """
+    Replace the tables in the order '_iter_tables' found them by their rendered blocks.
+    """
+    if isinstance(value, list):
+        result = []
+        for item in value:
+            if _is_table(item):
+                result.extend(next(replacements))
+            else:
+                result.append(_splice_tables(item, replacements))
+        return result
+    elif isinstance(value, dict):
+        return {key: _splice_tables(item, replacements) for key, item in value.items()}
+    return value
+
+
+_process_state_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _process_state(name: str, output_format: str):
+    """
+    Provide the environment of a filter process: In-process filters read the output format from the command line and
+    the pandoc version from the environment, which are process-wide. The working directory is never changed, as other
+    threads resolve relative paths meanwhile, so files are passed to the filters by absolute paths.
+    """
+    with _process_state_lock:
+        arguments = sys.argv
+        version = os.environ.get("PANDOC_VERSION")
+        try:
+            sys.argv = [name, output_format]
+            if pandoc_version() is not None:
+                os.environ["PANDOC_VERSION"] = pandoc_version()
+            yield
+        finally:
+            sys.argv = arguments
+            if version is None:
+                os.environ.pop("PANDOC_VERSION", None)
+            else:
+                os.environ["PANDOC_VERSION"] = version
+
+
+@functools.lru_cache(maxsize=None)
+def pandoc_version() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["pandoc", "--version"], capture_output=True, text=True, encoding="utf-8"
+        )
+    except OSError:
+        return None
+    if result.returncode != 0 or len(result.stdout) == 0:
+        return None
+    return result.stdout.split()[1]
+
+
+class FilterPipeline:
+    """
+    A sequence of filters applied to the same AST, recording the time spent in each one.
+    """
+
+    # Python filters added by the user, which are applied after those passed to pandoc
+    registered: List[Filter] = []
+
+    def __init__(self, filters: Sequence[Filter]):
+        self.filters = list(filters)
+        self.timings: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def register(
+        function: Callable[[Document, str], Optional[Document]],
+        name: Optional[str] = None,
+    ) -> Callable[[Document, str], Optional[Document]]:
+        """
+        Register a Python function as filter for all in-process conversions. Usable as decorator.
+        """
+        FilterPipeline.registered.append(FunctionFilter(function, name=name))
+        return function
+
+    @staticmethod
+    def load(specification: str) -> Filter:
+        """
+        Load a Python filter function given as 'module:function'.
+        """
+        module, _, function = specification.partition(":")
+        if len(function) == 0:
+            raise ValueError(
+                f"Filter '{specification}' is not given as 'module:function'"
+            )
+        return FunctionFilter(
+            getattr(importlib.import_module(module), function), name=specification
+        )
+
+    @staticmethod
+    def from_names(
+        names: Sequence[str], cache: Optional[Cache] = None
+    ) -> "FilterPipeline":
+        """
+        Create the pipeline for the given pandoc filters. Known Python filters run in-process if they are importable,
+        all others are started as processes.
+
+        :param names: The names of the filters as passed to pandoc.
+        :param cache: The cache for the tables rendered by pantable.
+        """
+        filters = [
+            TableFilter(FilterPipeline._create(name), cache=cache)
+            if name == "pantable"
+            else FilterPipeline._create(name)
+            for name in names
+        ]
+        return FilterPipeline([*filters, *FilterPipeline.registered])
+
+    @staticmethod
+    def _create(name: str) -> Filter:
+        try:
+            if name == "pandoc-xnos":
+                return ModuleFilter(
+                    name,
+                    ["pandoc_fignos", "pandoc_eqnos", "pandoc_tablenos", "pandoc_secnos"],
+                    shared=["pandocxnos"],
+                )
+            elif name == "pantable":
+                try:
+                    return PanfluteFilter(name, "pantable.cli.pantable")
+                except ImportError:
+                    return PanfluteFilter(name, "pantable.pantable")
+        except ImportError:
+            logging.debug(f"Filter '{name}' is not importable, starting it as process.")
+        return ProcessFilter(name)
+
+    def apply(
+        self, document: Document, output_format: str, cwd: Optional[Path] = None
+    ) -> Document:
+        for document_filter in self.filters:
+            start = time.perf_counter()
+            with timing.span(f"filter {document_filter.name}", "filter"):
+                document = document_filter.apply(document, output_format, cwd=cwd)
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.timings.append((document_filter.name, duration))
+        return document
+
+    def fingerprint(self) -> str:
+        return ",".join(document_filter.fingerprint() for document_filter in self.filters)
@@ -0,0 +1,363 @@
+"""
+Typeset the converted LaTeX into a PDF. The build directory persists between runs, so the auxiliary files of the last
+build let the next one converge in fewer passes, and biber or BibTeX only run if the cited entries changed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from mdwiz import timing
+from mdwiz.cache import Cache, atomic_writer
+
+
+class PdfBuilder:
+    ENGINES = ("pdflatex", "xelatex", "lualatex")
+
+    # The files whose content decides whether another pass is required
+    STATE_EXTENSIONS = (".aux", ".toc", ".lof", ".lot", ".out", ".bcf")
+    RERUN_REGEX = re.compile(
+        r"Rerun to get|Please rerun LaTeX|Label\(s\) may have changed"
+    )
+    BCF_DATASOURCE_REGEX = re.compile(
+        r"<bcf:datasource[^>]*>([^<]+)</bcf:datasource>"
+    )
+
+    class BuildError(Exception):
+        def __init__(self, msg: str, status_code: int):
+            super().__init__(msg)
+            self.status_code = status_code
+
+    class Result:
+        def __init__(self, pdf_file: Path, passes: int, bibliography: bool):
+            self.pdf_file = pdf_file
+            self.passes = passes
+            self.bibliography = bibliography
+
+    def __init__(
+        self, build_directory: Path, engine: str = "pdflatex", max_passes: int = 5
+    ):
+        self.build_directory = build_directory
+        self.engine = engine
+        self.max_passes = max_passes
+        self._bibliography_directory = None
+
+    @staticmethod
+    def for_document(
+        document_directory: Path,
+        engine: str = "pdflatex",
+        cache: Optional[Cache] = None,
+    ) -> "PdfBuilder":
+        """
+        Create the builder of a document, whose build directory is kept in the cache if available.
+        """
+        if cache is not None:
+            build_directory = (
+                cache.directory
+                / "pdf"
+                / Cache.key(str(document_directory.absolute()), engine)[:16]
+            )
+        else:
+            build_directory = document_directory / ".mdwiz-build"
+        return PdfBuilder(build_directory, engine=engine)
+
+    def is_available(self) -> bool:
+        return shutil.which(self.engine) is not None
+
+    @timing.timed("pdf")
+    def build(
+        self,
+        latex: str,
+        name: str,
+        cwd: Path,
+        bibliographies: Optional[Dict[str, Path]] = None,
+    ) -> "PdfBuilder.Result":
+        """
+        Typeset the document until its references converge.
+
+        :param latex: The complete LaTeX document.
+        :param name: The name of the document without extension.
+        :param cwd: The directory relative paths like images are resolved against.
+        :param bibliographies: Replacements for the bibliographies referenced by the document, i.e. pruned ones, by
+            their path relative to 'cwd'.
+        :return: The built PDF, which stays in the build directory, and the number of passes.
+        """
+        self.build_directory.mkdir(parents=True, exist_ok=True)
+        self._bibliography_directory = self._stage_bibliographies(
+            bibliographies or {}, cwd
+        )
+        tex_file = self.build_directory / f"{name}.tex"
+        pdf_file = self.build_directory / f"{name}.pdf"
+
+        unchanged = (
+            tex_file.is_file() and tex_file.read_text(encoding="utf-8") == latex
+        )
+        if unchanged and pdf_file.is_file() and self._inputs_unchanged(name):
+            return PdfBuilder.Result(pdf_file, 0, False)
+        if not unchanged:
+            tex_file.write_text(latex, encoding="utf-8")
+        (self.build_directory / f"{name}.mdwiz-inputs").unlink(missing_ok=True)
+
+        passes = 0
+        bibliography = None
+        while passes < self.max_passes:
+            state = self._state(name)
+            log = self._typeset(tex_file, cwd)
+            passes += 1
+
+            # The bibliography is resolved after the first pass wrote the citations
+            if bibliography is None:
+                bibliography = self._process_bibliography(name, cwd)
+                if bibliography:
+                    continue
+            rerun = PdfBuilder.RERUN_REGEX.search(log) is not None
+            if self._state(name) == state and not rerun:
+                break
+        else:
+            logging.warning(
+                f"References did not converge within {self.max_passes} passes."
+            )
+
+        self._record_inputs(name, cwd)
+        return PdfBuilder.Result(pdf_file, passes, bool(bibliography))
+
+    def _typeset(self, tex_file: Path, cwd: Path) -> str:
+        with timing.span(self.engine, "subprocess"):
+            result = subprocess.run(
+                [
+                    self.engine,
+                    "-interaction=nonstopmode",
+                    "-halt-on-error",
+                    "-file-line-error",
+                    "-recorder",
+                    f"-output-directory={self.build_directory}",
+                    str(tex_file),
+                ],
+                capture_output=True,
+                shell=False,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                cwd=str(cwd),
+            )
+
+        log_file = tex_file.with_suffix(".log")
+        log = (
+            log_file.read_text(encoding="utf-8", errors="replace")
+            if log_file.is_file()
+            else result.stdout
+        )
+        if result.returncode != 0:
+            errors = [
+                line
+                for line in log.splitlines()
+                if line.startswith("!") or re.match(r"^[^:\s]+:\d+:", line)
+            ]
+            raise PdfBuilder.BuildError(
+                "\n".join(errors[:10]) or result.stdout[-2000:], result.returncode
+            )
+        return log
+
+    def _process_bibliography(self, name: str, cwd: Path) -> bool:
+        """
+        Run biber or BibTeX, if the citations or the bibliography changed since the last build.
+
+        :return: True, if the bibliography was processed again.
+        """
+        tool, fingerprint = self._bibliography_fingerprint(name, cwd)
+        if tool is None:
+            return False
+
+        fingerprint_file = self.build_directory / f"{name}.mdwiz-bibliography"
+        bbl_file = self.build_directory / f"{name}.bbl"
+        if (
+            bbl_file.is_file()
+            and fingerprint_file.is_file()
+            and fingerprint_file.read_text() == fingerprint
+        ):
+            logging.debug(f"Citations are unchanged, skipping {tool}.")
+            return False
+
+        bibliography_directory = self._bibliography_directory or cwd
+        if tool == "biber":
+            command = [
+                "biber",
+                f"--input-directory={bibliography_directory}",
+                f"--output-directory={self.build_directory}",
+                name,
+            ]
+            environment = None
+        else:
+            command = ["bibtex", name]
+            environment = dict(os.environ)
+            environment["BIBINPUTS"] = os.pathsep.join(
+                (str(bibliography_directory), environment.get("BIBINPUTS", ""))
+            )
+
+        with timing.span(tool, "subprocess"):
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                shell=False,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                cwd=str(self.build_directory if tool == "bibtex" else cwd),
+                env=environment,
+            )
+        if result.returncode != 0:
+            raise PdfBuilder.BuildError(
+                result.stdout + result.stderr, result.returncode
+            )
+
+        fingerprint_file.write_text(fingerprint)
+        return True
+
+    def _stage_bibliographies(
+        self, bibliographies: Dict[str, Path], cwd: Path
+    ) -> Optional[Path]:
+        """
+        Copy the replacements of the bibliographies into the build directory, keeping the paths the document uses.
+
+        :return: The directory to look up the bibliographies in, or None if those of the document are used.
+        """
+        if len(bibliographies) == 0 or any(
+            Path(relative).is_absolute() or ".." in Path(relative).parts
+            for relative in bibliographies
+        ):
+            return None
+
+        directory = self.build_directory / "bibliographies"
+        for relative, replacement in bibliographies.items():
+            target = directory / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(replacement, target)
+        return directory
+
+    def _bibliography_fingerprint(
+        self, name: str, cwd: Path
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Identify the cited keys and the content of the bibliography files of the last pass.
+
+        :return: The tool processing the bibliography and the fingerprint, or (None, None) without bibliography.
+        """
+        tool, control, sources = self._bibliography_control(name)
+        if tool is None:
+            return None, None
+        return tool, PdfBuilder._fingerprint(control, sources, cwd)
+
+    def _bibliography_control(self, name: str) -> Tuple[Optional[str], str, List[str]]:
+        """
+        Read the cited keys and the bibliography files of the last pass, as written for biber or BibTeX.
+
+        :return: The tool processing the bibliography, its input and the bibliography files relative to the working
+            directory, or (None, "", []) without bibliography.
+        """
+        bcf_file = self.build_directory / f"{name}.bcf"
+        aux_file = self.build_directory / f"{name}.aux"
+        if bcf_file.is_file():
+            control = bcf_file.read_text(encoding="utf-8", errors="replace")
+            return "biber", control, PdfBuilder.BCF_DATASOURCE_REGEX.findall(control)
+        elif aux_file.is_file():
+            lines = aux_file.read_text(encoding="utf-8", errors="replace").splitlines(
+                keepends=True
+            )
+            control = "".join(
+                line
+                for line in lines
+                if line.startswith(("\\citation", "\\bibdata", "\\bibstyle"))
+            )
+            if "\\bibdata" not in control:
+                return None, "", []
+            sources = [
+                f"{source.strip()}.bib"
+                for line in control.splitlines()
+                if line.startswith("\\bibdata")
+                for source in line[len("\\bibdata{"):].rstrip("}").split(",")
+            ]
+            return "bibtex", control, sources
+        return None, "", []
+
+    @staticmethod
+    def _fingerprint(control: str, sources: List[str], cwd: Path) -> str:
+        digest = hashlib.sha256(control.encode("utf-8"))
+        for source in sources:
+            path = cwd / source
+            digest.update(Cache.hash_file(path).encode() if path.is_file() else b"-")
+        return digest.hexdigest()
+
+    def _state(self, name: str) -> Dict[str, str]:
+        state = {}
+        for extension in PdfBuilder.STATE_EXTENSIONS:
+            path = self.build_directory / f"{name}{extension}"
+            if path.is_file():
+                state[extension] = Cache.hash_file(path)
+        return state
+
+    def _record_inputs(self, name: str, cwd: Path):
+        with atomic_writer(
+            self.build_directory / f"{name}.mdwiz-inputs", encoding="utf-8"
+        ) as file:
+            json.dump(self._inputs(name, cwd), file)
+
+    def _inputs_unchanged(self, name: str) -> bool:
+        """
+        Check whether no file read by the last build, like images or packages, changed since.
+        """
+        try:
+            inputs = json.loads(
+                (self.build_directory / f"{name}.mdwiz-inputs").read_text(
+                    encoding="utf-8"
+                )
+            )
+        except (OSError, ValueError):
+            return False
+        for path, recorded in inputs.items():
+            try:
+                stat = Path(path).stat()
+            except OSError:
+                return False
+            if [stat.st_mtime_ns, stat.st_size] != recorded:
+                return False
+        return True
+
+    def _inputs(self, name: str, cwd: Path) -> Dict[str, List[int]]:
+        # The recorder file lists all files read by the engine, relative to its working directory
+        try:
+            lines = (
+                (self.build_directory / f"{name}.fls")
+                .read_text(encoding="utf-8", errors="replace")
+                .splitlines()
+            )
+        except OSError:
+            return {}
+
+        # The bibliographies are read by biber or BibTeX instead of the engine
+        _, _, sources = self._bibliography_control(name)
+        paths = [
+            *(
+                cwd / line[len("INPUT "):]
+                for line in lines
+                if line.startswith("INPUT ")
+            ),
+            *(cwd / source for source in sources),
+        ]
+
+        inputs = {}
+        for path in paths:
+            if path.parent == self.build_directory:
+                # Written by the build itself
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            inputs[str(path)] = [stat.st_mtime_ns, stat.st_size]
+        return inputs
@@ -0,0 +1,192 @@
+"""
+A long-lived process converting documents on behalf of thin clients, which connect through a Unix domain socket. Hence,
+it is only available on platforms supporting these sockets.
+
+Each request is a single JSON line with the command line arguments and the working directory of the client. The server
+answers with JSON lines carrying log messages and the converted document, finished by the status code.
+"""
+
+import argparse
+import contextvars
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import warnings
+from pathlib import Path
+from typing import Optional, Sequence
+
+from mdwiz import NAME
+from mdwiz.__main__ import StatusCode, build_parser, print_output, run
+
+
+def default_socket_path() -> Path:
+    runtime_directory = os.environ.get("XDG_RUNTIME_DIR", tempfile.gettempdir())
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    return Path(runtime_directory) / f"mdwiz-{user}.sock"
+
+
+# The request handled in the current context, which worker threads of the conversion inherit by 'timing.inherit'
+_client: "contextvars.ContextVar[Optional[_RequestHandler]]" = contextvars.ContextVar(
+    "client", default=None
+)
+
+
+class _ClientLogHandler(logging.Handler):
+    """
+    Forward the log records emitted while handling a request to the corresponding client.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+
+    def emit(self, record: logging.LogRecord):
+        client = _client.get()
+        if client is not None:
+            client.send(log=self.format(record))
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self._send_lock = threading.Lock()
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+            arguments = build_parser().parse_args(request["argv"])
+            if arguments.watch:
+                raise ValueError("Watching is not supported by the server")
+        except (ValueError, KeyError, SystemExit):
+            self.send(status=int(StatusCode.FileError), log="[ERROR] Invalid request")
+            return
+
+        token = _client.set(self)
+        try:
+            status_code = run(
+                arguments,
+                cwd=Path(request["cwd"]),
+                output=lambda converted_file: self.send(output=converted_file),
+            )
+        except Exception as ex:
+            logging.exception(ex)
+            status_code = StatusCode.PandocError
+        finally:
+            _client.reset(token)
+        self.send(status=int(status_code))
+
+    def send(self, **message):
+        with self._send_lock:
+            try:
+                self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                # The client disconnected, the conversion is still finished for warming the caches
+                pass
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path):
+        if path.exists():
+            # Only remove stale sockets, never a running server
+            if _is_listening(path):
+                raise RuntimeError(f"Another server is listening on '{path}'")
+            path.unlink()
+        super().__init__(str(path), _RequestHandler)
+        os.chmod(str(path), 0o600)
+
+        self.log_handler = _ClientLogHandler()
+        logging.getLogger().addHandler(self.log_handler)
+
+        from mdwiz.converter import Converter
+
+        # The registry of shown warnings is global, while every client has to be told about its missing references.
+        # The filters are restored once the server is closed.
+        self._warning_filters = warnings.catch_warnings()
+        self._warning_filters.__enter__()
+        warnings.simplefilter("always", Converter.MissingReferenceWarning)
+
+    def server_close(self):
+        super().server_close()
+        logging.getLogger().removeHandler(self.log_handler)
+        self._warning_filters.__exit__(None, None, None)
+        Path(self.server_address).unlink(missing_ok=True)
+
+
+def _is_listening(path: Path) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(str(path))
+        return True
+    except OSError:
+        return False
+
+
+def forward(
+        path: str, argv: Sequence[str], cwd: Optional[str] = None
+) -> Optional[StatusCode]:
+    """
+    Let the server convert the document, printing its logs and output like a local conversion.
+
+    :param path: The socket of the server.
+    :param argv: The command line arguments.
+    :param cwd: The directory of the document, which defaults to the current working directory.
+    :return: The status code of the conversion or None, if no server is reachable.
+    """
+    try:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    except OSError:
+        logging.debug(f"No server listening on '{path}', converting locally.")
+        return None
+
+    with connection, connection.makefile("rwb") as stream:
+        stream.write(
+            json.dumps({"argv": list(argv), "cwd": cwd or os.getcwd()}).encode("utf-8") + b"\n"
+        )
+        stream.flush()
+        for line in stream:
+            message = json.loads(line.decode("utf-8"))
+            if "log" in message:
+                sys.stderr.write(message["log"] + "\n")
+            if "output" in message:
+                print_output(message["output"])
+            if "status" in message:
+                return StatusCode(message["status"])
+
+    logging.error("The server closed the connection unexpectedly.")
+    return StatusCode.PandocError
+
+
+def main(argv: Sequence[str]) -> StatusCode:
+    parser = argparse.ArgumentParser(
+        prog=f"{NAME} serve",
+        description="Keep converting documents for clients, which are started with the environment variable "
+        "MDWIZ_SOCKET pointing to the socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        help="The path of the Unix domain socket.",
+        type=str,
+        default=str(default_socket_path()),
+    )
+    arguments = parser.parse_args(argv)
+
+    try:
+        server = Server(Path(arguments.socket))
+    except (OSError, RuntimeError) as ex:
+        logging.error(str(ex))
+        return StatusCode.FileError
+
+    logging.info(f"Listening on '{arguments.socket}'.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return StatusCode.Success
@@ -0,0 +1,507 @@
+"""
+A build queue kept in a directory shared by multiple workers, which may run on different hosts mounting it. A job is
+claimed by renaming its manifest, which only one worker succeeds with, so no broker or lock server is required. The
+workers renew their claims while converting, such that the jobs of crashed workers are queued again once their claims
+went stale.
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from mdwiz import NAME
+from mdwiz.__main__ import (
+    MdwizRuntimeError,
+    ResolvedFiles,
+    StatusCode,
+    build_parser,
+    resolve_files,
+    run,
+)
+from mdwiz.cache import atomic_writer
+
+
+class Job:
+    """
+    The conversion of a single document with the files resolved on submission, which are all absolute paths.
+    """
+
+    def __init__(
+        self,
+        cwd: Path,
+        markdown_files: Sequence[Path],
+        output: Path,
+        bibliographies: Sequence[Path] = (),
+        template_file: Optional[Path] = None,
+        csl_file: Optional[Path] = None,
+        options: Sequence[str] = (),
+        id: Optional[str] = None,
+        attempts: int = 0,
+        submitted: Optional[float] = None,
+    ):
+        # Ordered by their submission, as the workers claim the first one
+        self.id = (
+            id if id is not None else f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        )
+        self.cwd = cwd
+        self.markdown_files = list(markdown_files)
+        self.output = output
+        self.bibliographies = list(bibliographies)
+        self.template_file = template_file
+        self.csl_file = csl_file
+        self.options = list(options)
+        self.attempts = attempts
+        self.submitted = submitted if submitted is not None else time.time()
+
+    def files(self) -> ResolvedFiles:
+        return (
+            self.markdown_files,
+            self.bibliographies,
+            self.template_file,
+            self.csl_file,
+        )
+
+    def to_dict(self) -> Dict:
+        def optional(path: Optional[Path]) -> Optional[str]:
+            return str(path) if path is not None else None
+
+        return {
+            "id": self.id,
+            "cwd": str(self.cwd),
+            "markdown": [str(file) for file in self.markdown_files],
+            "output": str(self.output),
+            "bibliography": [str(file) for file in self.bibliographies],
+            "template": optional(self.template_file),
+            "csl": optional(self.csl_file),
+            "options": self.options,
+            "attempts": self.attempts,
+            "submitted": self.submitted,
+        }
+
+    @staticmethod
+    def from_dict(manifest: Dict) -> "Job":
+        return Job(
+            Path(manifest["cwd"]),
+            [Path(file) for file in manifest["markdown"]],
+            Path(manifest["output"]),
+            bibliographies=[Path(file) for file in manifest["bibliography"]],
+            template_file=Path(manifest["template"]) if manifest["template"] else None,
+            csl_file=Path(manifest["csl"]) if manifest["csl"] else None,
+            options=manifest["options"],
+            id=manifest["id"],
+            attempts=manifest["attempts"],
+            submitted=manifest["submitted"],
+        )
+
+
+class Spool:
+    """
+    The queue of jobs, with a directory for each of their states. Their manifests are moved between them by renames,
+    which are atomic on a single file system.
+    """
+
+    QUEUES = ("incoming", "claimed", "done", "failed")
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        for queue in Spool.QUEUES:
+            (directory / queue).mkdir(parents=True, exist_ok=True)
+
+    def submit(self, job: Job):
+        self._write("incoming", job.to_dict())
+
+    def claim(self) -> Optional[Job]:
+        """
+        Claim the oldest queued job, which no other worker gets afterwards.
+
+        :return: The job or None, if the queue is empty.
+        """
+        for path in sorted((self.directory / "incoming").glob("*.json")):
+            claimed = self.directory / "claimed" / path.name
+            try:
+                os.rename(path, claimed)
+                # The rename keeps the time of the submission, which would make the claim look stale
+                os.utime(claimed)
+                return Job.from_dict(json.loads(claimed.read_text(encoding="utf-8")))
+            except FileNotFoundError:
+                # Claimed by another worker in the meantime, or reclaimed as stale
+                continue
+            except (ValueError, KeyError) as error:
+                # Never retried, as it would fail the same way again
+                logging.error(f"Discarding the invalid job '{path.name}': {error}")
+                os.replace(claimed, self.directory / "failed" / path.name)
+                continue
+        return None
+
+    def renew(self, job: Job) -> bool:
+        """
+        Mark the claim of the job as alive.
+
+        :return: False, if the job was reclaimed by another worker as its claim went stale.
+        """
+        try:
+            os.utime(self._claimed(job))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def finish(self, job: Job, result: Dict):
+        """
+        Store the result of a job in 'done' or, if it failed, in 'failed'.
+
+        :param job: The claimed job.
+        :param result: The 'status' of the conversion and further details, which are added to the manifest.
+        """
+        queue = "done" if result["status"] == StatusCode.Success.name else "failed"
+        self._write(queue, {**job.to_dict(), **result})
+        self._claimed(job).unlink(missing_ok=True)
+
+    def retry(self, job: Job, max_attempts: int, error: str):
+        """
+        Queue a claimed job again after a failed attempt, unless it failed too often.
+        """
+        job.attempts += 1
+        self._retry(job, max_attempts, error)
+        self._claimed(job).unlink(missing_ok=True)
+
+    def release(self, job: Job):
+        """
+        Give up the claim of a job without attempting it, i.e. on the shutdown of the worker.
+        """
+        try:
+            os.rename(
+                self._claimed(job), self.directory / "incoming" / f"{job.id}.json"
+            )
+        except FileNotFoundError:
+            pass
+
+    def reclaim_stale(self, stale_after: float, max_attempts: int) -> int:
+        """
+        Queue the jobs again whose claims were not renewed for a while, as their workers most likely crashed.
+
+        :param stale_after: The seconds after which a claim is stale.
+        :param max_attempts: The number of attempts after which a job is failed instead.
+        :return: The number of reclaimed jobs.
+        """
+        reclaimed = 0
+        for path in sorted((self.directory / "claimed").glob("*.json")):
+            # Renamed first, so only a single worker reclaims the job
+            hidden = path.with_name(f".{path.stem}-{uuid.uuid4().hex[:8]}.reclaim")
+            try:
+                if time.time() - path.stat().st_mtime < stale_after:
+                    continue
+                os.rename(path, hidden)
+            except FileNotFoundError:
+                continue
+
+            try:
+                job = Job.from_dict(json.loads(hidden.read_text(encoding="utf-8")))
+            except (ValueError, KeyError) as error:
+                # Discarded like on claiming, instead of stopping the worker
+                logging.error(f"Discarding the invalid job '{path.name}': {error}")
+                os.replace(hidden, self.directory / "failed" / path.name)
+                continue
+            job.attempts += 1
+            logging.warning(f"Reclaimed job '{job.id}' after its claim went stale.")
+            self._retry(job, max_attempts, "The worker stopped renewing its claim")
+            hidden.unlink()
+            reclaimed += 1
+        return reclaimed
+
+    def statistics(self, window: float = 600.0) -> Dict[str, float]:
+        """
+        Count the jobs in each state and the jobs finished per minute within the recent window.
+
+        :param window: The seconds of recent history the throughput is averaged over.
+        """
+        statistics: Dict[str, float] = {
+            queue: sum(1 for _ in (self.directory / queue).glob("*.json"))
+            for queue in Spool.QUEUES
+        }
+        now = time.time()
+        finished = 0
+        for queue in ("done", "failed"):
+            for path in (self.directory / queue).glob("*.json"):
+                try:
+                    finished += now - path.stat().st_mtime <= window
+                except FileNotFoundError:
+                    pass
+        statistics["throughput"] = finished * 60.0 / window
+        return statistics
+
+    def _retry(self, job: Job, max_attempts: int, error: str):
+        if job.attempts >= max_attempts:
+            logging.error(f"Job '{job.id}' failed {job.attempts} times: {error}")
+            self._write(
+                "failed", {**job.to_dict(), "status": "Crashed", "error": error}
+            )
+        else:
+            self._write("incoming", job.to_dict())
+
+    def _claimed(self, job: Job) -> Path:
+        return self.directory / "claimed" / f"{job.id}.json"
+
+    def _write(self, queue: str, manifest: Dict):
+        # Written to a temporary file first, which is not matched by '*.json', so no worker reads it partially
+        with atomic_writer(
+            self.directory / queue / f"{manifest['id']}.json", encoding="utf-8"
+        ) as file:
+            json.dump(manifest, file, indent=2)
+
+
+class _Lease:
+    """
+    Renew the claim of a job in the background while it is converted.
+    """
+
+    def __init__(self, spool: Spool, job: Job, interval: float):
+        self.lost = False
+        self._spool = spool
+        self._job = job
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._renew, daemon=True)
+
+    def __enter__(self) -> "_Lease":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stopped.set()
+        self._thread.join()
+
+    def _renew(self):
+        while not self._stopped.wait(self._interval):
+            if not self._spool.renew(self._job):
+                self.lost = True
+                return
+
+
+class _MessageCollector(logging.Handler):
+    """
+    Keep the messages logged during a job, which are stored with its result.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(f"[{record.levelname}] {record.getMessage()}")
+
+
+def execute(job: Job) -> Dict:
+    """
+    Convert the document of a job with the files resolved on submission.
+
+    :return: The result stored with the job.
+    """
+    collector = _MessageCollector()
+    logging.getLogger().addHandler(collector)
+    start = time.perf_counter()
+    try:
+        job.output.parent.mkdir(parents=True, exist_ok=True)
+        status_code = run(
+            build_parser().parse_args([*job.options, "--output", str(job.output)]),
+            cwd=job.cwd,
+            files=job.files(),
+        )
+    finally:
+        logging.getLogger().removeHandler(collector)
+    return {
+        "status": status_code.name,
+        "worker": f"{socket.gethostname()}:{os.getpid()}",
+        "duration": time.perf_counter() - start,
+        "finished": time.time(),
+        "messages": collector.messages,
+    }
+
+
+def work(
+    spool: Spool,
+    poll_interval: float = 1.0,
+    stale_after: float = 300.0,
+    max_attempts: int = 3,
+    exit_when_empty: bool = False,
+) -> StatusCode:
+    """
+    Convert the jobs of the spool one after another.
+
+    :param spool: The queue shared with the other workers.
+    :param poll_interval: The seconds to wait for new jobs once the queue is empty.
+    :param stale_after: The seconds after which the claims of other workers are considered as crashed.
+    :param max_attempts: The number of attempts after which a job is failed.
+    :param exit_when_empty: Stop once the queue is empty instead of waiting for new jobs.
+    :return: The combined status of the converted jobs.
+    """
+    status_codes = []
+    start = time.perf_counter()
+    try:
+        while True:
+            spool.reclaim_stale(stale_after, max_attempts)
+            job = spool.claim()
+            if job is None:
+                if exit_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            error = None
+            with _Lease(spool, job, stale_after / 4) as lease:
+                try:
+                    result = execute(job)
+                except KeyboardInterrupt:
+                    spool.release(job)
+                    raise
+                except Exception as ex:
+                    error = str(ex)
+                    logging.error(f"Job '{job.id}' failed: {error}")
+            # The job was queued again by the worker reclaiming it, so it must not be retried or finished twice
+            if lease.lost:
+                logging.warning(f"Job '{job.id}' was reclaimed by another worker.")
+                continue
+            if error is not None:
+                spool.retry(job, max_attempts, error)
+                continue
+
+            if result["status"] == StatusCode.MissingDependency.name:
+                # Another worker may have the tools installed
+                spool.retry(job, max_attempts, "Missing dependency")
+                time.sleep(poll_interval)
+                continue
+            spool.finish(job, result)
+            status_codes.append(StatusCode[result["status"]])
+            log = logging.info if status_codes[-1].is_successfull() else logging.error
+            log(f"Job '{job.id}': {result['status']} ({result['duration']:.2f} s)")
+    except KeyboardInterrupt:
+        pass
+
+    duration = time.perf_counter() - start
+    logging.info(
+        f"Converted {len(status_codes)} jobs in {duration:.2f} s "
+        f"({len(status_codes) * 60.0 / max(duration, 1e-9):.1f} per minute)."
+    )
+    return StatusCode.combine(status_codes)
+
+
+def submit(
+    spool: Spool, documents: Sequence[Path], arguments: Sequence[str]
+) -> List[Job]:
+    """
+    Resolve the files of the documents like a conversion does and queue them.
+
+    :param spool: The queue.
+    :param documents: The directories of the documents.
+    :param arguments: The command line arguments of the conversions.
+    :return: The submitted jobs.
+    """
+    from mdwiz.cache import Cache
+
+    jobs = []
+    for document in documents:
+        document = document.absolute()
+        document_arguments = build_parser().parse_args(arguments)
+        cache = None if document_arguments.no_cache else Cache.default()
+        files = resolve_files(document_arguments, document, cache)
+        markdown_files, bibliographies, template_file, csl_file = files
+        output = (
+            document / document_arguments.output
+            if len(document_arguments.output) > 0
+            else document / f"{markdown_files[0].stem}.tex"
+        )
+        job = Job(
+            document,
+            markdown_files,
+            output,
+            bibliographies=bibliographies,
+            template_file=template_file,
+            csl_file=csl_file,
+            options=arguments,
+        )
+        spool.submit(job)
+        jobs.append(job)
+    return jobs
+
+
+def main(argv: Sequence[str]) -> StatusCode:
+    parser = argparse.ArgumentParser(
+        prog=f"{NAME} worker",
+        description="Convert the jobs queued in a spool directory, which is shared by workers on multiple hosts.",
+    )
+    parser.add_argument(
+        "--spool", help="The directory of the queue.", type=str, required=True
+    )
+    parser.add_argument(
+        "--submit",
+        help="Queue the documents in the given directories instead of converting. Unknown arguments are passed to "
+        "their conversion.",
+        type=str,
+        nargs="+",
+        metavar="DOCUMENT",
+        default=None,
+    )
+    parser.add_argument(
+        "--stats",
+        help="Print the number of jobs in each state and the jobs finished per minute as JSON.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        help="The seconds to wait for new jobs once the queue is empty.",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--stale-after",
+        help="The seconds after which the job of a worker, which stopped renewing its claim, is queued again.",
+        type=float,
+        default=300.0,
+    )
+    parser.add_argument(
+        "--max-attempts",
+        help="The number of attempts after which a job is failed.",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--exit-when-empty",
+        help="Stop once the queue is empty instead of waiting for new jobs.",
+        action="store_true",
+    )
+    arguments, document_arguments = parser.parse_known_args(argv)
+    if arguments.submit is None and len(document_arguments) > 0:
+        parser.error(f"unrecognized arguments: {' '.join(document_arguments)}")
+
+    spool = Spool(Path(arguments.spool))
+    if arguments.stats:
+        print(json.dumps(spool.statistics(), indent=2))
+        return StatusCode.Success
+    elif arguments.submit is not None:
+        try:
+            jobs = submit(
+                spool,
+                [Path(document) for document in arguments.submit],
+                document_arguments,
+            )
+        except MdwizRuntimeError as runtime_error:
+            runtime_error.log()
+            return runtime_error.status_code
+        for job in jobs:
+            logging.info(f"Submitted job '{job.id}' for '{job.cwd}'.")
+        return StatusCode.Success
+
+    logging.info(f"Waiting for jobs in '{spool.directory}'.")
+    return work(
+        spool,
+        poll_interval=arguments.poll_interval,
+        stale_after=arguments.stale_after,
+        max_attempts=arguments.max_attempts,
+        exit_when_empty=arguments.exit_when_empty,
+    )
@@ -0,0 +1,365 @@
+"""
+Merge multiple bibliographies, i.e. those of a project and one shared by a group, into a single one for pandoc. The
+entries are indexed in SQLite, which is kept in the cache, so a source is only parsed again once it changed and keys
+are looked up without loading all entries into memory.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from mdwiz import bibtex, csljson, timing
+from mdwiz.cache import Cache, atomic_writer
+
+
+class BibliographyStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sources (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            source TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            key TEXT,
+            text TEXT NOT NULL,
+            parents TEXT NOT NULL,
+            digest TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_by_key ON entries (key);
+        CREATE INDEX IF NOT EXISTS entries_by_source ON entries (source, position);
+    """
+
+    class Duplicate:
+        """
+        A key defined by multiple entries, of which the first one is used.
+        """
+
+        def __init__(self, key: str, sources: List[Path], identical: bool):
+            self.key = key
+            self.sources = sources
+            self.identical = identical
+
+        def __str__(self):
+            kind = "Duplicate" if self.identical else "Conflicting"
+            return (
+                f"{kind} entries of '{self.key}' in "
+                f"{', '.join(str(source) for source in self.sources)}"
+            )
+
+    def __init__(self, database: str = ":memory:"):
+        self._connection = sqlite3.connect(database, timeout=30)
+        with self._connection:
+            self._connection.executescript(BibliographyStore.SCHEMA)
+
+    @staticmethod
+    def for_cache(cache: Optional[Cache]) -> "BibliographyStore":
+        """
+        Open the store kept in the cache, which is shared by all documents, or a store in memory without cache.
+        """
+        if cache is None:
+            return BibliographyStore()
+        cache.directory.mkdir(parents=True, exist_ok=True)
+        # Not within a subdirectory of the cache, which would be evicted like any other entry
+        return BibliographyStore(str(cache.directory / "bibliographies.sqlite3"))
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> "BibliographyStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @timing.timed("bibliography store")
+    def update(self, sources: Iterable[Path]) -> List[Path]:
+        """
+        Index the sources which are new or changed since their last update.
+
+        :return: The sources which were parsed.
+        """
+        updated = []
+        for source in sources:
+            path = str(source.absolute())
+            stat = source.stat()
+            row = self._connection.execute(
+                "SELECT size, mtime, digest FROM sources WHERE path = ?", (path,)
+            ).fetchone()
+            if row is not None and (row[0], row[1]) == (
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                continue
+
+            digest = Cache.hash_file(source)
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime_ns, digest),
+                )
+                if row is not None and row[2] == digest:
+                    # Touched, but not changed
+                    continue
+                self._connection.execute(
+                    "DELETE FROM entries WHERE source = ?", (path,)
+                )
+                self._connection.executemany(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (path, position, key, text, ",".join(parents), digest)
+                        for position, (key, text, parents, digest) in enumerate(
+                            BibliographyStore._parse(source)
+                        )
+                    ),
+                )
+            updated.append(source)
+        return updated
+
+    def keys(self, sources: Sequence[Path]) -> FrozenSet[str]:
+        with self._selected(sources):
+            return frozenset(
+                key
+                for (key,) in self._connection.execute(
+                    "SELECT DISTINCT key FROM entries JOIN selected ON source = path "
+                    "WHERE key IS NOT NULL"
+                )
+            )
+
+    def get(self, key: str, sources: Sequence[Path]) -> Optional[str]:
+        """
+        Look up the text of the entry used for the key, which is the first one of the first source defining it.
+        """
+        with self._selected(sources):
+            row = self._connection.execute(
+                "SELECT text FROM entries JOIN selected ON source = path WHERE key = ? "
+                "ORDER BY rank, position LIMIT 1",
+                (key,),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def duplicates(
+        self, sources: Sequence[Path]
+    ) -> List["BibliographyStore.Duplicate"]:
+        """
+        Find the keys defined more than once, within a single source or across multiple ones.
+        """
+        duplicates: Dict[str, List[Tuple[str, str]]] = {}
+        with self._selected(sources):
+            for key, source, digest in self._connection.execute(
+                "SELECT key, source, digest FROM entries "
+                "JOIN selected ON source = path WHERE key IN ("
+                "  SELECT key FROM entries JOIN selected ON source = path"
+                "  WHERE key IS NOT NULL GROUP BY key HAVING COUNT(*) > 1"
+                ") ORDER BY rank, position"
+            ):
+                duplicates.setdefault(key, []).append((source, digest))
+        return [
+            BibliographyStore.Duplicate(
+                key,
+                [Path(source) for source, _ in definitions],
+                len(set(digest for _, digest in definitions)) == 1,
+            )
+            for key, definitions in duplicates.items()
+        ]
+
+    def merge(
+        self, sources: Sequence[Path], keys: Optional[Iterable[str]] = None
+    ) -> Iterator[str]:
+        """
+        Yield the text of the merged bibliography. Each key is defined by its first entry.
+
+        :param sources: The bibliographies in the order of their precedence, which all have to be BibTeX or CSL-JSON.
+        :param keys: Restricts the entries to the given ones and those they inherit from, if specified.
+        :return: The parts of the merged bibliography.
+        """
+        suffix = BibliographyStore._suffix(sources)
+        if keys is not None:
+            keys = self._with_parents(sources, frozenset(keys))
+
+        seen = set()
+        separator = ""
+        if suffix == ".json":
+            yield "["
+        with self._selected(sources):
+            for key, text in self._connection.execute(
+                "SELECT key, text FROM entries JOIN selected ON source = path "
+                "ORDER BY rank, position"
+            ):
+                if key is not None and (
+                    key in seen or (keys is not None and key not in keys)
+                ):
+                    continue
+                elif key is None and text in seen:
+                    # Strings defined identically in multiple sources
+                    continue
+                seen.add(key if key is not None else text)
+                yield f"{separator}{text}"
+                separator = ",\n" if suffix == ".json" else "\n\n"
+        yield "]\n" if suffix == ".json" else "\n"
+
+    @timing.timed("merge bibliographies")
+    def consolidate(self, sources: Sequence[Path], directory: Path) -> Path:
+        """
+        Write the merged bibliography of the sources into the directory. Its path stays the same for the same sources,
+        while it is only written again once one of them changed.
+
+        :param sources: The bibliographies in the order of their precedence.
+        :param directory: The directory the merged bibliographies are kept in.
+        :return: The merged bibliography.
+        """
+        self.update(sources)
+        path = (
+            directory
+            / Cache.key(*(str(source.absolute()) for source in sources))[:16]
+            / f"bibliography{BibliographyStore._suffix(sources)}"
+        )
+
+        # The sources may have been updated by the conversion of another document sharing them
+        fingerprint = Cache.key(
+            *(
+                self._connection.execute(
+                    "SELECT digest FROM sources WHERE path = ?",
+                    (str(source.absolute()),),
+                ).fetchone()[0]
+                for source in sources
+            )
+        )
+        fingerprint_file = path.parent / "sources"
+        if (
+            not path.is_file()
+            or not fingerprint_file.is_file()
+            or fingerprint_file.read_text() != fingerprint
+        ):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_writer(path, encoding="utf-8") as file:
+                file.writelines(self.merge(sources))
+            fingerprint_file.write_text(fingerprint)
+        else:
+            # Marks the merged bibliography as recently used for the eviction of the cache
+            os.utime(path)
+        return path
+
+    def _with_parents(
+        self, sources: Sequence[Path], keys: FrozenSet[str]
+    ) -> FrozenSet[str]:
+        wanted = set(keys)
+        missing = set(keys)
+        with self._selected(sources):
+            while len(missing) > 0:
+                parents = set()
+                for key in missing:
+                    for (parent_list,) in self._connection.execute(
+                        "SELECT parents FROM entries "
+                        "JOIN selected ON source = path WHERE key = ?",
+                        (key,),
+                    ):
+                        parents.update(
+                            parent for parent in parent_list.split(",") if parent != ""
+                        )
+                missing = parents.difference(wanted)
+                wanted.update(missing)
+        return frozenset(wanted)
+
+    def _selected(self, sources: Sequence[Path]) -> "_Selection":
+        return _Selection(self._connection, sources)
+
+    @staticmethod
+    def _suffix(sources: Sequence[Path]) -> str:
+        """
+        >>> BibliographyStore._suffix([Path("group.bib"), Path("project.bib")])
+        '.bib'
+        """
+        suffixes = set(source.suffix for source in sources)
+        if len(suffixes) != 1 or not suffixes.issubset((".bib", ".json")):
+            raise ValueError(
+                "Only bibliographies which are all BibTeX or all CSL-JSON can be merged"
+            )
+        return suffixes.pop()
+
+    @staticmethod
+    def _parse(
+        source: Path,
+    ) -> Iterator[Tuple[Optional[str], str, List[str], str]]:
+        """
+        Split a bibliography into its entries.
+
+        :return: The key, the text, the keys of the parents and a digest of the content of each entry.
+        """
+        if source.suffix == ".bib":
+            for entry_type, key, text in bibtex.iter_blocks(source):
+                if entry_type in ("string", "preamble"):
+                    yield None, text, [], BibliographyStore._digest(text)
+                elif key is not None:
+                    # The key is not part of the content compared between duplicates
+                    content = f"{entry_type}{text[text.find(',') + 1:]}"
+                    digest = BibliographyStore._digest(content)
+                    yield key, text, bibtex.parents(text), digest
+        elif source.suffix == ".json":
+            for key, text in csljson.iter_blocks(source):
+                canonical = json.dumps(json.loads(text), sort_keys=True)
+                yield key, text, [], hashlib.sha256(
+                    canonical.encode("utf-8")
+                ).hexdigest()
+        else:
+            raise NotImplementedError(
+                f"Software does not know how to parse bibliography with extension '{source.suffix}'"
+            )
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        r"""
+        Hash an entry independent of its formatting.
+
+        >>> BibliographyStore._digest("{a, title = {B C},}") == BibliographyStore._digest("{a,\n  title={B  C}\n}")
+        True
+        """
+        normalized = " ".join(text.split())
+        for character in '{}=,"#':
+            # Plain replacements are much faster than a regular expression for 100k+ entries
+            normalized = normalized.replace(f" {character}", character).replace(
+                f"{character} ", character
+            )
+        return hashlib.sha256(normalized.replace(",}", "}").encode("utf-8")).hexdigest()
+
+
+class _Selection:
+    """
+    The sources of interest as temporary table 'selected' with their rank, which is joined with the entries.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, sources: Sequence[Path]):
+        self._connection = connection
+        self._sources = sources
+
+    def __enter__(self):
+        self._connection.execute(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS selected "
+            "(path TEXT PRIMARY KEY, rank INTEGER)"
+        )
+        self._connection.execute("DELETE FROM selected")
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO selected VALUES (?, ?)",
+            (
+                (str(source.absolute()), rank)
+                for rank, source in enumerate(self._sources)
+            ),
+        )
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._connection.execute("DELETE FROM selected")
+        self._connection.commit()
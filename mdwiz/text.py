@@ -0,0 +1,171 @@
+"""
+Convert Markdown held in memory, i.e. loaded from a database by a rendering service. Pandoc reads the document from
+stdin and writes the result to stdout, so neither the discovery of files nor temporary files are required and the
+conversion works on read-only file systems.
+"""
+
+import json
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from mdwiz import timing
+from mdwiz.bibliography import Bibliography
+from mdwiz.citations import iter_citations
+from mdwiz.converter import Converter
+
+if TYPE_CHECKING:
+    from mdwiz.filters import FilterPipeline
+
+References = Union[str, bytes, Sequence[Dict]]
+
+
+class TextConverter:
+    """
+    Convert Markdown text with the same defaults as the Converter.
+
+    :param references: The bibliography as CSL-JSON, either as text or as parsed list of entries. It is passed to
+        pandoc-citeproc as 'references' metadata, which pandoc reads like a bibliography file.
+    :param bibliography_resource: The name of a BibTeX file, which is referenced by the LaTeX output for biblatex
+        without being read. Exclusive to 'references'.
+    :param template_file: An optional template, which pandoc reads from the file system.
+    :param csl_file: An optional citation style, which pandoc-citeproc reads from the file system.
+    :param output_format: The format pandoc writes.
+    :param cwd: The directory relative paths in the document refer to. Defaults to the current working directory.
+    :param in_process_filters: Apply the filters within mdwiz, like the Converter does.
+    """
+
+    def __init__(
+        self,
+        references: Optional[References] = None,
+        bibliography_resource: Optional[str] = None,
+        template_file: Optional[Path] = None,
+        csl_file: Optional[Path] = None,
+        output_format: str = "latex",
+        cwd: Optional[Path] = None,
+        in_process_filters: bool = False,
+    ):
+        if references is not None and bibliography_resource is not None:
+            raise ValueError(
+                "Either references or a bibliography resource are allowed"
+            )
+        if bibliography_resource is not None and output_format != "latex":
+            raise ValueError("A bibliography resource is only referenced by LaTeX")
+
+        if isinstance(references, (str, bytes)):
+            references = json.loads(references)
+        self.references = references
+        self.bibliography_resource = bibliography_resource
+        self.template_file = template_file
+        self.csl_file = csl_file
+        self.output_format = output_format
+        self.cwd = cwd if cwd is not None else Path.cwd()
+        self.in_process_filters = in_process_filters
+        self._pipeline = None
+
+    def parameters(self) -> List[str]:
+        parameters = []
+        for parameter in Converter.DEFAULT_PARAMETERS:
+            if parameter.startswith("--to="):
+                parameter = f"--to={self.output_format}"
+            elif parameter == "--listings" and self.output_format != "latex":
+                continue
+            parameters.append(parameter)
+
+        if self.references is not None:
+            # Pandoc only runs pandoc-citeproc on its own for bibliography files
+            parameters.append("--filter=pandoc-citeproc")
+            if self.csl_file is not None:
+                parameters.append(f"--csl={self.csl_file}")
+        elif self.bibliography_resource is not None:
+            parameters.append("--biblatex")
+            parameters.append(
+                f"--metadata=bibliography:{self.bibliography_resource}"
+            )
+        if self.template_file is not None:
+            parameters.append(f"--template={self.template_file}")
+        return parameters
+
+    def source(self, markdown: Union[str, bytes]) -> str:
+        """
+        Prepare the text passed to pandoc, which ends with a metadata block containing the references.
+
+        >>> print(TextConverter(references=[{"id": "doe"}]).source("# Title"))
+        # Title
+        <BLANKLINE>
+        ---
+        references: [{"id": "doe"}]
+        ...
+        <BLANKLINE>
+        """
+        if isinstance(markdown, bytes):
+            markdown = markdown.decode("utf-8")
+        if self.references is None:
+            return markdown
+        # JSON is valid YAML. As last metadata block, the references take precedence over those of the front matter.
+        return (
+            f"{markdown.rstrip()}\n\n---\n"
+            f"references: {json.dumps(self.references, ensure_ascii=False)}\n...\n"
+        )
+
+    def missing_references(self, markdown: Union[str, bytes]) -> FrozenSet[str]:
+        if self.references is None:
+            return frozenset()
+        if isinstance(markdown, bytes):
+            markdown = markdown.decode("utf-8")
+        bibliography = Bibliography(
+            [(reference["id"], reference) for reference in self.references]
+        )
+        return frozenset(iter_citations(markdown)).difference(bibliography.keys())
+
+    @property
+    def pipeline(self) -> "FilterPipeline":
+        if self._pipeline is None:
+            from mdwiz.filters import FilterPipeline
+
+            self._pipeline = FilterPipeline.from_names(
+                [
+                    parameter[len("--filter="):]
+                    for parameter in self.parameters()
+                    if parameter.startswith("--filter=")
+                ]
+            )
+        return self._pipeline
+
+    @timing.timed("convert text")
+    def convert(
+        self, markdown: Union[str, bytes], sink: Optional[TextIO] = None
+    ) -> Optional[str]:
+        """
+        Convert the document, warning about citations missing in the references.
+
+        :param markdown: The Markdown source.
+        :param sink: Receives the output in chunks. If None, the output is returned.
+        :return: The output of pandoc, or None if it was written into the sink.
+        """
+        parameters, source = self._prepare(markdown)
+        return Converter._run_filtered(
+            self.pipeline if self.in_process_filters else None,
+            parameters,
+            self.cwd,
+            source=source,
+            sink=sink,
+        )
+
+    def _prepare(self, markdown: Union[str, bytes]) -> Tuple[List[str], str]:
+        """
+        Warn about citations missing in the references and derive what pandoc is called with.
+
+        :return: The parameters and the source of pandoc.
+        """
+        Converter.MissingReferenceWarning.warn(self.missing_references(markdown))
+        return self.parameters(), self.source(markdown)
@@ -0,0 +1,238 @@
+"""
+Spans measuring the stages of a conversion. Finished spans are passed to the subscribers, i.e. a Recorder printing the
+summary of '--timings' or writing the trace of '--trace-json', or a host service collecting metrics. Subscribers are
+bound to the context they subscribed in, so concurrent conversions, i.e. the requests of the server, are recorded apart.
+Worker threads of a conversion inherit them by 'inherit'.
+
+Besides the wall time, each span records the CPU time of the mdwiz process and its terminated subprocesses and the
+peak resident set size where the platform supports it. Both are process-wide, so spans running concurrently in other
+threads are attributed to each other.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+class Span:
+    def __init__(self, name: str, category: str, start: float):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = 0.0
+        self.thread = threading.get_ident()
+        self.args: Dict[str, Union[str, int, float]] = {}
+
+
+_subscribers: "contextvars.ContextVar[Tuple[Callable[[Span], None], ...]]" = (
+    contextvars.ContextVar("subscribers", default=())
+)
+
+Function = TypeVar("Function", bound=Callable)
+
+
+def subscribe(callback: Callable[[Span], None]) -> Callable[[Span], None]:
+    """
+    Receive every span finished in the current context, including the worker threads inheriting it, until
+    unsubscribed.
+    """
+    _subscribers.set((*_subscribers.get(), callback))
+    return callback
+
+
+def unsubscribe(callback: Callable[[Span], None]):
+    subscribers = list(_subscribers.get())
+    subscribers.remove(callback)
+    _subscribers.set(tuple(subscribers))
+
+
+def inherit(function: Function) -> Function:
+    """
+    Let a function called in worker threads report its spans to the subscribers of the calling thread, as threads
+    start with an empty context.
+
+    >>> import threading
+    >>> def work():
+    ...     with span("worker"):
+    ...         pass
+    >>> with Recorder() as recorder:
+    ...     thread = threading.Thread(target=inherit(work))
+    ...     thread.start()
+    ...     thread.join()
+    >>> [recorded.name for recorded in recorder.spans]
+    ['worker']
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        # A context is only entered by one thread at a time, so each call gets a copy of its own
+        return context.copy().run(function, *args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = "mdwiz", **args) -> Iterator[Optional[Span]]:
+    """
+    Measure the enclosed block. Without subscribers, nothing is measured.
+
+    :param name: The name of the stage.
+    :param category: The kind of stage, i.e. 'subprocess' for external tools.
+    :param args: Additional values stored with the span.
+    :return: The span, whose arguments may be extended within the block, or None.
+    """
+    subscribers = _subscribers.get()
+    if len(subscribers) == 0:
+        yield None
+        return
+
+    current = Span(name, category, time.perf_counter())
+    usage = _usage()
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.start
+        current.args.update(args)
+        if usage is not None:
+            current.args.update(_usage_delta(usage, _usage()))
+        for subscriber in subscribers:
+            subscriber(current)
+
+
+def timed(name: str, category: str = "mdwiz") -> Callable:
+    """
+    Decorate a function to measure each of its calls as span.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _usage() -> Optional[tuple]:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(
+        resource.RUSAGE_CHILDREN
+    )
+
+
+def _usage_delta(before: tuple, after: tuple) -> Dict[str, float]:
+    # The peak RSS is given in bytes on macOS and in KiB elsewhere
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    (own_before, children_before), (own_after, children_after) = before, after
+    return {
+        "cpu": (own_after.ru_utime + own_after.ru_stime)
+        - (own_before.ru_utime + own_before.ru_stime),
+        "subprocess_cpu": (children_after.ru_utime + children_after.ru_stime)
+        - (children_before.ru_utime + children_before.ru_stime),
+        "max_rss": own_after.ru_maxrss * rss_unit,
+        "subprocess_max_rss": children_after.ru_maxrss * rss_unit,
+    }
+
+
+class Recorder:
+    """
+    Collect all spans finished while it is active.
+
+    >>> with Recorder() as recorder:
+    ...     with span("stage"):
+    ...         pass
+    >>> [recorded.name for recorded in recorder.spans]
+    ['stage']
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "Recorder":
+        subscribe(self.record)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        unsubscribe(self.record)
+
+    def record(self, finished: Span):
+        with self._lock:
+            self.spans.append(finished)
+
+    def summary(self) -> str:
+        """
+        Aggregate the spans by their name, in the order the stages started.
+        """
+        stages = {}
+        for recorded in sorted(self.spans, key=lambda recorded: recorded.start):
+            stage = stages.setdefault(
+                recorded.name, {"count": 0, "wall": 0.0, "subprocess_cpu": 0.0}
+            )
+            stage["count"] += 1
+            stage["wall"] += recorded.duration
+            stage["subprocess_cpu"] += recorded.args.get("subprocess_cpu", 0.0)
+
+        lines = [f"{'Stage':<32} {'Count':>5} {'Wall':>10} {'Subprocess CPU':>15}"]
+        for name, stage in stages.items():
+            lines.append(
+                f"{name:<32} {stage['count']:>5} {stage['wall'] * 1000:>7.1f} ms "
+                f"{stage['subprocess_cpu'] * 1000:>12.1f} ms"
+            )
+        peak = max(
+            (recorded.args.get("max_rss", 0) for recorded in self.spans), default=0
+        )
+        peak_subprocess = max(
+            (recorded.args.get("subprocess_max_rss", 0) for recorded in self.spans),
+            default=0,
+        )
+        if peak > 0:
+            lines.append(
+                f"Peak RSS: {peak / 2 ** 20:.1f} MiB (mdwiz), "
+                f"{peak_subprocess / 2 ** 20:.1f} MiB (largest subprocess)"
+            )
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict:
+        """
+        Convert the spans into the Trace Event Format, which is shown by chrome://tracing or Perfetto.
+        """
+        return {
+            "traceEvents": [
+                {
+                    "name": recorded.name,
+                    "cat": recorded.category,
+                    "ph": "X",
+                    "ts": (recorded.start - self.start) * 1e6,
+                    "dur": recorded.duration * 1e6,
+                    "pid": os.getpid(),
+                    "tid": recorded.thread,
+                    "args": recorded.args,
+                }
+                for recorded in self.spans
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_trace(self, path: Path):
+        with path.open("w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
+
@@ -0,0 +1,108 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+
+class Watcher:
+    """
+    Wait for changes of a fixed set of files. Inotify is used if the optional 'inotify_simple' package is installed,
+    otherwise the modification times are polled.
+    """
+
+    def __init__(
+        self, files: Iterable[Path], interval: float = 0.5, debounce: float = 0.3
+    ):
+        self.files = frozenset(file.absolute() for file in files)
+        self.interval = interval
+        self.debounce = debounce
+        self._snapshot = self._take_snapshot()
+        self._observed = self._snapshot
+        self._inotify = self._create_inotify()
+
+    def wait(self, timeout: Optional[float] = None) -> FrozenSet[Path]:
+        """
+        Block until at least one file changed and no further change happened for the debounce period.
+
+        :param timeout: The maximal number of seconds to wait or None to wait forever.
+        :return: The changed files, which is empty if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not self._wait_for_event(deadline):
+                return frozenset()
+
+            # Let bursts of saves settle, i.e. by editors writing temporary files first
+            while self._wait_for_event(time.monotonic() + self.debounce):
+                pass
+
+            snapshot = self._take_snapshot()
+            changed = frozenset(
+                file
+                for file in self.files
+                if snapshot.get(file) != self._snapshot.get(file)
+            )
+            self._snapshot = snapshot
+            self._observed = snapshot
+            if len(changed) > 0:
+                return changed
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _wait_for_event(self, deadline: Optional[float]) -> bool:
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+
+            if self._inotify is not None:
+                timeout = None if remaining is None else int(remaining * 1000)
+                events = self._inotify.read(timeout=timeout)
+                if any(
+                    (Path(self._directories[event.wd]) / event.name) in self.files
+                    for event in events
+                    if event.wd in self._directories
+                ):
+                    return True
+            else:
+                time.sleep(
+                    self.interval if remaining is None else min(self.interval, remaining)
+                )
+                snapshot = self._take_snapshot()
+                if snapshot != self._observed:
+                    self._observed = snapshot
+                    return True
+
+    def _take_snapshot(self) -> Dict[Path, Optional[Tuple[int, int]]]:
+        snapshot = {}
+        for file in self.files:
+            try:
+                stat = file.stat()
+                snapshot[file] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                snapshot[file] = None
+        return snapshot
+
+    def _create_inotify(self):
+        try:
+            import inotify_simple
+        except ImportError:
+            logging.debug("Package 'inotify_simple' is not available, polling files.")
+            return None
+
+        # Watch the directories, because editors often replace files instead of writing into them
+        inotify = inotify_simple.INotify()
+        flags = (
+            inotify_simple.flags.CLOSE_WRITE
+            | inotify_simple.flags.MOVED_TO
+            | inotify_simple.flags.CREATE
+            | inotify_simple.flags.DELETE
+        )
+        self._directories = {}
+        for directory in {file.parent for file in self.files}:
+            self._directories[inotify.add_watch(os.fspath(directory), flags)] = directory
+        return inotify
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+from benchmarks import fake_pandoc
+from mdwiz import bibtex
+from mdwiz.aio import AsyncConverter, convert_text
+from mdwiz.converter import Converter
+from mdwiz.filters import FilterPipeline, FunctionFilter
+from mdwiz.text import TextConverter
+
+from util import FileSystemUnitTest
+
+
+@unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+class TestAio(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+        self.document = TestAio.copy_assets(self.test_directory, "example.md")
+
+        # A placeholder pandoc, which records its process ID and is slow on demand
+        self.placeholder(
+            "pandoc",
+            f'echo $$ > "{self.test_directory}/pid"\n'
+            'if [ -n "$SLOW" ]; then exec sleep 30; fi\n'
+            "echo converted\n",
+        )
+
+    def tearDown(self):
+        os.environ.pop("SLOW", None)
+        super().tearDown()
+
+    def test_convert(self):
+        converter = AsyncConverter(Converter([self.document]), asyncio.Semaphore(1))
+        self.assertEqual(asyncio.run(converter.convert()), "converted\n")
+
+    def test_pruned_bibliography(self):
+        bibliography = TestAio.copy_assets(self.test_directory, "example.bib")
+        converter = Converter([self.document], bibliography, prune_bibliography=True)
+        # The citations changed since the converter was created
+        self.document.write_text("Only [@doe] is cited.\n")
+        asyncio.run(AsyncConverter(converter).convert())
+
+        self.assertEqual(list(bibtex.iter_keys(converter.pruned_bibliography)), ["doe"])
+
+    def test_in_process_filters(self):
+        # The fake pandoc wraps the Markdown into a raw block of the AST
+        self.placeholder(
+            "pandoc", f'exec "{sys.executable}" "{fake_pandoc.__file__}" pandoc "$@"\n'
+        )
+
+        def shout(document, output_format):
+            for block in document["blocks"]:
+                block["c"][1] = block["c"][1].upper()
+
+        pipeline = FilterPipeline([FunctionFilter(shout)])
+        converter = Converter([self.document], in_process_filters=True)
+        converter._pipeline = pipeline
+        text_converter = TextConverter(in_process_filters=True)
+        text_converter._pipeline = pipeline
+
+        self.assertEqual(
+            asyncio.run(AsyncConverter(converter).convert()), converter.convert()
+        )
+        self.assertIn("\\section{CHAPTER 1}", converter.convert())
+        self.assertEqual(
+            asyncio.run(convert_text(text_converter, "# Chapter 1")),
+            text_converter.convert("# Chapter 1"),
+        )
+
+    def test_timeout(self):
+        os.environ["SLOW"] = "1"
+        converter = AsyncConverter(Converter([self.document]), timeout=0.2)
+        start = time.perf_counter()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(converter.convert())
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assert_killed()
+
+    def test_cancel(self):
+        os.environ["SLOW"] = "1"
+
+        async def cancel():
+            task = asyncio.ensure_future(
+                AsyncConverter(Converter([self.document])).convert()
+            )
+            while not (self.test_directory / "pid").is_file():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel())
+        self.assert_killed()
+
+    def assert_killed(self):
+        pid = int((self.test_directory / "pid").read_text())
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
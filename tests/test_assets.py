@@ -0,0 +1,109 @@
+import asyncio
+import os
+import re
+import unittest
+from pathlib import Path
+
+from mdwiz.aio import AsyncConverter
+from mdwiz.assets import AssetStage
+from mdwiz.cache import Cache
+from mdwiz.converter import Converter
+
+from util import FileSystemUnitTest
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class TestAssets(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        self.markdown = (
+            "![A figure](figure.svg)\n"
+            "![Online](https://example.org/figure.svg)\n"
+            "```\n"
+            "![In code](figure.svg)\n"
+            "```\n"
+        )
+        (self.test_directory / "figure.svg").write_text("<svg/>")
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder is a shell script")
+    def test_svg(self):
+        # A placeholder for rsvg-convert, which counts its calls
+        self.placeholder(
+            "rsvg-convert",
+            f'echo call >> "{self.test_directory / "calls"}"\n'
+            'for a; do file="$a"; done\n'
+            'cat "$file"\n',
+        )
+
+        stage = AssetStage(cache=Cache(self.test_directory / "cache"))
+        (source,) = stage.rewrite([self.markdown], self.test_directory)
+        self.assertEqual(stage.rewrite([self.markdown], self.test_directory), [source])
+
+        lines = source.splitlines()
+        prepared = lines[0][len("![A figure](") : -1]
+        self.assertTrue(prepared.endswith(".pdf"))
+        self.assertEqual(open(prepared).read(), "<svg/>")
+        self.assertEqual(lines[1:], self.markdown.splitlines()[1:])
+        self.assertEqual((self.test_directory / "calls").read_text(), "call\n")
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_downscale(self):
+        Image.new("RGB", (4000, 1000)).save(self.test_directory / "wide.png")
+        Image.new("RGB", (100, 100)).save(self.test_directory / "small.png")
+
+        stage = AssetStage(directory=self.test_directory / "assets", dpi=100)
+        prepared = stage.prepare(
+            [self.test_directory / "wide.png", self.test_directory / "small.png"]
+        )
+        small = self.test_directory / "small.png"
+        self.assertEqual(prepared[small], small)
+        with Image.open(prepared[self.test_directory / "wide.png"]) as image:
+            self.assertEqual(image.size, (650, 162))
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_conversion(self):
+        # A placeholder pandoc, which prints the Markdown passed via stdin
+        self.placeholder("pandoc", "exec cat\n")
+
+        Image.new("RGB", (4000, 1000)).save(self.test_directory / "wide.png")
+        markdown_file = self.test_directory / "document.md"
+        markdown_file.write_text("![Wide](wide.png)\n")
+        cache = Cache(self.test_directory / "cache")
+        stage = AssetStage(cache=cache, dpi=100)
+
+        converter = Converter([markdown_file], cache=cache, assets=stage)
+        output = converter.convert()
+        prepared = Path(re.search(r"\((.+)\)", output).group(1))
+        self.assertTrue(prepared.is_file())
+        self.assertEqual(
+            asyncio.run(
+                AsyncConverter(Converter([markdown_file], assets=stage)).convert()
+            ),
+            output,
+        )
+
+        # The cached output is reused, while the image evicted meanwhile is prepared again
+        prepared.unlink()
+        self.assertEqual(converter.convert(), output)
+        self.assertTrue(prepared.is_file())
+
+    def test_cache_key(self):
+        markdown_file = self.test_directory / "document.md"
+        markdown_file.write_text(self.markdown)
+        stage = AssetStage(directory=self.test_directory / "assets")
+        converter = Converter([markdown_file], assets=stage)
+        key = converter.cache_key()
+
+        self.assertNotEqual(Converter([markdown_file]).cache_key(), key)
+        (self.test_directory / "figure.svg").write_text("<svg></svg>")
+        self.assertNotEqual(converter.cache_key(), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
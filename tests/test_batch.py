@@ -0,0 +1,55 @@
+import unittest
+
+from mdwiz.batch import discover
+
+from util import FileSystemUnitTest
+
+
+class TestBatch(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        for directory in ("report", "thesis", "thesis/chapters", ".hidden", "output"):
+            (self.test_directory / directory).mkdir()
+        for document in ("report", "thesis", ".hidden", "output"):
+            TestBatch.copy_assets(self.test_directory / document, "example.md")
+        TestBatch.copy_assets(self.test_directory / "thesis" / "chapters", "example.md")
+
+    def test_discover(self):
+        documents = discover(
+            [self.test_directory], exclude=[self.test_directory / "output"]
+        )
+        self.assertEqual(
+            [document.name for document in documents], ["report", "thesis", "chapters"]
+        )
+
+    def test_discover_nested(self):
+        # The root is a document on its own, but the documents below are not part of it
+        TestBatch.copy_assets(self.test_directory, "example.md")
+        self.assertEqual(
+            discover([self.test_directory], exclude=[self.test_directory / "output"]),
+            [
+                self.test_directory,
+                self.test_directory / "report",
+                self.test_directory / "thesis",
+                self.test_directory / "thesis" / "chapters",
+            ],
+        )
+
+    def test_discover_broken_link(self):
+        try:
+            (self.test_directory / "broken.md").symlink_to(
+                self.test_directory / "missing.md"
+            )
+        except (OSError, NotImplementedError):
+            self.skipTest("Symbolic links are not supported")
+        documents = discover(
+            [self.test_directory], exclude=[self.test_directory / "output"]
+        )
+        self.assertEqual(
+            [document.name for document in documents], ["report", "thesis", "chapters"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,11 @@
+import io
+import json
 import unittest
 
+from mdwiz import bibtex, csljson
 from mdwiz.bibliography import Bibliography
+from mdwiz.cache import Cache
+from mdwiz.citations import iter_citations
 from mdwiz.converter import Converter
 
 from util import FileSystemUnitTest
@@ -23,6 +28,32 @@ class TestBibliography(FileSystemUnitTest):
             tuple(bibliography.keys()), ["gundler", "doe", "unused-doe", "a1", "a2"]
         )
 
+    def test_csl_entries(self):
+        bibtex_bibliography = self.test_directory / "csl.bib"
+        bibtex_bibliography.write_text(
+            "@incollection{chapter, author = {Gundler, Christopher and {The Team}},"
+            " title = {{A} Chapter}, booktitle = {Collected}, pages = {3--5},"
+            " year = 2020, month = jun, doi = {10.1/x}}\n"
+        )
+
+        entry = Bibliography.from_file(bibtex_bibliography)["chapter"]
+        self.assertEqual(
+            entry,
+            {
+                "id": "chapter",
+                "type": "chapter",
+                "title": "A Chapter",
+                "author": [
+                    {"family": "Gundler", "given": "Christopher"},
+                    {"literal": "The Team"},
+                ],
+                "container-title": "Collected",
+                "page": "3-5",
+                "DOI": "10.1/x",
+                "issued": {"date-parts": [[2020, 6]]},
+            },
+        )
+
     def test_find_references(self):
         converter = Converter([self.asset_document], self.asset_bibliography)
         used_citations = frozenset(Bibliography.used_citations(converter.convert()))
@@ -36,6 +67,118 @@ class TestBibliography(FileSystemUnitTest):
         missing_citations = bibliography.find_missing_citations(converter.convert())
         self.assertCountEqual(missing_citations, ["unknown_reference"])
 
+    def test_source_citations(self):
+        converter = Converter([self.asset_document], self.asset_bibliography)
+        self.assertCountEqual(converter.missing_references(), ["unknown_reference"])
+
+        source = (
+            "---\nauthor: mail@example.org\n---\n\n"
+            "[@a; @b, p. 3; -@{c.d}] as +@fig:plot shows @e.\n\n"
+            "```\n@code\n```\n\n<!-- @comment\n-->`@inline` \\@escaped @f\n"
+        )
+        self.assertEqual(list(iter_citations(source)), ["a", "b", "c.d", "e", "f"])
+
+    def test_native_parser(self):
+        source = (
+            "Free text with a mail@address.org is a comment.\n"
+            '@STRING(journal = "Gundlers " # {Playpen})\n'
+            "@comment{ignored, @article{ignored, title = {x}} }\n"
+            '@Article{child, title = {{Nested} {B{r}aces}}, journal = journal, crossref = "parent"}\n'
+            "@book(parent, title = {Parent (with parentheses)}, year = 2019)\n"
+        )
+
+        self.assertEqual(
+            list(bibtex.iter_keys(io.StringIO(source))), ["child", "parent"]
+        )
+        entries = bibtex.parse(io.StringIO(source))
+        self.assertEqual(entries["child"]["title"], "{Nested} {B{r}aces}")
+        self.assertEqual(entries["child"]["journal"], "Gundlers Playpen")
+        self.assertEqual(entries["child"]["year"], "2019")
+        self.assertEqual(entries["child"]["booktitle"], "Parent (with parentheses)")
+        self.assertEqual(entries["parent"]["ENTRYTYPE"], "book")
+
+    def test_streamed_csl_json(self):
+        # Large enough to span multiple chunks, with multi-byte characters shifting the byte offsets
+        entries = [
+            {
+                "id": f"key{index}",
+                "title": f"Über {'ü' * (index % 50)} \"quoted\" {{braces}}",
+                "author": [{"family": "Doe", "given": "Jöhn"}],
+            }
+            for index in range(12000)
+        ]
+        json_bibliography = self.test_directory / "large.json"
+        json_bibliography.write_text(json.dumps(entries, ensure_ascii=False, indent=2))
+
+        self.assertEqual(
+            list(csljson.iter_keys(json_bibliography)),
+            [entry["id"] for entry in entries],
+        )
+        index = csljson.Index(json_bibliography)
+        self.assertEqual(len(index), len(entries))
+        self.assertEqual(index["key11999"], entries[11999])
+        self.assertEqual(index["key4711"], entries[4711])
+
+        json_bibliography.write_text('[{"id": "a"}, {"title": "no id"}]')
+        with self.assertRaises(csljson.ParseError):
+            list(csljson.iter_keys(json_bibliography))
+
+    def test_cached_keys(self):
+        json_bibliography = self.test_directory / "example.json"
+        json_bibliography.write_text(json.dumps([{"id": "gundler"}, {"id": "doe"}]))
+        cache = Cache(self.test_directory / "cache")
+
+        self.assertEqual(
+            Bibliography.keys_from_file(json_bibliography, cache=cache),
+            {"gundler", "doe"},
+        )
+        self.assertEqual(len(list(cache.directory.glob("*/*"))), 1)
+        self.assertEqual(
+            Bibliography.keys_from_file(
+                json_bibliography.name, cwd=str(self.test_directory), cache=cache
+            ),
+            {"gundler", "doe"},
+        )
+
+        # Changed files are parsed again
+        json_bibliography.write_text(json.dumps([{"id": "a1"}]))
+        self.assertEqual(
+            Bibliography.keys_from_file(json_bibliography, cache=cache), {"a1"}
+        )
+
+    def test_prune(self):
+        source = self.test_directory / "pruned.bib"
+        source.write_text(
+            '@string{journal = "Gundlers Playpen"}\n'
+            "@article{unused, title = {Unused}}\n"
+            "@article{child, title = {Child}, journal = journal, crossref = {parent}}\n"
+            "@book{parent, title = {Parent}, crossref = {grandparent}}\n"
+            "@book{grandparent, title = {Grandparent}}\n"
+        )
+        entries = bibtex.parse(io.StringIO(bibtex.prune(source, ["child"])))
+        self.assertCountEqual(entries.keys(), ["child", "parent", "grandparent"])
+        self.assertEqual(entries["child"]["journal"], "Gundlers Playpen")
+
+        cache = Cache(self.test_directory / "cache")
+        pruned = Bibliography.prune(
+            self.asset_bibliography, frozenset(("doe", "a1")), cache=cache
+        )
+        self.assertEqual(pruned.suffix, ".bib")
+        self.assertCountEqual(bibtex.iter_keys(pruned), ["doe", "a1"])
+        self.assertEqual(
+            Bibliography.prune(
+                self.asset_bibliography, frozenset(("doe", "a1")), cache=cache
+            ),
+            pruned,
+        )
+
+        json_bibliography = self.test_directory / "example.json"
+        json_bibliography.write_text(json.dumps([{"id": "gundler"}, {"id": "doe"}]))
+        pruned = Bibliography.prune(
+            json_bibliography, frozenset(("doe",)), directory=self.test_directory / "cache"
+        )
+        self.assertEqual(json.loads(pruned.read_text()), [{"id": "doe"}])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,116 @@
+import io
+import os
+import unittest
+
+from mdwiz.cache import Cache, atomic_writer
+from mdwiz.converter import Converter
+
+from util import FileSystemUnitTest
+
+
+class TestCache(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+        self.cache = Cache(self.test_directory / "cache")
+
+    def test_put_and_get(self):
+        key = Cache.key("some", "parts")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, b"data")
+        self.assertEqual(self.cache.get(key), b"data")
+
+    def test_eviction(self):
+        self.cache.max_size = 10
+        self.cache.put("a" * 64, b"12345")
+        self.cache.put("b" * 64, b"12345")
+
+        # Make the first entry the least recently used one
+        os.utime(self.cache._path("a" * 64), ns=(0, 0))
+        self.cache.put("c" * 64, b"12345")
+
+        self.assertIsNone(self.cache.get("a" * 64))
+        self.assertEqual(self.cache.get("b" * 64), b"12345")
+        self.assertEqual(self.cache.get("c" * 64), b"12345")
+
+    def test_directory_eviction(self):
+        self.cache.max_size = 10
+        build_directory = self.cache.directory / "pdf" / "document"
+        build_directory.mkdir(parents=True)
+        (build_directory / "document.aux").write_bytes(b"12345678")
+        os.utime(build_directory / "document.aux", ns=(0, 0))
+        os.utime(build_directory, ns=(0, 0))
+
+        self.cache.put("a" * 64, b"12345")
+        self.assertFalse(build_directory.exists())
+        self.assertEqual(self.cache.get("a" * 64), b"12345")
+
+    def test_incremental_size(self):
+        self.cache.max_size = 1000
+        scans = []
+        evict = self.cache.evict
+        self.cache.evict = lambda: scans.append(evict())
+
+        for index in range(Cache.SCAN_INTERVAL + 1):
+            self.cache.put(Cache.key(str(index)), b"1")
+        # The size is only determined on the first write and then again after the interval
+        self.assertEqual(len(scans), 2)
+
+        # Exceeding the limit triggers a scan immediately
+        self.cache.put(Cache.key("big"), b"1" * 1000)
+        self.assertEqual(len(scans), 3)
+        self.assertIsNone(self.cache.get(Cache.key("0")))
+
+    def test_converter_key(self):
+        document = TestCache.copy_assets(self.test_directory, "example.md")
+        bibliography = TestCache.copy_assets(self.test_directory, "example.bib")
+
+        key = Converter([document], bibliography).cache_key()
+        self.assertEqual(key, Converter([document], bibliography).cache_key())
+        self.assertNotEqual(key, Converter([document]).cache_key())
+
+        document.write_text(document.read_text() + "\nA new paragraph.")
+        self.assertNotEqual(key, Converter([document], bibliography).cache_key())
+
+    def test_converter_hit(self):
+        document = TestCache.copy_assets(self.test_directory, "example.md")
+        converter = Converter([document], cache=self.cache)
+        self.cache.put(converter.cache_key(), "cached".encode("utf-8"))
+
+        # No pandoc is started on a hit
+        self.assertEqual(converter.convert(), "cached")
+
+        sink = io.StringIO()
+        converter.convert_to(sink)
+        self.assertEqual(sink.getvalue(), "cached")
+
+    def test_atomic_writer(self):
+        path = self.test_directory / "output.tex"
+        with atomic_writer(path, encoding="utf-8") as file:
+            file.write("complete")
+
+        with self.assertRaises(RuntimeError):
+            with atomic_writer(path, encoding="utf-8") as file:
+                file.write("partial")
+                raise RuntimeError()
+
+        self.assertEqual(path.read_text(encoding="utf-8"), "complete")
+        self.assertEqual(list(self.test_directory.iterdir()), [path])
+
+    @unittest.skipUnless(os.name == "posix", "File modes are specific to POSIX")
+    def test_atomic_writer_mode(self):
+        path = self.test_directory / "output.tex"
+        with atomic_writer(path, encoding="utf-8") as file:
+            file.write("new")
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.assertEqual(path.stat().st_mode & 0o777, 0o666 & ~umask)
+
+        # The mode of a replaced file is kept
+        path.chmod(0o640)
+        with atomic_writer(path, encoding="utf-8") as file:
+            file.write("replaced")
+        self.assertEqual(path.stat().st_mode & 0o777, 0o640)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,12 @@
+import contextlib
+import io
+import os
 import unittest
 
+from mdwiz import bibtex
+from mdwiz.__main__ import build_parser, run
+from mdwiz.cache import Cache
+from mdwiz.chapters import Chapter
 from mdwiz.converter import Converter
 
 from util import FileSystemUnitTest
@@ -27,6 +34,161 @@ class TestConverter(FileSystemUnitTest):
         self.assertIn(r"\textcite{gundler}", result)
         self.assertIn(r"\autocite{doe}", result)
 
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_streamed_output(self):
+        # A placeholder pandoc which prints its input in multiple chunks
+        self.placeholder(
+            "pandoc",
+            'for i in 1 2 3; do for f; do [ -f "$f" ] && cat "$f"; done; done\n'
+            "echo failed >&2\n"
+            "exit $FAIL\n",
+        )
+
+        try:
+            os.environ["FAIL"] = "0"
+            sink = io.StringIO()
+            Converter([self.asset_document]).convert_to(sink)
+            self.assertEqual(sink.getvalue(), self.asset_document.read_text() * 3)
+
+            os.environ["FAIL"] = "1"
+            with self.assertRaisesRegex(Converter.PandocException, "failed"):
+                Converter([self.asset_document]).convert()
+        finally:
+            del os.environ["FAIL"]
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_targets(self):
+        # A placeholder pandoc which prints its arguments, or writes them into the output file
+        self.placeholder(
+            "pandoc",
+            'for a; do [ "$previous" = "-o" ] && output="$a"; previous="$a"; done\n'
+            'if [ -n "$output" ]; then echo "$@" > "$output"; else echo "$@"; fi\n',
+        )
+
+        converter = Converter([self.asset_document], self.asset_bibliography)
+        docx = self.test_directory / "example.docx"
+        outputs = converter.convert_targets(
+            [
+                Converter.Target("latex"),
+                Converter.Target("html"),
+                Converter.Target("docx", output=docx),
+            ]
+        )
+
+        self.assertIn("--from=json --to=latex", outputs["latex"])
+        self.assertIn("--biblatex", outputs["latex"])
+        self.assertIn("--to=html", outputs["html"])
+        self.assertNotIn("--biblatex", outputs["html"])
+        self.assertIsNone(outputs["docx"])
+        self.assertIn("--to=docx", docx.read_text())
+
+        with self.assertRaises(ValueError):
+            converter.convert_targets([Converter.Target("docx")])
+
+    def test_pruned_bibliography(self):
+        converter = Converter(
+            [self.asset_document], self.asset_bibliography, prune_bibliography=True
+        )
+        self.assertCountEqual(
+            bibtex.iter_keys(converter.pruned_bibliography),
+            ["gundler", "doe", "a1", "a2"],
+        )
+
+        # biblatex reads the bibliography itself, while pandoc-citeproc gets the pruned one
+        self.assertIn(f"--bibliography={converter.citation_file}", converter)
+        self.assertIn(
+            f"--bibliography={converter.pruned_bibliography}",
+            converter._target_parameters(Converter.Target("html")),
+        )
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_pruned_bibliography_reuse(self):
+        self.placeholder("pandoc", 'echo "$@"\n')
+
+        converter = Converter(
+            [self.asset_document], self.asset_bibliography, prune_bibliography=True
+        )
+        # The same converter is used again after the Markdown changed, like while watching
+        self.asset_document.write_text("Only [@doe] is cited.\n")
+        converter.convert()
+
+        self.assertNotIn("gundler", bibtex.iter_keys(converter.pruned_bibliography))
+        self.assertIn("doe", bibtex.iter_keys(converter.pruned_bibliography))
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_stdout(self):
+        self.placeholder("pandoc", "printf converted\n")
+
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status_code = run(
+                build_parser().parse_args(["--no-cache"]), cwd=self.test_directory
+            )
+        self.assertTrue(status_code.is_successfull())
+        self.assertEqual(stdout.getvalue(), "converted\n")
+
+    def test_chapter_stubs(self):
+        first = Chapter.from_text(
+            "# Intro\n\nSee @fig:plot and @eq:own.\n\n$$x$$ {#eq:own}"
+        )
+        second = Chapter.from_text("![A plot](plot.png){#fig:plot}")
+
+        source = first.source(second.labels())
+        self.assertIn("{#fig:plot}", source.split(Chapter.END_MARKER)[1])
+        self.assertEqual(second.source(first.labels()), second.text)
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_chapter_metadata(self):
+        # A placeholder pandoc which renders the paragraphs according to the metadata it sees
+        self.placeholder(
+            "pandoc",
+            'files=""; for a; do case "$a" in -*) ;; *) files="$files $a";; esac; done\n'
+            'if [ -n "$files" ]; then input=$(cat $files); else input=$(cat); fi\n'
+            'prefix=""; echo "$input" | grep -q "^lang: de" && prefix="de: "\n'
+            'echo "$input" | grep -E "^(Paragraph|MDWIZ)" | sed "s/^Paragraph/${prefix}Paragraph/"\n',
+        )
+
+        first = self.test_directory / "first.md"
+        first.write_text("---\nlang: de\n---\n\nParagraph A\n")
+        second = self.test_directory / "second.md"
+        second.write_text("Paragraph B\n")
+
+        converter = Converter([first, second])
+        whole = converter.convert()
+        chapters = converter.convert_chapters()
+
+        self.assertEqual(
+            whole.split(), ["de:", "Paragraph", "A", "de:", "Paragraph", "B"]
+        )
+        self.assertEqual(chapters.split(), whole.split())
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_chapter_tables(self):
+        # A placeholder pandoc which renders the CSV files of the tables like pantable
+        self.placeholder(
+            "pandoc",
+            "input=$(cat)\n"
+            'echo "$input" | sed -n "s/^include: //p" | while read f; do cat "$f"; done\n'
+            'echo "$input" | grep "^MDWIZ" || true\n',
+        )
+
+        first = self.test_directory / "first.md"
+        first.write_text("```table\n---\ninclude: data.csv\n---\n```\n")
+        second = self.test_directory / "second.md"
+        second.write_text("Paragraph\n")
+        table = self.test_directory / "data.csv"
+        table.write_text("a,1\n")
+        cache = Cache(self.test_directory / "cache")
+
+        self.assertIn("a,1", Converter([first, second], cache=cache).convert_chapters())
+        table.write_text("a,2\n")
+        self.assertIn("a,2", Converter([first, second], cache=cache).convert_chapters())
+
+    def test_chapter_splice(self):
+        wrapper = f"\\begin{{document}}\n{Chapter.BODY_PLACEHOLDER}\n\\end{{document}}"
+        result = Chapter.splice(wrapper, ["A\n", "B\n"])
+        self.assertEqual(result, "\\begin{document}\nA\n\nB\n\n\\end{document}")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,65 @@
+import json
+import unittest
+
+from mdwiz.converter import Converter
+from mdwiz.dependencies import Dependencies, Manifest
+
+from util import FileSystemUnitTest
+
+
+class TestDependencies(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        (self.test_directory / "images").mkdir()
+        for name in ("images/plot.png", "images/logo.pdf", "data.csv"):
+            (self.test_directory / name).touch()
+        (self.test_directory / "appendix.tex").write_text(
+            "\\includegraphics[width=3cm]{images/logo}\n"
+        )
+        self.document = self.test_directory / "my document.md"
+        self.document.write_text(
+            "# Results\n\n"
+            '![A plot](images/plot.png "Plot") and ![Remote](https://example.org/a.png)\n\n'
+            "```table\n---\ncaption: Data\ninclude: data.csv\n---\n```\n\n"
+            "```\n![Code](images/missing.png) \\input{ignored}\n```\n\n"
+            "\\input{appendix}\n"
+        )
+
+    def test_scan(self):
+        dependencies = Dependencies.scan([self.document])
+        self.assertEqual(
+            dependencies.images,
+            [
+                self.test_directory / "images/plot.png",
+                self.test_directory / "images/logo.pdf",
+            ],
+        )
+        self.assertEqual(dependencies.includes, [self.test_directory / "appendix.tex"])
+        self.assertEqual(dependencies.tables, [self.test_directory / "data.csv"])
+
+    def test_manifest(self):
+        manifest = Manifest([self.test_directory / "out.tex"], [self.document])
+
+        make = manifest.to_make(self.test_directory).splitlines()
+        self.assertEqual(
+            make[0],
+            "out.tex: my\\ document.md images/plot.png images/logo.pdf appendix.tex data.csv",
+        )
+        self.assertIn("data.csv:", make)
+
+        manifest.write(self.test_directory / "deps.json", self.test_directory)
+        parsed = json.loads((self.test_directory / "deps.json").read_text())
+        self.assertEqual(parsed["targets"], ["out.tex"])
+        self.assertEqual(parsed["tables"], ["data.csv"])
+        self.assertEqual(parsed["bibliography"], [])
+
+    def test_cache_key(self):
+        converter = Converter([self.document])
+        key = converter.cache_key()
+        (self.test_directory / "data.csv").write_text("a,b\n1,2\n")
+        self.assertNotEqual(converter.cache_key(), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
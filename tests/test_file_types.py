@@ -2,7 +2,9 @@ import unittest
 import tempfile
 from pathlib import Path
 
+from mdwiz.cache import Cache
 from mdwiz.filetypes import FileType
+from mdwiz.filetypes.index import FileIndex
 
 from util import FileSystemUnitTest
 
@@ -71,6 +73,40 @@ class TestFileTypes(FileSystemUnitTest):
             1,
         )
 
+    def test_index(self):
+        example_filetype = FileType("example")
+        index = FileIndex.build(self.test_directory)
+        for recursive in (True, False):
+            self.assertCountEqual(
+                example_filetype.locate_files(
+                    self.test_directory, recursive=recursive, index=index
+                ),
+                example_filetype.locate_files(self.test_directory, recursive=recursive),
+            )
+
+        # Version control directories are never searched
+        (self.test_directory / ".git").mkdir()
+        (self.test_directory / ".git" / "c.example").touch()
+        self.assertEqual(len(FileIndex.build(self.test_directory).files("example")), 2)
+
+    def test_ignore_file(self):
+        ignore_file = self.test_directory / FileIndex.IGNORE_FILE
+        ignore_file.write_text("# Comment\nnested_directory/\n")
+        index = FileIndex.build(self.test_directory)
+        self.assertEqual(index.files("example"), [self.test_directory / "a.example"])
+
+    def test_persisted_index(self):
+        cache = Cache(self.test_directory / "cache")
+        index = FileIndex.load(self.test_directory / "nested_directory", cache)
+        self.assertEqual(len(index.files("example")), 1)
+        self.assertTrue(index.is_valid())
+
+        # Adding a file invalidates the index
+        (self.test_directory / "nested_directory" / "c.example").touch()
+        self.assertFalse(index.is_valid())
+        index = FileIndex.load(self.test_directory / "nested_directory", cache)
+        self.assertEqual(len(index.files("example")), 2)
+
 
 if __name__ == "__main__":
     unittest.main()
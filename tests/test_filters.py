@@ -0,0 +1,170 @@
+import os
+import sys
+import unittest
+
+from mdwiz.cache import Cache
+from mdwiz.converter import Converter
+from mdwiz.filters import (
+    FilterPipeline,
+    FunctionFilter,
+    ModuleFilter,
+    ProcessFilter,
+    TableFilter,
+)
+
+from util import FileSystemUnitTest
+
+DOCUMENT = {
+    "pandoc-api-version": [1, 17, 5, 4],
+    "meta": {},
+    "blocks": [{"t": "Para", "c": [{"t": "Str", "c": "Hello"}]}],
+}
+
+
+def shout(document, output_format):
+    for block in document["blocks"]:
+        for inline in block["c"]:
+            inline["c"] = inline["c"].upper()
+
+
+def exclaim(document, output_format):
+    return {
+        **document,
+        "blocks": [
+            *document["blocks"],
+            {"t": "Para", "c": [{"t": "Str", "c": output_format}]},
+        ],
+    }
+
+
+def render_tables(document, output_format):
+    # Replaces each table by a paragraph of its text, within a worker process if picklable
+    for div in document["blocks"]:
+        text = div["c"][1][0]["c"][1]
+        div["c"][1] = [{"t": "Para", "c": [{"t": "Str", "c": text}]}]
+
+
+def table(text):
+    return {"t": "CodeBlock", "c": [["", ["table"], []], text]}
+
+
+class TestFilters(FileSystemUnitTest):
+    def test_pipeline(self):
+        pipeline = FilterPipeline([FunctionFilter(shout), FunctionFilter(exclaim)])
+        document = pipeline.apply(DOCUMENT, "latex")
+
+        self.assertEqual(document["blocks"][0]["c"][0]["c"], "HELLO")
+        self.assertEqual(document["blocks"][1]["c"][0]["c"], "latex")
+        self.assertEqual(
+            [name for name, _ in pipeline.timings],
+            [f"{__name__}.shout", f"{__name__}.exclaim"],
+        )
+
+    def test_load(self):
+        document_filter = FilterPipeline.load(f"{__name__}:shout")
+        self.assertEqual(document_filter.function, shout)
+        self.assertEqual(
+            document_filter.fingerprint(),
+            FunctionFilter(shout, name=f"{__name__}:shout").fingerprint(),
+        )
+        with self.assertRaises(ValueError):
+            FilterPipeline.load(__name__)
+
+    def test_unknown_filter(self):
+        pipeline = FilterPipeline.from_names(["some-filter"])
+        self.assertIsInstance(pipeline.filters[0], ProcessFilter)
+
+    def test_cache_key(self):
+        markdown_file = self.test_directory / "document.md"
+        markdown_file.write_text("Hello")
+        converter = Converter([markdown_file], in_process_filters=True)
+        key = converter.cache_key()
+
+        converter.pipeline.filters.append(FunctionFilter(shout))
+        self.assertNotEqual(converter.cache_key(), key)
+        self.assertNotEqual(Converter([markdown_file]).cache_key(), key)
+
+    def test_table_filter(self):
+        (self.test_directory / "data.csv").write_text("a,b\n1,2\n")
+        rendered = []
+
+        def render(document, output_format):
+            # Replaces each table by a paragraph of its text instead of a real table
+            self.assertNotEqual(os.getcwd(), str(self.test_directory))
+            for div in document["blocks"]:
+                text = div["c"][1][0]["c"][1]
+                rendered.append(text)
+                div["c"][1] = [{"t": "Para", "c": [{"t": "Str", "c": text}]}]
+
+        document = {
+            **DOCUMENT,
+            "blocks": [
+                table("---\ninclude: data.csv\n---\n"),
+                {"t": "BlockQuote", "c": [table("x,y")]},
+                table("x,y"),
+            ],
+        }
+        table_filter = TableFilter(
+            FunctionFilter(render), cache=Cache(self.test_directory / "cache")
+        )
+        result = table_filter.apply(document, "latex", cwd=self.test_directory)
+        # The CSV file is included by absolute path, as the working directory is not changed
+        csv_file = (self.test_directory / "data.csv").as_posix()
+        include = f"---\ninclude: {csv_file}\n---\n"
+        self.assertEqual(sorted(rendered), [include, "x,y"])
+        self.assertEqual(
+            result["blocks"][1]["c"][0], {"t": "Para", "c": [{"t": "Str", "c": "x,y"}]}
+        )
+        self.assertEqual(result["blocks"][2]["t"], "Para")
+
+        # Only the table whose CSV file changed is rendered again
+        rendered.clear()
+        self.assertEqual(
+            table_filter.apply(document, "latex", cwd=self.test_directory), result
+        )
+        self.assertEqual(rendered, [])
+        (self.test_directory / "data.csv").write_text("a,b\n1,3\n")
+        table_filter.apply(document, "latex", cwd=self.test_directory)
+        self.assertEqual(rendered, [include])
+
+    def test_table_filter_workers(self):
+        document = {**DOCUMENT, "blocks": [table(f"x,{i}") for i in range(4)]}
+        table_filter = TableFilter(FunctionFilter(render_tables), jobs=2)
+        result = table_filter.apply(document, "latex", cwd=self.test_directory)
+        self.assertEqual(
+            [block["c"][0]["c"] for block in result["blocks"]],
+            [f"x,{i}" for i in range(4)],
+        )
+
+    def test_module_filter(self):
+        # Counts the documents in a module global, like pandoc-xnos keeps their labels
+        (self.test_directory / "counting_filter.py").write_text(
+            "import json\n"
+            "count = 0\n"
+            "labels = []\n"
+            "def main(stdin, stdout):\n"
+            "    global count\n"
+            "    count += 1\n"
+            "    labels.append(count)\n"
+            "    document = json.load(stdin)\n"
+            "    document['meta']['count'] = count\n"
+            "    document['meta']['labels'] = len(labels)\n"
+            "    json.dump(document, stdout)\n"
+        )
+        sys.path.insert(0, str(self.test_directory))
+        try:
+            module_filter = ModuleFilter("counting-filter", ["counting_filter"])
+            results = [module_filter.apply(DOCUMENT, "latex") for _ in range(2)]
+        finally:
+            sys.path.remove(str(self.test_directory))
+            sys.modules.pop("counting_filter", None)
+        self.assertEqual([result["meta"]["count"] for result in results], [1, 1])
+        self.assertEqual([result["meta"]["labels"] for result in results], [1, 1])
+
+    def test_table_filter_in_pipeline(self):
+        pipeline = FilterPipeline.from_names(["pantable"])
+        self.assertIsInstance(pipeline.filters[0], TableFilter)
+
+
+if __name__ == "__main__":
+    unittest.main()
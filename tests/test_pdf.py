@@ -0,0 +1,93 @@
+import os
+import unittest
+
+from mdwiz.pdf import PdfBuilder
+
+from util import FileSystemUnitTest
+
+# A placeholder TeX engine, whose auxiliary file only changes with the first line of the document
+ENGINE = """#!/bin/sh
+for a; do case "$a" in -output-directory=*) dir="${a#-output-directory=}";; esac; tex="$a"; done
+name=$(basename "$tex" .tex)
+echo pass >> "$dir/passes"
+if grep -q FAIL "$tex"; then echo "! Undefined control sequence." > "$dir/$name.log"; exit 1; fi
+head -n 1 "$tex" > "$dir/$name.aux"
+cp "$tex" "$dir/$name.pdf"
+printf 'INPUT %s\\nINPUT figure.png\\n' "$tex" > "$dir/$name.fls"
+echo done > "$dir/$name.log"
+"""
+
+
+@unittest.skipUnless(os.name == "posix", "The placeholder engine is a shell script")
+class TestPdf(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+        engine = self.test_directory / "engine"
+        engine.write_text(ENGINE)
+        engine.chmod(0o755)
+        (self.test_directory / "figure.png").write_bytes(b"image")
+        # A placeholder BibTeX, which is started within the build directory
+        bibtex = self.test_directory / "bibtex"
+        bibtex.write_text('#!/bin/sh\necho bibliography > "$1.bbl"\n')
+        bibtex.chmod(0o755)
+        self.builder = PdfBuilder(self.test_directory / "build", engine=str(engine))
+
+    def test_incremental_build(self):
+        result = self.builder.build("first\nbody", "document", self.test_directory)
+        self.assertEqual(result.passes, 2)
+        self.assertEqual(result.pdf_file.read_text(), "first\nbody")
+
+        # Nothing changed, so the engine is not started at all
+        result = self.builder.build("first\nbody", "document", self.test_directory)
+        self.assertEqual(result.passes, 0)
+
+        # The auxiliary file of the last build is still valid
+        (self.test_directory / "figure.png").write_bytes(b"another image")
+        result = self.builder.build("first\nbody", "document", self.test_directory)
+        self.assertEqual(result.passes, 1)
+        result = self.builder.build(
+            "first\nchanged body", "document", self.test_directory
+        )
+        self.assertEqual(result.passes, 1)
+
+        # BibTeX reads the bibliography, which the engine does not record
+        bibliography = self.test_directory / "references.bib"
+        bibliography.write_text("@book{doe, title={A}}")
+        latex = "\\bibdata{references}\nbody"
+        path = os.environ["PATH"]
+        os.environ["PATH"] = os.pathsep.join((str(self.test_directory), path))
+        try:
+            self.builder.build(latex, "document", self.test_directory)
+            result = self.builder.build(latex, "document", self.test_directory)
+            self.assertEqual(result.passes, 0)
+            bibliography.write_text("@book{doe, title={B}}")
+            result = self.builder.build(latex, "document", self.test_directory)
+            self.assertGreater(result.passes, 0)
+            self.assertTrue(result.bibliography)
+        finally:
+            os.environ["PATH"] = path
+
+        with self.assertRaisesRegex(PdfBuilder.BuildError, "Undefined control"):
+            self.builder.build("FAIL", "document", self.test_directory)
+
+    def test_bibliography_fingerprint(self):
+        self.builder.build_directory.mkdir()
+        (self.builder.build_directory / "document.aux").write_text(
+            "\\relax\n\\citation{doe}\n\\bibdata{references}\n"
+        )
+        bibliography = self.test_directory / "references.bib"
+        bibliography.write_text("@book{doe, title={A}}")
+
+        tool, fingerprint = self.builder._bibliography_fingerprint(
+            "document", self.test_directory
+        )
+        self.assertEqual(tool, "bibtex")
+        bibliography.write_text("@book{doe, title={B}}")
+        self.assertNotEqual(
+            self.builder._bibliography_fingerprint("document", self.test_directory)[1],
+            fingerprint,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
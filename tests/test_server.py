@@ -0,0 +1,105 @@
+import contextlib
+import io
+import logging
+import os
+import threading
+import unittest
+import warnings
+
+from mdwiz import assets
+from mdwiz.__main__ import StatusCode
+from mdwiz.server import Server, forward
+
+from util import FileSystemUnitTest
+
+
+class TestServer(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        self.socket = self.test_directory / "mdwiz.sock"
+        self.warning_filters = list(warnings.filters)
+        self.server = Server(self.socket)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        super().tearDown()
+
+        # The server does not change the warnings shown by the hosting process
+        self.assertEqual(warnings.filters, self.warning_filters)
+
+    def test_unreachable(self):
+        self.assertIsNone(forward(str(self.test_directory / "missing.sock"), []))
+
+    def test_failing_request(self):
+        # The directory does not contain any Markdown
+        status_code = forward(
+            str(self.socket), ["--no-cache"], cwd=str(self.test_directory)
+        )
+        self.assertIsNotNone(status_code)
+        self.assertFalse(status_code.is_successfull())
+
+    def test_concurrent_requests(self):
+        results = []
+
+        def request():
+            results.append(
+                forward(str(self.socket), ["--no-cache"], cwd=str(self.test_directory))
+            )
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(isinstance(result, StatusCode) for result in results))
+
+    def request(self, *argv: str):
+        # The server forwards warnings like the command line does
+        logging.captureWarnings(True)
+        self.addCleanup(logging.captureWarnings, False)
+
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            with contextlib.redirect_stdout(io.StringIO()):
+                status_code = forward(
+                    str(self.socket), argv, cwd=str(self.test_directory)
+                )
+        return status_code, stderr.getvalue()
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_repeated_warnings(self):
+        self.placeholder("pandoc", "echo converted\n")
+        TestServer.copy_assets(self.test_directory, "example.md")
+        TestServer.copy_assets(self.test_directory, "example.bib")
+
+        # Every client is told about its missing references, not only the first one
+        for _ in range(2):
+            status_code, log = self.request("--no-cache")
+            self.assertTrue(status_code.is_successfull())
+            self.assertIn("unknown_reference", log)
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    @unittest.skipIf(assets._svg_converter() is not None, "SVG images are convertible")
+    def test_worker_thread_logs(self):
+        self.placeholder("pandoc", "echo converted\n")
+        (self.test_directory / "document.md").write_text("![A figure](figure.svg)\n")
+        (self.test_directory / "figure.svg").write_text("<svg/>")
+
+        # The images are prepared in worker threads
+        status_code, log = self.request("--no-cache", "--prepare-assets")
+        self.assertTrue(status_code.is_successfull())
+        self.assertIn("Unable to convert", log)
+
+    def test_running_server(self):
+        with self.assertRaises(RuntimeError):
+            Server(self.socket)
+
+
+if __name__ == "__main__":
+    unittest.main()
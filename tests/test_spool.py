@@ -0,0 +1,94 @@
+import json
+import os
+import time
+import unittest
+
+from mdwiz.spool import Job, Spool, submit, work
+
+from util import FileSystemUnitTest
+
+
+class TestSpool(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        self.document = self.test_directory / "document"
+        self.document.mkdir()
+        TestSpool.copy_assets(self.document, "example.md")
+        TestSpool.copy_assets(self.document, "example.bib")
+        self.spool = Spool(self.test_directory / "spool")
+
+    def test_submit(self):
+        (job,) = submit(self.spool, [self.document], ["--no-cache"])
+        self.assertEqual(job.markdown_files, [self.document / "example.md"])
+        self.assertEqual(job.bibliographies, [self.document / "example.bib"])
+        self.assertEqual(job.output, self.document / "example.tex")
+
+        claimed = self.spool.claim()
+        self.assertEqual(claimed.to_dict(), job.to_dict())
+        self.assertIsNone(self.spool.claim())
+        self.assertEqual(self.spool.statistics()["claimed"], 1)
+
+    def test_invalid_job(self):
+        (self.spool.directory / "incoming" / "0-invalid.json").write_text("{")
+        (job,) = submit(self.spool, [self.document], ["--no-cache"])
+
+        self.assertEqual(self.spool.claim().id, job.id)
+        statistics = self.spool.statistics()
+        self.assertEqual((statistics["incoming"], statistics["failed"]), (0, 1))
+
+    def test_reclaim_stale(self):
+        self.spool.submit(
+            Job(
+                self.document,
+                [self.document / "example.md"],
+                self.document / "example.tex",
+            )
+        )
+        job = self.spool.claim()
+        self.assertEqual(self.spool.reclaim_stale(60, max_attempts=2), 0)
+
+        # The worker crashed long ago
+        claimed = self.spool.directory / "claimed" / f"{job.id}.json"
+        os.utime(claimed, (time.time() - 120, time.time() - 120))
+        self.assertEqual(self.spool.reclaim_stale(60, max_attempts=2), 1)
+        self.assertFalse(self.spool.renew(job))
+        job = self.spool.claim()
+        self.assertEqual(job.attempts, 1)
+
+        os.utime(claimed, (time.time() - 120, time.time() - 120))
+        self.spool.reclaim_stale(60, max_attempts=2)
+        statistics = self.spool.statistics()
+        self.assertEqual((statistics["incoming"], statistics["failed"]), (0, 1))
+
+    def test_reclaim_invalid_job(self):
+        claimed = self.spool.directory / "claimed" / "0-invalid.json"
+        claimed.write_text("{")
+        os.utime(claimed, (time.time() - 120, time.time() - 120))
+
+        self.assertEqual(self.spool.reclaim_stale(60, max_attempts=2), 0)
+        self.assertEqual(list((self.spool.directory / "claimed").iterdir()), [])
+        self.assertEqual(self.spool.statistics()["failed"], 1)
+
+    @unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+    def test_work(self):
+        # A placeholder pandoc which prints its arguments, or writes them into the output file
+        self.placeholder(
+            "pandoc",
+            'for a; do [ "$previous" = "-o" ] && output="$a"; previous="$a"; done\n'
+            'if [ -n "$output" ]; then echo "$@" > "$output"; else echo "$@"; fi\n',
+        )
+
+        submit(self.spool, [self.document], ["--no-cache", "--output", "out.tex"])
+        status_code = work(self.spool, exit_when_empty=True)
+
+        self.assertTrue(status_code.is_successfull())
+        self.assertIn("example.md", (self.document / "out.tex").read_text())
+        (result,) = (self.spool.directory / "done").glob("*.json")
+        result = json.loads(result.read_text())
+        self.assertEqual(result["status"], "Success")
+        self.assertEqual(self.spool.statistics()["done"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+
+from benchmarks import fake_pandoc
+from util import FileSystemUnitTest
+
+# Generous upper bound for the wall time of paths doing no conversion work, i.e. '--help', failed discovery or a
+# conversion found in the cache
+STARTUP_BUDGET = 0.5
+
+# Modules which are only required once a document is actually processed
+LAZY_MODULES = (
+    "pyperclip",
+    "subprocess",
+    "mdwiz.bibliography",
+    "mdwiz.cache",
+    "mdwiz.converter",
+    "mdwiz.watch",
+)
+
+
+class TestStartup(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+        self.environment = dict(os.environ)
+        self.environment["PYTHONPATH"] = str(Path(__file__).parent.parent)
+        self.environment["MDWIZ_CACHE_DIR"] = str(self.test_directory / "cache")
+
+    def run_mdwiz(self, *arguments: str) -> float:
+        # Take the best of multiple runs to be robust against noise
+        durations = []
+        for _ in range(3):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-m", "mdwiz", *arguments],
+                cwd=str(self.test_directory),
+                env=self.environment,
+                capture_output=True,
+            )
+            durations.append(time.perf_counter() - start)
+        return min(durations)
+
+    def test_lazy_imports(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, mdwiz.__main__; print(' '.join(sys.modules))",
+            ],
+            env=self.environment,
+            capture_output=True,
+            text=True,
+        )
+        loaded_modules = frozenset(result.stdout.split())
+        self.assertEqual(loaded_modules.intersection(LAZY_MODULES), frozenset())
+
+    def test_help_budget(self):
+        self.assertLess(self.run_mdwiz("--help"), STARTUP_BUDGET)
+
+    def test_failed_discovery_budget(self):
+        self.assertLess(self.run_mdwiz(), STARTUP_BUDGET)
+
+    def test_cached_conversion_budget(self):
+        binary_directory = self.test_directory / "bin"
+        binary_directory.mkdir()
+        fake_pandoc.install(binary_directory)
+        self.environment["PATH"] = os.pathsep.join(
+            (str(binary_directory), self.environment.get("PATH", ""))
+        )
+        (self.test_directory / "document.md").write_text("# Chapter 1\n\nSome text.\n")
+
+        # The first conversion fills the cache, so the following ones never start pandoc
+        output = self.test_directory / "output.tex"
+        self.run_mdwiz("--output", output.name)
+        self.assertIn("\\section{Chapter 1}", output.read_text())
+        output.unlink()
+
+        # Starting pandoc once more would exceed the budget
+        self.environment["MDWIZ_FAKE_PANDOC_DELAY"] = str(STARTUP_BUDGET)
+        self.assertLess(self.run_mdwiz("--output", output.name), STARTUP_BUDGET)
+        self.assertIn("\\section{Chapter 1}", output.read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
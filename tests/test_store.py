@@ -0,0 +1,101 @@
+import io
+import json
+import time
+import unittest
+
+from mdwiz import bibtex
+from mdwiz.store import BibliographyStore
+
+from util import FileSystemUnitTest
+
+
+class TestStore(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        self.project = self.test_directory / "project.bib"
+        self.project.write_text(
+            '@string{journal = "Gundlers Playpen"}\n'
+            "@article{child, title = {Child}, journal = journal, crossref = {parent}}\n"
+            "@article{doe, title = {Lorem Ipsum}}\n"
+        )
+        self.shared = self.test_directory / "shared.bib"
+        self.shared.write_text(
+            '@string{journal = "Gundlers Playpen"}\n'
+            "@book{parent, title = {Parent}}\n"
+            "@article{doe,\n  title = {Lorem Ipsum}\n}\n"
+            "@article{child, title = {Another child}}\n"
+            "@article{unused, title = {Unused}}\n"
+        )
+        self.sources = [self.project, self.shared]
+        self.store = BibliographyStore(str(self.test_directory / "store.sqlite3"))
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def test_merge(self):
+        self.assertEqual(self.store.update(self.sources), self.sources)
+        self.assertEqual(
+            self.store.keys(self.sources), {"child", "doe", "parent", "unused"}
+        )
+        self.assertIn("Another child", self.store.get("child", [self.shared]))
+
+        duplicates = {
+            duplicate.key: duplicate for duplicate in self.store.duplicates(self.sources)
+        }
+        self.assertCountEqual(duplicates.keys(), ["child", "doe"])
+        self.assertTrue(duplicates["doe"].identical)
+        self.assertFalse(duplicates["child"].identical)
+        self.assertEqual(duplicates["child"].sources, self.sources)
+
+        # The first source wins and strings are only defined once
+        merged = "".join(self.store.merge(self.sources))
+        self.assertEqual(merged.count("@string"), 1)
+        entries = bibtex.parse(io.StringIO(merged))
+        self.assertCountEqual(entries.keys(), ["child", "doe", "parent", "unused"])
+        self.assertEqual(entries["child"]["title"], "Child")
+        self.assertEqual(entries["child"]["journal"], "Gundlers Playpen")
+
+        pruned = bibtex.parse(
+            io.StringIO("".join(self.store.merge(self.sources, keys=["child"])))
+        )
+        self.assertCountEqual(pruned.keys(), ["child", "parent"])
+
+    def test_incremental_update(self):
+        merged_file = self.store.consolidate(self.sources, self.test_directory / "merged")
+        self.assertEqual(
+            self.store.consolidate(self.sources, self.test_directory / "merged"),
+            merged_file,
+        )
+        self.assertEqual(self.store.update(self.sources), [])
+
+        # Only the changed source is parsed again, while the merged file keeps its path
+        time.sleep(0.01)
+        self.shared.write_text("@article{new, title = {New}}\n")
+        self.assertEqual(
+            self.store.consolidate(self.sources, self.test_directory / "merged"),
+            merged_file,
+        )
+        self.assertCountEqual(
+            bibtex.iter_keys(merged_file), ["child", "doe", "new"]
+        )
+        self.assertEqual(self.store.update(self.sources), [])
+
+    def test_json(self):
+        first = self.test_directory / "first.json"
+        first.write_text(json.dumps([{"id": "doe", "title": "A"}]))
+        second = self.test_directory / "second.json"
+        second.write_text(json.dumps([{"id": "doe", "title": "B"}, {"id": "roe"}]))
+
+        merged_file = self.store.consolidate([first, second], self.test_directory)
+        self.assertEqual(
+            json.loads(merged_file.read_text()),
+            [{"id": "doe", "title": "A"}, {"id": "roe"}],
+        )
+        with self.assertRaises(ValueError):
+            self.store.consolidate([first, self.project], self.test_directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import json
+import os
+import unittest
+import warnings
+
+from mdwiz.converter import Converter
+from mdwiz.text import TextConverter
+
+from util import FileSystemUnitTest
+
+
+@unittest.skipUnless(os.name == "posix", "The placeholder pandoc is a shell script")
+class TestText(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        # A placeholder pandoc, which prints its arguments followed by stdin
+        self.placeholder("pandoc", 'echo "$@"\ncat\n')
+
+    def test_references(self):
+        references = json.dumps([{"id": "doe", "title": "Lorem Ipsum"}])
+        converter = TextConverter(
+            references=references, output_format="html", cwd=self.test_directory
+        )
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            result = converter.convert("As @doe and @unknown state.".encode("utf-8"))
+
+        arguments, source = result.split("\n", 1)
+        self.assertIn("--to=html", arguments)
+        self.assertIn("--filter=pandoc-citeproc", arguments)
+        self.assertNotIn("--listings", arguments)
+        self.assertTrue(source.startswith("As @doe and @unknown state.\n\n---\n"))
+        self.assertIn('references: [{"id": "doe", "title": "Lorem Ipsum"}]', source)
+
+        self.assertEqual(len(caught), 1)
+        self.assertIsInstance(caught[0].message, Converter.MissingReferenceWarning)
+        self.assertEqual(caught[0].message.missing_references, {"unknown"})
+
+    def test_bibliography_resource(self):
+        converter = TextConverter(bibliography_resource="references.bib")
+        result = converter.convert("# Title\n\nAs @doe states.")
+        self.assertIn("--biblatex --metadata=bibliography:references.bib", result)
+        self.assertTrue(result.endswith("# Title\n\nAs @doe states."))
+
+        with self.assertRaises(ValueError):
+            TextConverter(bibliography_resource="references.bib", output_format="html")
+
+
+if __name__ == "__main__":
+    unittest.main()
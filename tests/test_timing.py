@@ -0,0 +1,60 @@
+import json
+import threading
+import unittest
+
+from mdwiz import timing
+from mdwiz.bibliography import Bibliography
+
+from util import FileSystemUnitTest
+
+
+class TestTiming(FileSystemUnitTest):
+    def test_without_subscribers(self):
+        with timing.span("stage") as span:
+            self.assertIsNone(span)
+
+    def test_subscriber(self):
+        spans = []
+        timing.subscribe(spans.append)
+        try:
+            with timing.span("outer", answer=42):
+                with timing.span("inner", "subprocess"):
+                    pass
+        finally:
+            timing.unsubscribe(spans.append)
+
+        self.assertEqual([span.name for span in spans], ["inner", "outer"])
+        self.assertEqual(spans[0].category, "subprocess")
+        self.assertEqual(spans[1].args["answer"], 42)
+        self.assertGreaterEqual(spans[1].duration, spans[0].duration)
+
+    def test_concurrent_recorders(self):
+        def stage(name: str):
+            with timing.span(name):
+                pass
+
+        # Conversions running in other threads, i.e. of other clients, are not recorded
+        with timing.Recorder() as recorder:
+            other = threading.Thread(target=stage, args=("other",))
+            other.start()
+            other.join()
+            worker = threading.Thread(target=timing.inherit(stage), args=("worker",))
+            worker.start()
+            worker.join()
+        self.assertEqual([span.name for span in recorder.spans], ["worker"])
+
+    def test_trace(self):
+        bibliography = TestTiming.copy_assets(self.test_directory, "example.bib")
+        with timing.Recorder() as recorder:
+            Bibliography.from_file(bibliography)
+
+        trace_file = self.test_directory / "trace.json"
+        recorder.write_trace(trace_file)
+        events = json.loads(trace_file.read_text())["traceEvents"]
+        self.assertEqual([event["name"] for event in events], ["bibliography"])
+        self.assertEqual(events[0]["ph"], "X")
+        self.assertIn("bibliography", recorder.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from mdwiz.watch import Watcher
+
+from util import FileSystemUnitTest
+
+
+class TestWatcher(FileSystemUnitTest):
+    def setUp(self):
+        super().setUp()
+
+        self.watched_file = self.test_directory / "watched.md"
+        self.watched_file.write_text("# Chapter")
+        self.other_file = self.test_directory / "other.md"
+        self.other_file.write_text("# Other")
+
+        self.watcher = Watcher([self.watched_file], interval=0.05, debounce=0.1)
+
+    def tearDown(self):
+        self.watcher.close()
+        super().tearDown()
+
+    def test_timeout(self):
+        self.assertEqual(self.watcher.wait(timeout=0.2), frozenset())
+
+    def test_change(self):
+        self.watched_file.write_text("# Chapter 1\n\nSome text.")
+        self.assertEqual(self.watcher.wait(timeout=2), {self.watched_file})
+
+    def test_unrelated_change(self):
+        self.other_file.write_text("# Other chapter\n\nSome text.")
+        self.assertEqual(self.watcher.wait(timeout=0.2), frozenset())
+
+
+if __name__ == "__main__":
+    unittest.main()
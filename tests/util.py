@@ -1,7 +1,11 @@
+import os
 import unittest
 import tempfile
 from pathlib import Path
 
+from mdwiz import assets
+from mdwiz.converter import Converter
+
 
 class FileSystemUnitTest(unittest.TestCase):
     def setUp(self):
@@ -19,3 +23,35 @@ class FileSystemUnitTest(unittest.TestCase):
         destination = destination / file_name
         destination.write_text(source.read_text())
         return destination
+
+    def placeholder(self, name: str, script: str) -> Path:
+        """
+        Put a shell script in front of PATH as the executable 'name' until the test finished. Tests using it are
+        restricted to POSIX.
+
+        :param name: The name of the replaced tool, i.e. 'pandoc'.
+        :param script: The body of the script, without the shebang.
+        :return: The path of the script.
+        """
+        binary_directory = self.test_directory / "bin"
+        binary_directory.mkdir(exist_ok=True)
+        executable = binary_directory / name
+        executable.write_text(f"#!/bin/sh\n{script}")
+        executable.chmod(0o755)
+
+        path = os.environ["PATH"]
+        os.environ["PATH"] = os.pathsep.join((str(binary_directory), path))
+        FileSystemUnitTest._clear_tool_caches()
+        self.addCleanup(FileSystemUnitTest._restore_path, path)
+        return executable
+
+    @staticmethod
+    def _restore_path(path: str):
+        os.environ["PATH"] = path
+        FileSystemUnitTest._clear_tool_caches()
+
+    @staticmethod
+    def _clear_tool_caches():
+        # Whether the tools are available is only checked once
+        Converter.is_available.cache_clear()
+        assets._svg_converter.cache_clear()